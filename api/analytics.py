@@ -0,0 +1,173 @@
+"""
+Vectorized portfolio return metrics.
+
+Every function works on whole arrays of holdings and cash flows at once,
+cash flows follow the investor's sign convention: money put in is negative,
+money taken out (sales, current value) is positive.
+"""
+
+from dataclasses import dataclass
+from datetime import date
+from typing import Dict, List
+
+import numpy as np
+
+DAYS_PER_YEAR = 365.0
+MIN_RATE = -0.9999
+MAX_RATE = 1e4
+
+
+@dataclass
+class CashFlows:
+    holding: np.ndarray  # index of the holding each flow belongs to
+    dates: np.ndarray  # datetime64[D]
+    amounts: np.ndarray  # float64, negative for money invested
+
+
+def _npv(rates: np.ndarray, amounts: np.ndarray, years: np.ndarray) -> np.ndarray:
+    return (amounts * (1.0 + rates[:, None]) ** -years).sum(axis=1)
+
+
+def xirr_matrix(
+    amounts: np.ndarray, years: np.ndarray, tol: float = 1e-9, max_iter: int = 50
+) -> np.ndarray:
+    """
+    Solves the XIRR of every row of a zero padded ``amounts`` matrix, with
+    ``years`` the time of each flow since the row's first flow. Newton's
+    method runs on all rows together, rows it cannot settle are finished by
+    bisection. Rows without both an inflow and an outflow yield NaN.
+    """
+    rows = amounts.shape[0]
+    solvable = (amounts < 0).any(axis=1) & (amounts > 0).any(axis=1)
+    rates = np.full(rows, 0.1)
+    done = ~solvable
+    with np.errstate(over="ignore", invalid="ignore", divide="ignore"):
+        for _ in range(max_iter):
+            active = ~done
+            if not active.any():
+                break
+            a, t, r = amounts[active], years[active], rates[active]
+            discount = (1.0 + r[:, None]) ** -t
+            value = (a * discount).sum(axis=1)
+            slope = (-t * a * discount / (1.0 + r[:, None])).sum(axis=1)
+            step = np.where(slope != 0, value / slope, np.nan)
+            new_rates = np.clip(r - step, MIN_RATE, MAX_RATE)
+            converged = np.abs(new_rates - r) < tol
+            rates[active] = new_rates
+            done[np.flatnonzero(active)[converged | ~np.isfinite(new_rates)]] = True
+
+        scale = np.abs(amounts).sum(axis=1)
+        residual = np.abs(_npv(rates, amounts, years))
+        bad = solvable & ~(np.isfinite(rates) & (residual <= 1e-9 * scale))
+        if bad.any():
+            rates[bad] = _bisect(amounts[bad], years[bad], tol)
+    rates[~solvable] = np.nan
+    return rates
+
+
+def _bisect(amounts: np.ndarray, years: np.ndarray, tol: float) -> np.ndarray:
+    low = np.full(amounts.shape[0], MIN_RATE)
+    high = np.full(amounts.shape[0], 10.0)
+    low_value = _npv(low, amounts, years)
+    bracketed = np.sign(low_value) != np.sign(_npv(high, amounts, years))
+    for _ in range(200):
+        mid = (low + high) / 2
+        mid_value = _npv(mid, amounts, years)
+        same_side = np.sign(mid_value) == np.sign(low_value)
+        low = np.where(same_side, mid, low)
+        low_value = np.where(same_side, mid_value, low_value)
+        high = np.where(same_side, high, mid)
+        if np.all(high - low < tol):
+            break
+    return np.where(bracketed, (low + high) / 2, np.nan)
+
+
+def _pad_flows(holding: np.ndarray, rows: int, *columns: np.ndarray):
+    """
+    Scatters flat per-flow columns into ``rows`` x ``max flows`` matrices.
+    """
+    order = np.argsort(holding, kind="stable")
+    holding = holding[order]
+    counts = np.bincount(holding, minlength=rows)
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    position = np.arange(len(holding)) - starts[holding]
+    width = int(counts.max()) if len(counts) and counts.max() else 0
+    padded = []
+    for column in columns:
+        matrix = np.zeros((rows, width), dtype=column.dtype)
+        matrix[holding, position] = column[order]
+        padded.append(matrix)
+    return padded
+
+
+def compute_metrics(
+    flows: CashFlows, current_values: np.ndarray, as_of: date
+) -> Dict[str, np.ndarray]:
+    """
+    Returns invested amount, current value, absolute return, CAGR and XIRR
+    per holding, plus the same metrics for the whole portfolio under the
+    ``total`` key.
+    """
+    rows = len(current_values)
+    as_of = np.datetime64(as_of, "D")
+    amounts = flows.amounts.astype(np.float64)
+    invested = np.bincount(
+        flows.holding, weights=np.where(amounts < 0, -amounts, 0.0), minlength=rows
+    )
+    realised = np.bincount(flows.holding, weights=amounts, minlength=rows)
+    first = np.full(rows, as_of)
+    np.minimum.at(first, flows.holding, flows.dates)
+
+    def metrics(invested, realised, current, first_dates, xirr):
+        with np.errstate(divide="ignore", invalid="ignore"):
+            absolute = np.where(invested > 0, (current + realised) / invested, np.nan)
+            years = (as_of - first_dates).astype(np.float64) / DAYS_PER_YEAR
+            cagr = np.where(
+                (years > 0) & (absolute > -1), (1 + absolute) ** (1 / years) - 1, np.nan
+            )
+        return {
+            "invested": invested,
+            "current_value": current,
+            "absolute_return": absolute,
+            "cagr": cagr,
+            "xirr": xirr,
+        }
+
+    holding = np.concatenate((flows.holding, np.arange(rows)))
+    all_amounts = np.concatenate((amounts, current_values))
+    all_dates = np.concatenate((flows.dates, np.full(rows, as_of)))
+    day_offsets = (all_dates - first[holding]).astype(np.float64)
+    padded_amounts, padded_days = _pad_flows(holding, rows, all_amounts, day_offsets)
+    result = metrics(
+        invested,
+        realised,
+        current_values,
+        first,
+        xirr_matrix(padded_amounts, padded_days / DAYS_PER_YEAR),
+    )
+
+    portfolio_first = first.min() if rows else as_of
+    portfolio_years = (all_dates - portfolio_first).astype(np.float64) / DAYS_PER_YEAR
+    result["total"] = metrics(
+        invested.sum(keepdims=True),
+        realised.sum(keepdims=True),
+        current_values.sum(keepdims=True),
+        np.array([portfolio_first]),
+        xirr_matrix(all_amounts[None, :], portfolio_years[None, :]),
+    )
+    return result
+
+
+def to_rows(metrics: Dict[str, np.ndarray], decimals: int = 4) -> List[Dict]:
+    """
+    Converts metric arrays into JSON friendly dicts, NaN becomes None.
+    """
+    names = [name for name in metrics if name != "total"]
+    columns = [np.round(metrics[name], decimals).tolist() for name in names]
+    return [
+        {
+            name: (None if value != value else value)
+            for name, value in zip(names, values)
+        }
+        for values in zip(*columns)
+    ]
@@ -0,0 +1,116 @@
+"""
+Native async versions of the upstream-bound endpoints, served under
+``api/v1/async/``. On an ASGI server a request waiting on RapidAPI or the
+database parks a coroutine instead of holding a worker thread.
+
+DRF views are synchronous, so these are plain Django views that speak the
+same request and response formats. Only token authentication is accepted.
+"""
+
+import json
+from typing import Optional
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.http import HttpRequest, JsonResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_GET, require_POST
+from rest_framework.request import Request
+from rest_framework.utils.encoders import JSONEncoder
+
+from api.authentication import aauthenticate_token
+from api.catalogue import aresolve_fund, catalogue_queryset, scheme_from_row
+from api.ledger import record_buy
+from api.models import MutualFund
+from api.pagination import CataloguePagination
+from api.serializers import UserFundsSerializer
+from api.utils import aget_single_fund_details
+
+
+def json_response(data, status: int = 200) -> JsonResponse:
+    return JsonResponse(data, status=status, safe=False, encoder=JSONEncoder)
+
+
+async def authenticate_token(request: HttpRequest) -> Optional[User]:
+    keyword, _, key = request.headers.get("Authorization", "").partition(" ")
+    if keyword != "Token" or not key.strip():
+        return None
+    return await aauthenticate_token(key.strip())
+
+
+def not_authenticated() -> JsonResponse:
+    response = json_response(
+        {"detail": "Authentication credentials were not provided."}, status=401
+    )
+    response["WWW-Authenticate"] = "Token"
+    return response
+
+
+@require_GET
+async def list_mutual_funds(request: HttpRequest) -> JsonResponse:
+    """
+    Async ``ListMutualFundsView``, with the same filters, projection and
+    pagination.
+    """
+    if not await authenticate_token(request):
+        return not_authenticated()
+    params = request.GET
+    schemes = catalogue_queryset(
+        fields=params.get("fields", "").split(","),
+        scheme_type=params.get("scheme_type"),
+        category=params.get("category"),
+        family=params.get("family"),
+        name_prefix=params.get("name"),
+    )
+    paginator = CataloguePagination()
+    paginator.request = Request(request)
+    paginator.limit = paginator.get_limit(paginator.request)
+    paginator.offset = paginator.get_offset(paginator.request)
+    paginator.count = await schemes.acount()
+    page = schemes[paginator.offset : paginator.offset + paginator.limit]
+    return json_response(
+        {
+            "count": paginator.count,
+            "next": paginator.get_next_link(),
+            "previous": paginator.get_previous_link(),
+            "results": [scheme_from_row(row) async for row in page],
+        }
+    )
+
+
+@csrf_exempt
+@require_POST
+async def add_fund(request: HttpRequest) -> JsonResponse:
+    """
+    Async ``AddFundsView``, the upstream fallback is awaited.
+    """
+    user = await authenticate_token(request)
+    if not user:
+        return not_authenticated()
+    if request.content_type == "application/json":
+        try:
+            data = json.loads(request.body or b"{}")
+        except ValueError as e:
+            return json_response({"detail": f"JSON parse error - {e}"}, status=400)
+    else:
+        data = request.POST.dict()
+    serializer = UserFundsSerializer(data=data)
+    if not serializer.is_valid():
+        return json_response(serializer.errors, status=400)
+    scheme_code = serializer.validated_data["scheme_Code"]
+    quantity = serializer.validated_data["quantity"]
+
+    fund = await MutualFund.objects.filter(scheme_Code=scheme_code).afirst()
+    if not fund:
+        if not settings.MF_CATALOGUE_UPSTREAM_FALLBACK:
+            return json_response({"error": "Unknown scheme code"}, status=404)
+        try:
+            fund = await aresolve_fund(scheme_code, fetch=aget_single_fund_details)
+        except (KeyError, ValueError):
+            return json_response({"error": "Invalid fund details"}, status=400)
+        if not fund:
+            return json_response({"error": "Failed to fetch fund details"}, status=500)
+
+    await sync_to_async(record_buy)(user, fund, quantity)
+    return json_response({"message": "Funds added successfully"}, status=201)
@@ -0,0 +1,141 @@
+"""
+Token authentication with the token to user id mapping and a snapshot of
+the user kept in the cache for ``AUTH_TOKEN_CACHE_TTL`` seconds, so an
+authenticated request with a warm cache runs no query at all. Every
+snapshot carries the version of its user it was read under, saving the
+user drops that version (see ``api.signals``) and the next request reads
+the user again. Token entries are dropped on logout and when the token is
+deleted. Enabling it requires a cache shared by all processes, see
+``api.checks``.
+"""
+
+import hashlib
+import uuid
+from typing import Optional, Tuple
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+# Every column but the password, which stays deferred and is read from the
+# database on access. In model order, as ``from_db`` expects.
+SNAPSHOT_FIELDS = tuple(
+    field.attname
+    for field in User._meta.concrete_fields
+    if field.attname not in ("id", "password")
+)
+
+
+def token_cache_key(key: str) -> str:
+    # Hashed, so raw tokens never end up in a shared cache
+    return "auth_token:" + hashlib.sha256(key.encode()).hexdigest()
+
+
+def user_cache_keys(user_id: int) -> Tuple[str, str]:
+    """
+    The keys of a user's snapshot and of its current version.
+    """
+    return f"auth_user:{user_id}", f"auth_user:{user_id}:version"
+
+
+def invalidate_token(key: str) -> None:
+    cache.delete(token_cache_key(key))
+
+
+def invalidate_user(user_id: int) -> None:
+    """
+    Outdates the cached snapshot of the user, in every process sharing the
+    cache.
+    """
+    cache.delete(user_cache_keys(user_id)[1])
+
+
+def snapshot(user: User) -> list:
+    return [getattr(user, field) for field in SNAPSHOT_FIELDS]
+
+
+def user_from_snapshot(user_id: int, values: list) -> User:
+    return User.from_db(DEFAULT_DB_ALIAS, ["id", *SNAPSHOT_FIELDS], [user_id, *values])
+
+
+def _new_version() -> str:
+    return uuid.uuid4().hex
+
+
+def cached_user(user_id: int) -> Optional[User]:
+    """
+    The active user from its cached snapshot, or from the database when the
+    snapshot is missing or outdated. The version is read before the user,
+    so a save racing the read leaves an outdated snapshot behind.
+    """
+    ttl = settings.AUTH_TOKEN_CACHE_TTL
+    user_key, version_key = user_cache_keys(user_id)
+    entries = cache.get_many([user_key, version_key])
+    version = entries.get(version_key)
+    if version is not None and entries.get(user_key, (None,))[0] == version:
+        return user_from_snapshot(user_id, entries[user_key][1])
+    if version is None:
+        cache.add(version_key, _new_version(), ttl)
+        version = cache.get(version_key)
+    user = User.objects.filter(pk=user_id, is_active=True).first()
+    if user is not None and version is not None:
+        cache.set(user_key, (version, snapshot(user)), ttl)
+    return user
+
+
+async def acached_user(user_id: int) -> Optional[User]:
+    """
+    Async ``cached_user``.
+    """
+    ttl = settings.AUTH_TOKEN_CACHE_TTL
+    user_key, version_key = user_cache_keys(user_id)
+    entries = await cache.aget_many([user_key, version_key])
+    version = entries.get(version_key)
+    if version is not None and entries.get(user_key, (None,))[0] == version:
+        return user_from_snapshot(user_id, entries[user_key][1])
+    if version is None:
+        await cache.aadd(version_key, _new_version(), ttl)
+        version = await cache.aget(version_key)
+    user = await User.objects.filter(pk=user_id, is_active=True).afirst()
+    if user is not None and version is not None:
+        await cache.aset(user_key, (version, snapshot(user)), ttl)
+    return user
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    def authenticate_credentials(self, key: str) -> Tuple[User, Token]:
+        if settings.AUTH_TOKEN_CACHE_TTL <= 0:
+            return super().authenticate_credentials(key)
+        cache_key = token_cache_key(key)
+        user_id = cache.get(cache_key)
+        if user_id is None:
+            user, token = super().authenticate_credentials(key)
+            cache.set(cache_key, user.pk, settings.AUTH_TOKEN_CACHE_TTL)
+            return user, token
+        user = cached_user(user_id)
+        if user is None:
+            invalidate_token(key)
+            raise exceptions.AuthenticationFailed(_("User inactive or deleted."))
+        return user, Token(key=key, user=user)
+
+
+async def aauthenticate_token(key: str) -> Optional[User]:
+    """
+    Async token lookup sharing the cache of ``CachedTokenAuthentication``.
+    """
+    ttl = settings.AUTH_TOKEN_CACHE_TTL
+    cache_key = token_cache_key(key)
+    user_id = await cache.aget(cache_key) if ttl > 0 else None
+    if user_id is not None:
+        return await acached_user(user_id)
+    token = await Token.objects.select_related("user").filter(key=key).afirst()
+    if token is None or not token.user.is_active:
+        return None
+    if ttl > 0:
+        await cache.aset(cache_key, token.user.pk, ttl)
+    return token.user
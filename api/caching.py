@@ -0,0 +1,211 @@
+import asyncio
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+import weakref
+from datetime import timedelta
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from api.models import JobLease
+
+logger = logging.getLogger(__name__)
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    """
+    Collapses concurrent calls with the same key into one.
+
+    Callers in this process wait for the leading call and share its result
+    or exception. Across processes the leader holds a lock in the cache
+    backend (``cache.add``), the others wait for it to be released and then
+    run ``fn`` themselves, so ``fn`` must first look for the outcome the
+    leader left behind (e.g. a row it inserted) before doing the work.
+    """
+
+    poll_interval = 0.05
+
+    def __init__(self, namespace: str):
+        self.namespace = namespace
+        self.lock = threading.Lock()
+        self.calls: Dict[str, _Call] = {}
+        self.async_calls = weakref.WeakKeyDictionary()
+        self.counter_lock = threading.Lock()
+        self.reset_stats()
+
+    @property
+    def lock_timeout(self) -> int:
+        return settings.CACHE_LOCK_TIMEOUT
+
+    def reset_stats(self) -> None:
+        self.counts = {"calls": 0, "shared": 0, "remote_waits": 0}
+
+    def stats(self) -> Dict[str, int]:
+        with self.counter_lock:
+            return dict(self.counts)
+
+    def _count(self, name: str) -> None:
+        with self.counter_lock:
+            self.counts[name] += 1
+
+    def lock_key(self, key: str) -> str:
+        return f"{self.namespace}:{key}:lock"
+
+    def do(self, key: str, fn: Callable[[], Any]) -> Any:
+        with self.lock:
+            call = self.calls.get(key)
+            leader = call is None
+            if leader:
+                call = self.calls[key] = _Call()
+        if not leader:
+            self._count("shared")
+            call.done.wait()
+            if call.error:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = self._lead(key, fn)
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self.lock:
+                del self.calls[key]
+            call.done.set()
+
+    def _lead(self, key: str, fn: Callable[[], Any]) -> Any:
+        lock_key = self.lock_key(key)
+        deadline = time.monotonic() + self.lock_timeout
+        while True:
+            token = uuid.uuid4().hex
+            if cache.add(lock_key, token, timeout=self.lock_timeout):
+                try:
+                    self._count("calls")
+                    return fn()
+                finally:
+                    if cache.get(lock_key) == token:
+                        cache.delete(lock_key)
+            self._count("remote_waits")
+            while cache.get(lock_key) is not None:
+                if time.monotonic() >= deadline:
+                    logger.warning(f"Timed out waiting for {lock_key}")
+                    return fn()
+                time.sleep(self.poll_interval)
+
+    async def ado(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Async ``do``, coroutines of the same event loop share one call.
+        """
+        loop = asyncio.get_running_loop()
+        calls = self.async_calls.setdefault(loop, {})
+        future = calls.get(key)
+        if future is not None:
+            self._count("shared")
+            return await asyncio.shield(future)
+
+        future = calls[key] = loop.create_future()
+        try:
+            result = await self._alead(key, fn)
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Mark it retrieved, the leader re-raises it below
+            future.exception()
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            del calls[key]
+
+    async def _alead(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        lock_key = self.lock_key(key)
+        deadline = time.monotonic() + self.lock_timeout
+        while True:
+            token = uuid.uuid4().hex
+            if await cache.aadd(lock_key, token, timeout=self.lock_timeout):
+                try:
+                    self._count("calls")
+                    return await fn()
+                finally:
+                    if await cache.aget(lock_key) == token:
+                        await cache.adelete(lock_key)
+            self._count("remote_waits")
+            while await cache.aget(lock_key) is not None:
+                if time.monotonic() >= deadline:
+                    logger.warning(f"Timed out waiting for {lock_key}")
+                    return await fn()
+                await asyncio.sleep(self.poll_interval)
+
+
+class Lease:
+    """
+    A named lease, so only one of several nodes runs a job at a time. The
+    holder renews it while it works, a node that stops renewing loses the
+    lease after ``ttl`` seconds and another takes over. The lease is a
+    database row every node sees, taken and renewed by conditional UPDATEs
+    so a node never extends a lease another one took over.
+    """
+
+    def __init__(self, name: str, ttl: int):
+        self.name = name
+        self.ttl = ttl
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+    def holder(self) -> Optional[str]:
+        return (
+            JobLease.objects.filter(name=self.name, expires_at__gt=timezone.now())
+            .values_list("owner", flat=True)
+            .first()
+        )
+
+    def acquire(self) -> bool:
+        """
+        Takes the lease if it is free or expired, or renews it if already held.
+        """
+        now = timezone.now()
+        expires_at = now + timedelta(seconds=self.ttl)
+        if (
+            JobLease.objects.filter(Q(owner=self.owner) | Q(expires_at__lte=now))
+            .filter(name=self.name)
+            .update(owner=self.owner, expires_at=expires_at)
+        ):
+            return True
+        try:
+            with transaction.atomic():
+                JobLease.objects.create(
+                    name=self.name, owner=self.owner, expires_at=expires_at
+                )
+        except IntegrityError:
+            return False
+        return True
+
+    def renew(self) -> bool:
+        now = timezone.now()
+        return bool(
+            JobLease.objects.filter(
+                name=self.name, owner=self.owner, expires_at__gt=now
+            ).update(expires_at=now + timedelta(seconds=self.ttl))
+        )
+
+    def release(self) -> None:
+        JobLease.objects.filter(name=self.name, owner=self.owner).delete()
@@ -0,0 +1,348 @@
+import logging
+import re
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import date, datetime
+from decimal import Decimal, InvalidOperation
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import QuerySet, Value
+from django.db.models.functions import Upper
+
+from api.caching import SingleFlight
+from api.fields import NAV_QUANTUM
+from api.fund_stats import refresh_fund_stats
+from api.history import record_nav_points
+from api.metrics import register_cache_stats
+from api.models import MutualFund
+from api.search import invalidate_search_index
+from api.snapshots import propagate_nav_changes
+
+logger = logging.getLogger(__name__)
+
+# Upstream payload keys and the MutualFund columns they are stored in
+SCHEME_FIELDS = {
+    "Scheme_Code": "scheme_Code",
+    "ISIN_Div_Payout_ISIN_Growth": "isin",
+    "ISIN_Div_Reinvestment": "isin_reinvestment",
+    "Scheme_Name": "name",
+    "Net_Asset_Value": "nav",
+    "Date": "nav_date",
+    "Scheme_Type": "scheme_type",
+    "Scheme_Category": "category",
+    "Mutual_Fund_Family": "family",
+}
+UPSERT_FIELDS = [
+    column for column in SCHEME_FIELDS.values() if column != "scheme_Code"
+] + ["updated_at"]
+NAV_DATE_FORMAT = "%d-%b-%Y"
+
+scheme_lookups = SingleFlight("scheme_lookup")
+register_cache_stats("scheme_lookups", scheme_lookups.stats)
+
+
+def parse_nav_date(value: Optional[str]) -> Optional[date]:
+    try:
+        return datetime.strptime(value, NAV_DATE_FORMAT).date()
+    except (TypeError, ValueError):
+        return None
+
+
+def parse_nav(value) -> Decimal:
+    """
+    Parses an upstream NAV, e.g. ``"12.3456"`` or ``12.3456``, at NAV
+    precision. Raises ``ValueError`` for anything but a finite non-negative
+    number, such as ``"N.A."``.
+    """
+    try:
+        nav = Decimal(str(value))
+    except InvalidOperation:
+        raise ValueError(f"Invalid NAV {value!r}")
+    if not nav.is_finite() or nav < 0:
+        raise ValueError(f"Invalid NAV {value!r}")
+    return nav.quantize(NAV_QUANTUM)
+
+
+def fund_from_scheme(scheme: Dict) -> MutualFund:
+    """
+    Builds an unsaved MutualFund from an upstream scheme record. Raises
+    ``KeyError`` for incomplete records and ``ValueError`` for a malformed
+    NAV.
+    """
+    isin = scheme.get("ISIN_Div_Payout_ISIN_Growth") or ""
+    isin_reinvestment = scheme.get("ISIN_Div_Reinvestment") or ""
+    return MutualFund(
+        scheme_Code=str(scheme["Scheme_Code"]),
+        name=scheme["Scheme_Name"],
+        nav=parse_nav(scheme["Net_Asset_Value"]),
+        nav_date=parse_nav_date(scheme.get("Date")),
+        family=scheme.get("Mutual_Fund_Family") or "",
+        scheme_type=scheme.get("Scheme_Type") or "",
+        category=scheme.get("Scheme_Category") or "",
+        isin="" if isin == "-" else isin,
+        isin_reinvestment="" if isin_reinvestment == "-" else isin_reinvestment,
+    )
+
+
+def scheme_from_row(row: Dict) -> Dict:
+    """
+    Renders a ``MutualFund.values()`` row in the upstream payload shape.
+    """
+    scheme = {}
+    for key, column in SCHEME_FIELDS.items():
+        if column not in row:
+            continue
+        value = row[column]
+        if column == "scheme_Code":
+            value = int(value) if value.isdigit() else value
+        elif column == "nav_date":
+            value = value.strftime(NAV_DATE_FORMAT) if value else None
+        elif column in ("isin", "isin_reinvestment"):
+            value = value or "-"
+        scheme[key] = value
+    return scheme
+
+
+def filter_name_prefix(queryset: QuerySet, prefix: str) -> QuerySet:
+    """
+    Funds whose name starts with ``prefix``, ignoring case. A LIKE cannot use
+    the ``Upper("name")`` index (SQLite folds case in LIKE, PostgreSQL needs a
+    pattern operator class), so the upper-cased name is also bounded by a
+    range on the leading letters and digits of the prefix, which it can.
+    """
+    queryset = queryset.alias(upper_name=Upper("name")).filter(
+        upper_name__startswith=Upper(Value(prefix))
+    )
+    # Letters and digits are never ignored by linguistic collations, and
+    # bumping a trailing Z or 9 would give punctuation that may be
+    stem = re.match(r"[A-Za-z0-9]*", prefix).group().upper().rstrip("Z9")
+    if not stem:
+        return queryset
+    return queryset.filter(
+        upper_name__gte=stem, upper_name__lt=stem[:-1] + chr(ord(stem[-1]) + 1)
+    )
+
+
+def catalogue_queryset(
+    fields: Optional[List[str]] = None,
+    scheme_type: Optional[str] = None,
+    category: Optional[str] = None,
+    family: Optional[str] = None,
+    name_prefix: Optional[str] = None,
+) -> QuerySet:
+    """
+    Returns the locally stored catalogue as ``values()`` rows, restricted to
+    the requested upstream fields and filters.
+    """
+    columns = [SCHEME_FIELDS[field] for field in fields or [] if field in SCHEME_FIELDS]
+    queryset = MutualFund.objects.order_by("id")
+    if scheme_type:
+        queryset = queryset.filter(scheme_type=scheme_type)
+    if category:
+        queryset = queryset.filter(category=category)
+    if family:
+        queryset = queryset.filter(family=family)
+    if name_prefix:
+        queryset = filter_name_prefix(queryset, name_prefix)
+    return queryset.values(*(columns or SCHEME_FIELDS.values()))
+
+
+@dataclass
+class IngestStats:
+    received: int = 0
+    upserted: int = 0
+    skipped: int = 0
+
+
+def lock_navs(scheme_codes: Iterable[str]) -> Dict[str, Tuple[int, Decimal]]:
+    """
+    Locks the funds of the scheme codes until the end of the transaction
+    and returns their id and stored NAV by scheme code. NAV changes taken
+    from these are applied once even when writers overlap.
+    """
+    return {
+        scheme_code: (fund_id, nav)
+        for fund_id, scheme_code, nav in MutualFund.objects.select_for_update()
+        .filter(scheme_Code__in=list(scheme_codes))
+        .order_by("pk")
+        .values_list("id", "scheme_Code", "nav")
+    }
+
+
+def ingest_schemes(schemes: Iterable[Dict], chunk_size: int = 500) -> IngestStats:
+    """
+    Upserts upstream scheme records into MutualFund in chunks, so the whole
+    catalogue never has to be held in memory, and records each NAV in the
+    history.
+    """
+    stats = IngestStats()
+    chunk: Dict[str, MutualFund] = {}
+
+    def flush():
+        with transaction.atomic():
+            nav_changes = {
+                fund_id: chunk[scheme_code].nav - nav
+                for scheme_code, (fund_id, nav) in lock_navs(chunk).items()
+            }
+            propagate_nav_changes(nav_changes)
+            MutualFund.objects.bulk_create(
+                chunk.values(),
+                update_conflicts=True,
+                unique_fields=["scheme_Code"],
+                update_fields=UPSERT_FIELDS,
+            )
+        funds = list(
+            MutualFund.objects.filter(scheme_Code__in=chunk.keys()).only(
+                "id", "nav", "nav_date"
+            )
+        )
+        record_nav_points(funds)
+        refresh_fund_stats(nav_changes)
+        stats.upserted += len(chunk)
+        chunk.clear()
+
+    for scheme in schemes:
+        stats.received += 1
+        try:
+            fund = fund_from_scheme(scheme)
+        except (KeyError, TypeError, ValueError):
+            stats.skipped += 1
+            continue
+        chunk[fund.scheme_Code] = fund
+        if len(chunk) >= chunk_size:
+            flush()
+    if chunk:
+        flush()
+    if stats.upserted:
+        invalidate_search_index()
+    logger.info(f"Ingested {stats.upserted} schemes, skipped {stats.skipped}")
+    return stats
+
+
+def resolve_funds(
+    scheme_codes: Iterable[str],
+    fetch: Optional[Callable[[str], Optional[Dict]]] = None,
+    workers: int = 8,
+) -> Dict[str, MutualFund]:
+    """
+    Maps scheme codes to funds with one catalogue query. Codes missing from
+    the catalogue are looked up concurrently with ``fetch`` when given and
+    inserted with a single bulk insert, codes that cannot be resolved are
+    left out of the result.
+    """
+    codes = set(map(str, scheme_codes))
+    funds = {
+        fund.scheme_Code: fund
+        for fund in MutualFund.objects.filter(scheme_Code__in=codes)
+    }
+    missing = sorted(codes - funds.keys())
+    if not missing or fetch is None:
+        return funds
+    known_missing = cache.get_many([missing_key(code) for code in missing])
+    missing = [code for code in missing if missing_key(code) not in known_missing]
+
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(missing)))) as pool:
+        fetched = list(pool.map(fetch, missing))
+    new_funds = []
+    for code, details in zip(missing, fetched):
+        if not details:
+            remember_missing(code)
+            continue
+        try:
+            fund = fund_from_scheme(details)
+        except (KeyError, TypeError, ValueError):
+            logger.warning(f"Invalid fund details for scheme {code}")
+            continue
+        fund.scheme_Code = code
+        new_funds.append(fund)
+    if new_funds:
+        MutualFund.objects.bulk_create(new_funds, ignore_conflicts=True)
+        created = MutualFund.objects.filter(
+            scheme_Code__in=[fund.scheme_Code for fund in new_funds]
+        )
+        for fund in created:
+            funds[fund.scheme_Code] = fund
+        invalidate_search_index()
+    return funds
+
+
+def missing_key(scheme_code: str) -> str:
+    return f"scheme_lookup:{scheme_code}:missing"
+
+
+def remember_missing(scheme_code: str) -> None:
+    cache.set(
+        missing_key(scheme_code), True, timeout=settings.SCHEME_LOOKUP_NEGATIVE_TTL
+    )
+
+
+def _defaults(fund: MutualFund) -> Dict:
+    return {
+        field: getattr(fund, field) for field in UPSERT_FIELDS if field != "updated_at"
+    }
+
+
+def resolve_fund(
+    scheme_code: str, fetch: Callable[[str], Optional[Dict]]
+) -> Optional[MutualFund]:
+    """
+    Returns the fund for a scheme code, fetching and inserting it when it is
+    not in the catalogue yet. Concurrent lookups of the same code, in this
+    process or others sharing the cache backend, make one upstream call and
+    one insert. Codes upstream does not know are remembered for
+    ``SCHEME_LOOKUP_NEGATIVE_TTL`` seconds. Raises ``KeyError`` or
+    ``ValueError`` for incomplete or malformed upstream records.
+    """
+    scheme_code = str(scheme_code)
+    fund = MutualFund.objects.filter(scheme_Code=scheme_code).first()
+    if fund:
+        return fund
+
+    def fetch_and_insert() -> Optional[MutualFund]:
+        fund = MutualFund.objects.filter(scheme_Code=scheme_code).first()
+        if fund or cache.get(missing_key(scheme_code)):
+            return fund
+        details = fetch(scheme_code)
+        if not details:
+            remember_missing(scheme_code)
+            return None
+        fund, _ = MutualFund.objects.get_or_create(
+            scheme_Code=scheme_code, defaults=_defaults(fund_from_scheme(details))
+        )
+        return fund
+
+    return scheme_lookups.do(scheme_code, fetch_and_insert)
+
+
+async def aresolve_fund(
+    scheme_code: str, fetch: Callable[[str], Awaitable[Optional[Dict]]]
+) -> Optional[MutualFund]:
+    """
+    Async ``resolve_fund``.
+    """
+    scheme_code = str(scheme_code)
+    fund = await MutualFund.objects.filter(scheme_Code=scheme_code).afirst()
+    if fund:
+        return fund
+
+    async def fetch_and_insert() -> Optional[MutualFund]:
+        fund = await MutualFund.objects.filter(scheme_Code=scheme_code).afirst()
+        if fund or await cache.aget(missing_key(scheme_code)):
+            return fund
+        details = await fetch(scheme_code)
+        if not details:
+            await cache.aset(
+                missing_key(scheme_code),
+                True,
+                timeout=settings.SCHEME_LOOKUP_NEGATIVE_TTL,
+            )
+            return None
+        fund, _ = await MutualFund.objects.aget_or_create(
+            scheme_Code=scheme_code, defaults=_defaults(fund_from_scheme(details))
+        )
+        return fund
+
+    return await scheme_lookups.ado(scheme_code, fetch_and_insert)
@@ -0,0 +1,37 @@
+"""
+System checks for features that keep state in the default cache and are
+only correct when every process reads the same cache.
+"""
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.checks import Error, register
+
+
+def cache_is_shared(alias: str = "default") -> bool:
+    """
+    Whether the cache is seen by every process, i.e. neither local memory
+    nor the dummy backend.
+    """
+    return not isinstance(caches[alias], (LocMemCache, DummyCache))
+
+
+@register()
+def check_token_cache(app_configs, **kwargs):
+    classes = settings.REST_FRAMEWORK.get("DEFAULT_AUTHENTICATION_CLASSES", [])
+    if (
+        "api.authentication.CachedTokenAuthentication" in classes
+        and settings.AUTH_TOKEN_CACHE_TTL > 0
+        and not cache_is_shared()
+    ):
+        return [
+            Error(
+                "AUTH_TOKEN_CACHE_TTL needs a cache shared by all processes.",
+                hint="Set CACHE_BACKEND to e.g. Redis, or AUTH_TOKEN_CACHE_TTL "
+                "to 0, so logging out revokes a token in every worker.",
+                id="api.E001",
+            )
+        ]
+    return []
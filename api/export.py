@@ -0,0 +1,155 @@
+"""
+Streaming exports of holdings and the fund catalogue.
+
+Rows are read with ``.iterator(chunk_size=...)`` (a server-side cursor on
+PostgreSQL) and encoded as NDJSON or CSV, optionally gzipped, one buffer at
+a time, so memory use does not depend on the number of rows exported. NAVs
+and values are read as integer units and formatted without building a
+Decimal per row.
+"""
+
+import csv
+import json
+import zlib
+from typing import Dict, Iterable, Iterator, List
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import BigIntegerField, ExpressionWrapper, F, QuerySet
+
+from api.fields import format_units, nav_units
+from api.models import MutualFund, UserFunds
+
+FORMATS = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+HOLDING_FIELDS = [
+    "id",
+    "username",
+    "scheme_Code",
+    "mf_name",
+    "quantity",
+    "invested",
+    "nav",
+    "nav_date",
+    "current_value",
+    "updated_at",
+]
+CATALOGUE_FIELDS = [
+    "scheme_Code",
+    "name",
+    "nav",
+    "nav_date",
+    "family",
+    "scheme_type",
+    "category",
+    "isin",
+    "isin_reinvestment",
+]
+# Exported fields read as integer NAV units, and the row keys holding them
+SCALED_FIELDS = {"nav": "nav_units", "current_value": "value_units"}
+# Encoded rows are collected up to this many bytes before being yielded
+BUFFER_SIZE = 64 * 1024
+
+
+def holdings_rows(user=None) -> QuerySet:
+    """
+    Holdings of one user, or of every user, as ``values()`` rows.
+    """
+    holdings = UserFunds.objects.all()
+    if user is not None:
+        holdings = holdings.filter(user=user)
+    return holdings.order_by("id").values(
+        "id",
+        "quantity",
+        "invested",
+        "updated_at",
+        username=F("user__username"),
+        scheme_Code=F("mutual_fund__scheme_Code"),
+        mf_name=F("mutual_fund__name"),
+        nav_units=nav_units("mutual_fund__nav"),
+        nav_date=F("mutual_fund__nav_date"),
+        value_units=ExpressionWrapper(
+            F("quantity") * F("mutual_fund__nav"), output_field=BigIntegerField()
+        ),
+    )
+
+
+def catalogue_rows() -> QuerySet:
+    return MutualFund.objects.order_by("id").values(
+        *(name for name in CATALOGUE_FIELDS if name not in SCALED_FIELDS),
+        nav_units=nav_units("nav"),
+    )
+
+
+class _Echo:
+    """
+    File-like object handing back what ``csv.writer`` writes to it.
+    """
+
+    def write(self, value: str) -> str:
+        return value
+
+
+def _cell(row: Dict, name: str):
+    if name not in SCALED_FIELDS:
+        return row[name]
+    units = row[SCALED_FIELDS[name]]
+    return None if units is None else format_units(units)
+
+
+def encode_rows(rows: Iterable[Dict], fields: List[str], fmt: str) -> Iterator[str]:
+    if fmt == "ndjson":
+        for row in rows:
+            yield json.dumps(
+                {name: _cell(row, name) for name in fields}, cls=DjangoJSONEncoder
+            ) + "\n"
+    elif fmt == "csv":
+        writer = csv.writer(_Echo())
+        yield writer.writerow(fields)
+        for row in rows:
+            yield writer.writerow([_cell(row, name) for name in fields])
+    else:
+        raise ValueError(f"Unsupported export format {fmt!r}")
+
+
+def buffered(chunks: Iterable[str], size: int = BUFFER_SIZE) -> Iterator[bytes]:
+    """
+    Joins small encoded rows into buffers of about ``size`` bytes.
+    """
+    buffer, length = [], 0
+    for chunk in chunks:
+        data = chunk.encode()
+        buffer.append(data)
+        length += len(data)
+        if length >= size:
+            yield b"".join(buffer)
+            buffer, length = [], 0
+    if buffer:
+        yield b"".join(buffer)
+
+
+def gzipped(chunks: Iterable[bytes]) -> Iterator[bytes]:
+    compressor = zlib.compressobj(wbits=31)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def export_stream(
+    rows: QuerySet,
+    fields: List[str],
+    fmt: str = "ndjson",
+    compress: bool = False,
+    chunk_size: int = 2000,
+) -> Iterator[bytes]:
+    """
+    Encodes ``rows`` as they are read from the database.
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Unsupported export format {fmt!r}")
+    stream = buffered(encode_rows(rows.iterator(chunk_size=chunk_size), fields, fmt))
+    return gzipped(stream) if compress else stream
+
+
+def export_filename(name: str, fmt: str, compress: bool) -> str:
+    return f"{name}.{fmt}" + (".gz" if compress else "")
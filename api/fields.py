@@ -0,0 +1,97 @@
+"""
+NAVs stored as scaled integers.
+
+A NAV of 12.3456 is kept as 123456 units of 1/10**NAV_PLACES in a BIGINT
+column, so it is exact on every database and ``quantity * nav`` and its sums
+are computed by the database as exact integers. Models and the API keep
+seeing ``Decimal`` values, bulk valuations read the raw units with
+``nav_units`` and work on integer arrays.
+"""
+
+from decimal import ROUND_HALF_EVEN, Decimal, InvalidOperation
+from typing import Optional
+
+from django.core import exceptions
+from django.db import models
+from django.db.models import Expression, ExpressionWrapper, F
+
+# Upstream NAVs are quoted with up to four decimals
+NAV_PLACES = 4
+NAV_SCALE = 10**NAV_PLACES
+NAV_QUANTUM = Decimal(1).scaleb(-NAV_PLACES)
+
+
+def to_units(value, places: int = NAV_PLACES) -> int:
+    """
+    Scales a Decimal, int, float or numeric string to integer units,
+    rounding half to even beyond ``places`` decimals.
+    """
+    if isinstance(value, float):
+        value = repr(value)
+    return int(Decimal(value).scaleb(places).to_integral_value(ROUND_HALF_EVEN))
+
+
+def from_units(units: int, places: int = NAV_PLACES) -> Decimal:
+    return Decimal(units).scaleb(-places)
+
+
+def format_units(units: int, places: int = NAV_PLACES) -> str:
+    """
+    Renders integer units as a decimal string without building a Decimal.
+    """
+    digits = str(abs(units)).rjust(places + 1, "0")
+    return ("-" if units < 0 else "") + digits[:-places] + "." + digits[-places:]
+
+
+class ScaledDecimalField(models.BigIntegerField):
+    """
+    Decimal value with ``places`` decimals stored as an integer number of
+    1/10**places units.
+    """
+
+    description = "Decimal number stored as scaled integer"
+
+    def __init__(self, *args, places: int = NAV_PLACES, **kwargs):
+        self.places = places
+        super().__init__(*args, **kwargs)
+
+    def deconstruct(self):
+        name, path, args, kwargs = super().deconstruct()
+        if self.places != NAV_PLACES:
+            kwargs["places"] = self.places
+        return name, path, args, kwargs
+
+    def from_db_value(self, value, expression, connection) -> Optional[Decimal]:
+        if value is None:
+            return None
+        return from_units(int(value), self.places)
+
+    def to_python(self, value) -> Optional[Decimal]:
+        if value is None or isinstance(value, Decimal):
+            return value
+        try:
+            return Decimal(repr(value) if isinstance(value, float) else str(value))
+        except InvalidOperation:
+            raise exceptions.ValidationError(
+                self.error_messages["invalid"],
+                code="invalid",
+                params={"value": value},
+            )
+
+    def get_prep_value(self, value) -> Optional[int]:
+        if value is None or isinstance(value, Expression):
+            return value
+        return to_units(self.to_python(value), self.places)
+
+    def formfield(self, **kwargs):
+        return models.DecimalField(max_digits=18, decimal_places=self.places).formfield(
+            **kwargs
+        )
+
+
+def nav_units(name: str) -> ExpressionWrapper:
+    """
+    The raw integer units of a scaled field, e.g. ``mutual_fund__nav``, for
+    arithmetic on integer arrays.
+    """
+    return ExpressionWrapper(F(name), output_field=models.BigIntegerField())
@@ -0,0 +1,164 @@
+"""
+Fund level aggregates across all users: holders, units, invested amount and
+AUM per scheme.
+
+All funds are computed by one grouped query, read from the covering
+``holding_fund_totals_idx`` index, and stored in the ``FundStats`` table for
+``FUND_STATS_TTL`` seconds, so every process reads the same aggregates.
+``update_nav`` recomputes the rows of the funds it changed, so their AUM
+follows every NAV update without a full pass over the holdings.
+"""
+
+import heapq
+from datetime import datetime
+from decimal import Decimal
+from operator import itemgetter
+from typing import Dict, Iterable, List, Optional
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F, Min, Sum
+from django.utils import timezone
+
+from api.models import FundStats, UserFunds
+
+STORED_FIELDS = ["holders", "units", "invested", "aum"]
+ORDERS = ("aum", "holders", "units", "invested")
+CENT = Decimal("0.01")
+# Funds per recomputing query after a NAV update
+REFRESH_CHUNK = 500
+
+
+def compute_fund_stats(fund_ids: Optional[Iterable[int]] = None) -> Dict[int, Dict]:
+    """
+    Aggregates the holdings of every held fund, or of the given funds, with
+    a single grouped query.
+    """
+    holdings = UserFunds.objects.filter(quantity__gt=0)
+    if fund_ids is not None:
+        holdings = holdings.filter(mutual_fund_id__in=fund_ids)
+    stats = {}
+    for row in (
+        holdings.order_by()
+        .values(
+            "mutual_fund_id",
+            "mutual_fund__scheme_Code",
+            "mutual_fund__name",
+            "mutual_fund__nav",
+        )
+        .annotate(holders=Count("*"), units=Sum("quantity"), invested=Sum("invested"))
+    ):
+        nav = row["mutual_fund__nav"]
+        stats[row["mutual_fund_id"]] = {
+            "scheme_Code": row["mutual_fund__scheme_Code"],
+            "name": row["mutual_fund__name"],
+            "nav": nav,
+            "holders": row["holders"],
+            "units": row["units"],
+            "invested": row["invested"].quantize(CENT),
+            "aum": (row["units"] * nav).quantize(CENT),
+        }
+    return stats
+
+
+def _remaining_ttl(computed_at: datetime) -> float:
+    return settings.FUND_STATS_TTL - (timezone.now() - computed_at).total_seconds()
+
+
+def _store(
+    funds: Dict[int, Dict],
+    computed_at: datetime,
+    fund_ids: Optional[Iterable[int]] = None,
+) -> None:
+    """
+    Replaces the stored rows of every fund, or of the given funds, with
+    ``funds``. Funds no longer held lose their row.
+    """
+    rows = FundStats.objects.all()
+    if fund_ids is not None:
+        rows = rows.filter(mutual_fund_id__in=fund_ids)
+    with transaction.atomic():
+        rows.exclude(mutual_fund_id__in=funds.keys()).delete()
+        FundStats.objects.bulk_create(
+            [
+                FundStats(
+                    mutual_fund_id=fund_id,
+                    computed_at=computed_at,
+                    **{field: fund[field] for field in STORED_FIELDS},
+                )
+                for fund_id, fund in funds.items()
+            ],
+            batch_size=REFRESH_CHUNK,
+            update_conflicts=True,
+            unique_fields=["mutual_fund"],
+            update_fields=STORED_FIELDS + ["computed_at"],
+        )
+
+
+def stored_fund_stats() -> Dict[int, Dict]:
+    """
+    Reads the stored aggregates with one query, by fund id.
+    """
+    return {
+        row.pop("mutual_fund_id"): row
+        for row in FundStats.objects.values(
+            "mutual_fund_id",
+            "computed_at",
+            *STORED_FIELDS,
+            scheme_Code=F("mutual_fund__scheme_Code"),
+            name=F("mutual_fund__name"),
+            nav=F("mutual_fund__nav"),
+        )
+    }
+
+
+def fund_stats(refresh: bool = False) -> Dict:
+    """
+    Returns ``{"computed_at", "funds"}`` with the aggregates of every held
+    fund by fund id, from the table unless they expired or ``refresh`` is
+    set.
+    """
+    funds = {} if refresh else stored_fund_stats()
+    computed_at = min(
+        (fund.pop("computed_at") for fund in funds.values()), default=None
+    )
+    if computed_at is None or _remaining_ttl(computed_at) <= 0:
+        computed_at = timezone.now()
+        funds = compute_fund_stats()
+        _store(funds, computed_at)
+    return {"computed_at": computed_at, "funds": funds}
+
+
+def refresh_fund_stats(fund_ids: Iterable[int]) -> None:
+    """
+    Recomputes the stored aggregates of the given funds, e.g. after their
+    NAV changed. Does nothing while nothing is stored, the next read
+    computes every fund anyway. The rows keep the time of the last full
+    computation, so holding changes of other funds still show up in time.
+    """
+    computed_at = FundStats.objects.aggregate(computed_at=Min("computed_at"))[
+        "computed_at"
+    ]
+    if computed_at is None:
+        return
+    fund_ids = list(fund_ids)
+    for start in range(0, len(fund_ids), REFRESH_CHUNK):
+        chunk = fund_ids[start : start + REFRESH_CHUNK]
+        _store(compute_fund_stats(chunk), computed_at, chunk)
+
+
+def summarize(funds: Dict[int, Dict]) -> Dict:
+    return {
+        "funds": len(funds),
+        "holdings": sum(fund["holders"] for fund in funds.values()),
+        "invested": sum((fund["invested"] for fund in funds.values()), Decimal(0)),
+        "aum": sum((fund["aum"] for fund in funds.values()), Decimal(0)),
+    }
+
+
+def top_funds(funds: Dict[int, Dict], order: str = "aum", limit: int = 20) -> List:
+    """
+    The ``limit`` funds with the largest ``order`` value, without sorting
+    every fund.
+    """
+    return heapq.nlargest(limit, funds.values(), key=itemgetter(order))
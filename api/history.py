@@ -0,0 +1,77 @@
+from datetime import date
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from api.models import MutualFund, NavHistory
+
+
+def record_nav_points(funds: Iterable[MutualFund], chunk_size: int = 1000) -> int:
+    """
+    Appends the current NAV of every fund to its history. Idempotent on
+    (scheme, date): re-running a refresh on the same day overwrites that
+    day's point instead of adding a new one. Funds without a NAV date are
+    skipped.
+    """
+    points = [
+        NavHistory(mutual_fund_id=fund.pk, date=fund.nav_date, nav=fund.nav)
+        for fund in funds
+        if fund.nav_date
+    ]
+    NavHistory.objects.bulk_create(
+        points,
+        batch_size=chunk_size,
+        update_conflicts=True,
+        unique_fields=["mutual_fund", "date"],
+        update_fields=["nav"],
+    )
+    return len(points)
+
+
+def nav_series(
+    fund_id: int, start: Optional[date] = None, end: Optional[date] = None
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Returns the NAV history of a fund between ``start`` and ``end``
+    (inclusive) as a ``datetime64[D]`` array of dates and a ``float64``
+    array of NAVs, ordered by date.
+    """
+    queryset = NavHistory.objects.filter(mutual_fund_id=fund_id)
+    if start:
+        queryset = queryset.filter(date__gte=start)
+    if end:
+        queryset = queryset.filter(date__lte=end)
+    rows = list(queryset.order_by("date").values_list("date", "nav"))
+    dates = np.array([row[0] for row in rows], dtype="datetime64[D]")
+    navs = np.fromiter((row[1] for row in rows), dtype=np.float64, count=len(rows))
+    return dates, navs
+
+
+def nav_series_many(
+    fund_ids: Sequence[int], start: Optional[date] = None, end: Optional[date] = None
+) -> Dict[int, Tuple[np.ndarray, np.ndarray]]:
+    """
+    Same as ``nav_series`` for several funds with a single range query.
+    """
+    queryset = NavHistory.objects.filter(mutual_fund_id__in=fund_ids)
+    if start:
+        queryset = queryset.filter(date__gte=start)
+    if end:
+        queryset = queryset.filter(date__lte=end)
+    grouped: Dict[int, Tuple[List[date], List]] = {
+        fund_id: ([], []) for fund_id in fund_ids
+    }
+    rows = queryset.order_by("mutual_fund_id", "date").values_list(
+        "mutual_fund_id", "date", "nav"
+    )
+    for fund_id, day, nav in rows.iterator(chunk_size=10000):
+        dates, navs = grouped[fund_id]
+        dates.append(day)
+        navs.append(nav)
+    return {
+        fund_id: (
+            np.array(dates, dtype="datetime64[D]"),
+            np.array(navs, dtype=np.float64),
+        )
+        for fund_id, (dates, navs) in grouped.items()
+    }
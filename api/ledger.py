@@ -0,0 +1,234 @@
+from collections import defaultdict
+from datetime import date
+from decimal import Decimal
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from api.models import FundTransaction, MutualFund, UserFunds
+from api.snapshots import ensure_snapshots, rebuild_snapshots, record_holding_change
+
+HOLDING_UPSERT_FIELDS = ["quantity", "invested", "updated_at"]
+CENT = Decimal("0.01")
+
+
+class InsufficientUnits(Exception):
+    pass
+
+
+def record_buy(
+    user,
+    fund: MutualFund,
+    units: int,
+    nav: Optional[Decimal] = None,
+    on: Optional[date] = None,
+) -> FundTransaction:
+    """
+    Appends a purchase to the ledger and adds it to the holding with a single
+    atomic UPDATE, so concurrent purchases can never overwrite each other.
+    """
+    nav = fund.nav if nav is None else nav
+    with transaction.atomic():
+        ensure_snapshots([user.pk])
+        entry = FundTransaction.objects.create(
+            user=user,
+            mutual_fund=fund,
+            kind=FundTransaction.BUY,
+            units=units,
+            nav=nav,
+            date=on or timezone.localdate(),
+        )
+        holding, _ = UserFunds.objects.get_or_create(user=user, mutual_fund=fund)
+        UserFunds.objects.filter(pk=holding.pk).update(
+            quantity=F("quantity") + units,
+            invested=F("invested") + units * Decimal(str(nav)),
+            updated_at=timezone.now(),
+        )
+        record_holding_change(
+            user.pk, units * Decimal(str(nav)), units * Decimal(str(fund.nav))
+        )
+    return entry
+
+
+def record_buys(
+    user, purchases: List[Tuple[MutualFund, int]], on: Optional[date] = None
+) -> List[FundTransaction]:
+    """
+    Records many purchases for one user at the funds' current NAV in a single
+    transaction: one bulk insert into the ledger, one insert of the missing
+    holdings and one bulk update of the locked holding rows.
+    """
+    on = on or timezone.localdate()
+    entries = [
+        FundTransaction(
+            user=user,
+            mutual_fund=fund,
+            kind=FundTransaction.BUY,
+            units=units,
+            nav=fund.nav,
+            date=on,
+        )
+        for fund, units in purchases
+    ]
+    totals: Dict[int, Tuple[int, Decimal]] = {}
+    for entry in entries:
+        units, invested = totals.get(entry.mutual_fund_id, (0, Decimal(0)))
+        totals[entry.mutual_fund_id] = (
+            units + entry.units,
+            invested + entry.units * Decimal(str(entry.nav)),
+        )
+    with transaction.atomic():
+        ensure_snapshots([user.pk])
+        FundTransaction.objects.bulk_create(entries)
+        UserFunds.objects.bulk_create(
+            [UserFunds(user=user, mutual_fund_id=fund_id) for fund_id in totals],
+            ignore_conflicts=True,
+        )
+        holdings = list(
+            UserFunds.objects.select_for_update().filter(
+                user=user, mutual_fund_id__in=totals
+            )
+        )
+        now = timezone.now()
+        for holding in holdings:
+            units, invested = totals[holding.mutual_fund_id]
+            holding.quantity += units
+            holding.invested += invested
+            holding.updated_at = now
+        UserFunds.objects.bulk_update(holdings, HOLDING_UPSERT_FIELDS)
+        record_holding_change(
+            user.pk,
+            sum((invested for _, invested in totals.values()), Decimal(0)),
+            sum(
+                (units * Decimal(str(fund.nav)) for fund, units in purchases),
+                Decimal(0),
+            ),
+        )
+    return entries
+
+
+def record_sell(
+    user,
+    fund: MutualFund,
+    units: int,
+    nav: Optional[Decimal] = None,
+    on: Optional[date] = None,
+    retries: int = 5,
+) -> FundTransaction:
+    """
+    Appends a sale to the ledger. The holding row is locked where the
+    database supports it and only updated while its quantity is unchanged,
+    so a concurrent sale can never be lost. The remaining units keep their
+    average cost.
+    """
+    nav = fund.nav if nav is None else nav
+    for _ in range(retries):
+        with transaction.atomic():
+            ensure_snapshots([user.pk])
+            holding = (
+                UserFunds.objects.select_for_update()
+                .filter(user=user, mutual_fund=fund)
+                .first()
+            )
+            if not holding or holding.quantity < units:
+                raise InsufficientUnits(f"Not enough units of {fund.scheme_Code} held")
+            remaining = holding.quantity - units
+            invested = (holding.invested * remaining / holding.quantity).quantize(CENT)
+            updated = UserFunds.objects.filter(
+                pk=holding.pk, quantity=holding.quantity
+            ).update(quantity=remaining, invested=invested, updated_at=timezone.now())
+            if updated:
+                record_holding_change(
+                    user.pk,
+                    invested - holding.invested,
+                    -units * Decimal(str(fund.nav)),
+                )
+                return FundTransaction.objects.create(
+                    user=user,
+                    mutual_fund=fund,
+                    kind=FundTransaction.SELL,
+                    units=units,
+                    nav=nav,
+                    date=on or timezone.localdate(),
+                )
+    raise InsufficientUnits(f"Holding of {fund.scheme_Code} kept changing, retry")
+
+
+def replay(entries: Iterable[FundTransaction]) -> Tuple[int, Decimal]:
+    """
+    Folds ledger entries, ordered by date, into the units held and their
+    average cost.
+    """
+    quantity, invested = 0, Decimal(0)
+    for entry in entries:
+        if entry.kind == FundTransaction.BUY:
+            quantity += entry.units
+            invested += entry.units * Decimal(str(entry.nav))
+        elif entry.kind == FundTransaction.SELL:
+            if entry.units > quantity:
+                raise InsufficientUnits(
+                    f"Sale of {entry.units} units on {entry.date} exceeds holding"
+                )
+            invested -= invested * entry.units / quantity
+            quantity -= entry.units
+        else:
+            raise ValueError(f"Unknown ledger entry kind {entry.kind!r}")
+    return quantity, invested.quantize(CENT)
+
+
+def rebuild_holdings(pairs: Set[Tuple[int, int]], batch_size: int = 1000) -> int:
+    """
+    Recomputes the holdings of the given (user_id, mutual_fund_id) pairs from
+    the ledger and writes them with one upsert per batch.
+    """
+    if not pairs:
+        return 0
+    user_ids = {user_id for user_id, _ in pairs}
+    fund_ids = {fund_id for _, fund_id in pairs}
+    entries: Dict[Tuple[int, int], List[FundTransaction]] = defaultdict(list)
+    ledger = (
+        FundTransaction.objects.filter(
+            user_id__in=user_ids, mutual_fund_id__in=fund_ids
+        )
+        .order_by("date", "id")
+        .only("user_id", "mutual_fund_id", "kind", "units", "nav", "date")
+    )
+    for entry in ledger.iterator(chunk_size=10000):
+        key = (entry.user_id, entry.mutual_fund_id)
+        if key in pairs:
+            entries[key].append(entry)
+
+    holdings = []
+    for user_id, fund_id in pairs:
+        quantity, invested = replay(entries[(user_id, fund_id)])
+        holdings.append(
+            UserFunds(
+                user_id=user_id,
+                mutual_fund_id=fund_id,
+                quantity=quantity,
+                invested=invested,
+            )
+        )
+    UserFunds.objects.bulk_create(
+        holdings,
+        batch_size=batch_size,
+        update_conflicts=True,
+        unique_fields=["user", "mutual_fund"],
+        update_fields=HOLDING_UPSERT_FIELDS,
+    )
+    rebuild_snapshots(user_ids)
+    return len(holdings)
+
+
+def import_transactions(entries: List[FundTransaction], batch_size: int = 5000) -> int:
+    """
+    Bulk loads ledger entries, e.g. from broker statements, and rebuilds the
+    affected holdings. Runs in one transaction, so a statement that would
+    sell more units than held is rejected as a whole.
+    """
+    with transaction.atomic():
+        FundTransaction.objects.bulk_create(entries, batch_size=batch_size)
+        rebuild_holdings({(entry.user_id, entry.mutual_fund_id) for entry in entries})
+    return len(entries)
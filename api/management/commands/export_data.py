@@ -0,0 +1,69 @@
+import sys
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from api.export import (
+    CATALOGUE_FIELDS,
+    FORMATS,
+    HOLDING_FIELDS,
+    catalogue_rows,
+    export_stream,
+    holdings_rows,
+)
+
+DATASETS = {
+    "holdings": (holdings_rows, HOLDING_FIELDS),
+    "catalogue": (catalogue_rows, CATALOGUE_FIELDS),
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Streams every user's holdings or the fund catalogue to a file as "
+        "NDJSON or CSV, optionally gzipped"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("dataset", choices=sorted(DATASETS))
+        parser.add_argument(
+            "--output", default="-", help="File to write, - for standard output"
+        )
+        parser.add_argument("--format", choices=sorted(FORMATS), default="ndjson")
+        parser.add_argument("--gzip", action="store_true", help="Gzip the output")
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=settings.EXPORT_CHUNK_SIZE,
+            help="Rows fetched from the database per round trip",
+        )
+
+    def handle(self, *args, **options):
+        rows, fields = DATASETS[options["dataset"]]
+        stream = export_stream(
+            rows(),
+            fields,
+            options["format"],
+            compress=options["gzip"],
+            chunk_size=options["chunk_size"],
+        )
+        started = time.perf_counter()
+        written = 0
+        if options["output"] == "-":
+            for chunk in stream:
+                sys.stdout.buffer.write(chunk)
+            sys.stdout.buffer.flush()
+            return
+        try:
+            with open(options["output"], "wb") as f:
+                for chunk in stream:
+                    f.write(chunk)
+                    written += len(chunk)
+        except OSError as e:
+            raise CommandError(f"Cannot write {options['output']}: {e}")
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Exported {options['dataset']} to {options['output']} "
+                f"({written} bytes in {time.perf_counter() - started:.2f}s)"
+            )
+        )
@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand
+
+from api.fund_stats import ORDERS, fund_stats, summarize, top_funds
+
+
+class Command(BaseCommand):
+    help = "Prints AUM, holders and units of the largest funds across all users"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--order", choices=ORDERS, default="aum", help="Value to rank funds by"
+        )
+        parser.add_argument(
+            "--limit", type=int, default=20, help="Number of funds printed"
+        )
+        parser.add_argument(
+            "--refresh",
+            action="store_true",
+            help="Recompute every fund instead of reading the stored aggregates",
+        )
+
+    def handle(self, *args, **options):
+        stats = fund_stats(refresh=options["refresh"])
+        totals = summarize(stats["funds"])
+        self.stdout.write(
+            f"{'Scheme':<12} {'Holders':>9} {'Units':>14} {'Invested':>18} "
+            f"{'AUM':>18}  Name"
+        )
+        for fund in top_funds(stats["funds"], options["order"], options["limit"]):
+            self.stdout.write(
+                f"{fund['scheme_Code']:<12} {fund['holders']:>9} {fund['units']:>14} "
+                f"{fund['invested']:>18} {fund['aum']:>18}  {fund['name']}"
+            )
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{totals['funds']} funds, {totals['holdings']} holdings, "
+                f"AUM {totals['aum']}, computed at {stats['computed_at']:%Y-%m-%d %H:%M:%S}"
+            )
+        )
@@ -0,0 +1,81 @@
+import csv
+from datetime import date
+from decimal import Decimal, InvalidOperation
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from api.ledger import InsufficientUnits, import_transactions
+from api.models import FundTransaction, MutualFund
+
+COLUMNS = ("user", "scheme_code", "kind", "units", "nav", "date")
+KINDS = {FundTransaction.BUY, FundTransaction.SELL}
+
+
+class Command(BaseCommand):
+    help = (
+        "Bulk imports broker statements into the transaction ledger. The CSV "
+        "needs the columns user, scheme_code, kind (buy/sell), units, nav and "
+        "date (YYYY-MM-DD)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="CSV file to import")
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=5000,
+            help="Number of ledger entries written per bulk insert",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            with open(options["path"], newline="") as f:
+                reader = csv.DictReader(f)
+                missing = set(COLUMNS) - set(reader.fieldnames or [])
+                if missing:
+                    raise CommandError(f"Missing columns: {', '.join(sorted(missing))}")
+                rows = list(reader)
+        except OSError as e:
+            raise CommandError(f"Cannot read {options['path']}: {e}")
+        users = dict(
+            get_user_model()
+            .objects.filter(username__in={row["user"] for row in rows})
+            .values_list("username", "id")
+        )
+        funds = dict(
+            MutualFund.objects.filter(
+                scheme_Code__in={row["scheme_code"] for row in rows}
+            ).values_list("scheme_Code", "id")
+        )
+        entries = []
+        for line, row in enumerate(rows, start=2):
+            if row["user"] not in users or row["scheme_code"] not in funds:
+                raise CommandError(f"Line {line}: unknown user or scheme code")
+            try:
+                kind = row["kind"].strip().lower()
+                units = int(row["units"])
+                nav = Decimal(row["nav"])
+                on = date.fromisoformat(row["date"])
+            except (AttributeError, TypeError, ValueError, InvalidOperation) as e:
+                raise CommandError(f"Line {line}: invalid value: {e}")
+            if kind not in KINDS:
+                raise CommandError(
+                    f"Line {line}: kind must be buy or sell, not {row['kind']!r}"
+                )
+            if units <= 0 or not nav.is_finite() or nav <= 0:
+                raise CommandError(f"Line {line}: units and nav must be positive")
+            entries.append(
+                FundTransaction(
+                    user_id=users[row["user"]],
+                    mutual_fund_id=funds[row["scheme_code"]],
+                    kind=kind,
+                    units=units,
+                    nav=nav,
+                    date=on,
+                )
+            )
+        try:
+            imported = import_transactions(entries, batch_size=options["batch_size"])
+        except InsufficientUnits as e:
+            raise CommandError(f"Import rejected: {e}")
+        self.stdout.write(self.style.SUCCESS(f"Imported {imported} ledger entries"))
@@ -0,0 +1,67 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from api.catalogue import ingest_schemes
+from api.utils import catalogue_sources, iter_catalogue
+
+
+class Command(BaseCommand):
+    help = "Streams the upstream fund catalogue into the local database"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--family",
+            action="append",
+            dest="families",
+            help="Fund family to ingest, repeat for several. "
+            "Defaults to MF_CATALOGUE_FAMILIES",
+        )
+        parser.add_argument(
+            "--scheme-type",
+            action="append",
+            dest="scheme_types",
+            help="Upstream scheme type to ingest, repeat for several. "
+            "Defaults to MF_CATALOGUE_SCHEME_TYPES",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=settings.MF_CATALOGUE_MAX_CONCURRENCY,
+            help="Families streamed concurrently",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=settings.NAV_REFRESH_CHUNK_SIZE,
+            help="Number of schemes written per bulk upsert",
+        )
+
+    def handle(self, *args, **options):
+        sources = catalogue_sources()
+        families = options["families"] or list(dict.fromkeys(f for f, _ in sources))
+        scheme_types = options["scheme_types"] or list(
+            dict.fromkeys(t for _, t in sources)
+        )
+        sources = [(f, t) for f in families for t in scheme_types]
+        received = dict.fromkeys(sources, 0)
+        self.stdout.write(f"Ingesting {len(sources)} families and scheme types...")
+
+        def schemes():
+            for source, scheme in iter_catalogue(sources, options["workers"]):
+                received[source] += 1
+                yield scheme
+
+        stats = ingest_schemes(schemes(), chunk_size=options["chunk_size"])
+        for (family, scheme_type), count in received.items():
+            if not count:
+                self.stdout.write(
+                    self.style.ERROR(
+                        f"No schemes received for {family} ({scheme_type})"
+                    )
+                )
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Ingested {stats.upserted} schemes from "
+                f"{sum(1 for count in received.values() if count)} sources, "
+                f"skipped {stats.skipped} invalid records"
+            )
+        )
@@ -0,0 +1,44 @@
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from api.snapshots import rebuild_snapshots
+
+
+class Command(BaseCommand):
+    help = (
+        "Recomputes today's portfolio snapshots from the holdings, e.g. after "
+        "holdings were edited outside the ledger. Past days are left as they are"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "usernames", nargs="*", help="Users to rebuild, all holders by default"
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Number of users computed and written per query",
+        )
+
+    def handle(self, *args, **options):
+        user_ids = None
+        if options["usernames"]:
+            users = dict(
+                get_user_model()
+                .objects.filter(username__in=options["usernames"])
+                .values_list("username", "id")
+            )
+            unknown = sorted(set(options["usernames"]) - users.keys())
+            if unknown:
+                raise CommandError(f"Unknown users: {', '.join(unknown)}")
+            user_ids = users.values()
+        started = time.perf_counter()
+        rebuilt = rebuild_snapshots(user_ids, batch_size=options["batch_size"])
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Rebuilt {rebuilt} snapshots in {time.perf_counter() - started:.2f}s"
+            )
+        )
@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+from api.stub_upstream import StubUpstreamServer
+
+
+class Command(BaseCommand):
+    help = "Runs a local stub of the RapidAPI mutual fund endpoint"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--port", type=int, default=8001)
+        parser.add_argument(
+            "--schemes", type=int, default=1000, help="Number of fake schemes"
+        )
+        parser.add_argument(
+            "--latency", type=float, default=0.0, help="Seconds to wait per request"
+        )
+
+    def handle(self, *args, **options):
+        server = StubUpstreamServer(
+            ("127.0.0.1", options["port"]),
+            schemes=options["schemes"],
+            latency=options["latency"],
+        )
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Serving {options['schemes']} schemes at {server.url}, "
+                "point RAPID_API_URL at it"
+            )
+        )
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
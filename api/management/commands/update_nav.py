@@ -1,33 +1,99 @@
+from functools import partial
+
+from django.conf import settings
 from django.core.management.base import BaseCommand
+from api.metrics import start_http_server
 from api.models import MutualFund
-from api.utils import get_single_fund_details
+from api.nav_refresh import iter_funds, refresh_navs, stale_funds, sync_by_family
+from api.scheduler import NavScheduler
 
 
 class Command(BaseCommand):
     help = "Updates NAV values for mutual funds"
 
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=settings.NAV_REFRESH_WORKERS,
+            help="Number of concurrent upstream requests",
+        )
+        parser.add_argument(
+            "--rate-limit",
+            type=float,
+            default=settings.NAV_REFRESH_RATE_LIMIT,
+            help="Maximum upstream requests per second, 0 for unlimited",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=settings.NAV_REFRESH_CHUNK_SIZE,
+            help="Number of funds written per bulk update",
+        )
+        parser.add_argument(
+            "--by-family",
+            action="store_true",
+            help="Fetch each fund family once instead of every scheme separately",
+        )
+        parser.add_argument(
+            "--incremental",
+            action="store_true",
+            help="Only fetch funds whose NAV is older than the latest published NAV date",
+        )
+        parser.add_argument(
+            "--daemon",
+            action="store_true",
+            help="Keep running and refresh stale funds on a schedule, "
+            "only the node holding the lease does the work",
+        )
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=settings.NAV_SCHEDULER_INTERVAL,
+            help="Seconds between scheduled refreshes in daemon mode",
+        )
+        parser.add_argument(
+            "--metrics-port",
+            type=int,
+            help="Serve Prometheus metrics of the daemon on this local port",
+        )
+
     def handle(self, *args, **options):
+        refresh = partial(
+            sync_by_family if options["by_family"] else refresh_navs,
+            workers=options["workers"],
+            rate_limit=options["rate_limit"],
+            chunk_size=options["chunk_size"],
+        )
+        funds = MutualFund.objects.only(
+            "id", "name", "scheme_Code", "nav", "nav_date", "family", "scheme_type"
+        )
+        if options["daemon"]:
+            self.stdout.write(self.style.SUCCESS("Scheduling NAV updates..."))
+            if options["metrics_port"]:
+                start_http_server(options["metrics_port"])
+            scheduler = NavScheduler(
+                refresh,
+                funds=funds,
+                interval=options["interval"],
+                chunk_size=options["chunk_size"],
+            )
+            try:
+                scheduler.run(report=self.report)
+            except KeyboardInterrupt:
+                pass
+            return
+
         self.stdout.write(self.style.SUCCESS("Updating NAV values..."))
-        funds = MutualFund.objects.all()
-        for fund in funds:
-            self.stdout.write(f"Updating NAV for {fund.name}")
-            scheme_code = fund.scheme_Code
-            fund_details = get_single_fund_details(scheme_code=scheme_code)
-            if fund_details:
-                try:
-                    nav = fund_details["Net_Asset_Value"]
-                    self.style.SUCCESS("Updated NAV for {fund.name}")
-                    fund.nav = nav
-                    fund.save()
-                    self.stdout.write(
-                        self.style.SUCCESS(f"Updated NAV for {fund.name}")
-                    )
-                except KeyError:
-                    self.stdout.write(
-                        self.style.ERROR(f"Invalid fund details for {scheme_code}")
-                    )
-            else:
-                self.stdout.write(
-                    self.style.ERROR(f"Failed to fetch fund details for {scheme_code}")
-                )
-        self.stdout.write(self.style.SUCCESS("NAV update completed."))
+        if options["incremental"]:
+            funds = stale_funds(funds)
+        self.report(refresh(iter_funds(funds, options["chunk_size"])))
+
+    def report(self, stats):
+        for scheme_code in stats.failures:
+            self.stdout.write(
+                self.style.ERROR(f"Failed to fetch fund details for {scheme_code}")
+            )
+        self.stdout.write(
+            self.style.SUCCESS(f"NAV update completed: {stats.summary()}")
+        )
@@ -0,0 +1,398 @@
+"""
+In-process metrics exposed in the Prometheus text format.
+
+Counters and histograms are plain dictionaries guarded by a lock, cheap
+enough to stay on in production. Every process keeps its own values, so
+scrape each worker (or run one worker per scrape target). Values kept
+elsewhere, like the hit counts of the caches, are read at scrape time by
+collectors.
+"""
+
+import threading
+import time
+from abc import ABC, abstractmethod
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+LATENCY_BUCKETS = (
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200)
+
+# A collector returns (name, type, help, [(labels, value), ...]) families
+Family = Tuple[str, str, str, List[Tuple[Dict[str, str], float]]]
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    pairs = ",".join(
+        '{}="{}"'.format(
+            name,
+            str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"),
+        )
+        for name, value in labels.items()
+    )
+    return "{" + pairs + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric(ABC):
+    type = ""
+
+    def __init__(self, name: str, documentation: str, labels: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(labels)
+        self.lock = threading.Lock()
+        self.values: Dict[Tuple, object] = {}
+
+    def _key(self, labels: Dict[str, str]) -> Tuple:
+        return tuple(str(labels[name]) for name in self.label_names)
+
+    def _labels(self, key: Tuple) -> Dict[str, str]:
+        return dict(zip(self.label_names, key))
+
+    def reset(self) -> None:
+        with self.lock:
+            self.values.clear()
+
+    @abstractmethod
+    def samples(self) -> Iterator[Tuple[str, Dict[str, str], float]]:
+        """
+        The ``(sample name, labels, value)`` triples of the metric.
+        """
+
+    def render(self) -> List[str]:
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.type}",
+        ]
+        for name, labels, value in self.samples():
+            lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+        return lines
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        with self.lock:
+            return self.values.get(self._key(labels), 0)
+
+    def samples(self):
+        with self.lock:
+            items = list(self.values.items())
+        for key, value in items:
+            yield self.name, self._labels(key), value
+
+
+class Gauge(Counter):
+    type = "gauge"
+
+    def set(self, value: float, **labels) -> None:
+        with self.lock:
+            self.values[self._key(labels)] = value
+
+
+class Histogram(Metric):
+    type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labels: Iterable[str] = (),
+        buckets: Iterable[float] = LATENCY_BUCKETS,
+    ):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self.lock:
+            state = self.values.get(key)
+            if state is None:
+                # Per bucket counts (the last one is +Inf), sum and count
+                state = self.values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def count(self, **labels) -> int:
+        with self.lock:
+            state = self.values.get(self._key(labels))
+            return state[2] if state else 0
+
+    def sum(self, **labels) -> float:
+        with self.lock:
+            state = self.values.get(self._key(labels))
+            return state[1] if state else 0.0
+
+    def samples(self):
+        with self.lock:
+            items = [
+                (key, (list(state[0]), state[1], state[2]))
+                for key, state in self.values.items()
+            ]
+        for key, (counts, total, count) in items:
+            labels = self._labels(key)
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                yield (
+                    f"{self.name}_bucket",
+                    {**labels, "le": _format_value(float(bound))},
+                    cumulative,
+                )
+            yield f"{self.name}_sum", labels, total
+            yield f"{self.name}_count", labels, count
+
+
+class Registry:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.metrics: Dict[str, Metric] = {}
+        self.collectors: List[Callable[[], Iterable[Family]]] = []
+
+    def register(self, metric: Metric) -> Metric:
+        with self.lock:
+            self.metrics.setdefault(metric.name, metric)
+            return self.metrics[metric.name]
+
+    def counter(self, name: str, documentation: str, labels=()) -> Counter:
+        return self.register(Counter(name, documentation, labels))
+
+    def gauge(self, name: str, documentation: str, labels=()) -> Gauge:
+        return self.register(Gauge(name, documentation, labels))
+
+    def histogram(
+        self, name: str, documentation: str, labels=(), buckets=LATENCY_BUCKETS
+    ) -> Histogram:
+        return self.register(Histogram(name, documentation, labels, buckets))
+
+    def collector(self, fn: Callable[[], Iterable[Family]]):
+        """
+        Registers a function called at scrape time, usable as a decorator.
+        """
+        with self.lock:
+            self.collectors.append(fn)
+        return fn
+
+    def reset(self) -> None:
+        for metric in list(self.metrics.values()):
+            metric.reset()
+
+    def render(self) -> str:
+        lines = []
+        for metric in list(self.metrics.values()):
+            lines.extend(metric.render())
+        for collect in list(self.collectors):
+            for name, metric_type, documentation, samples in collect():
+                lines.append(f"# HELP {name} {documentation}")
+                lines.append(f"# TYPE {name} {metric_type}")
+                for labels, value in samples:
+                    lines.append(
+                        f"{name}{_format_labels(labels)} {_format_value(value)}"
+                    )
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+# HTTP
+http_requests = REGISTRY.counter(
+    "http_requests_total", "Requests handled.", ["view", "method", "status"]
+)
+http_request_duration = REGISTRY.histogram(
+    "http_request_duration_seconds", "Request latency.", ["view", "method"]
+)
+http_request_queries = REGISTRY.histogram(
+    "http_request_db_queries",
+    "Database queries per request.",
+    ["view"],
+    buckets=COUNT_BUCKETS,
+)
+http_request_db_duration = REGISTRY.histogram(
+    "http_request_db_duration_seconds", "Database time per request.", ["view"]
+)
+
+# Upstream
+upstream_request_duration = REGISTRY.histogram(
+    "upstream_request_duration_seconds",
+    "Upstream call latency including retries.",
+    ["helper", "outcome"],
+)
+upstream_attempts = REGISTRY.counter(
+    "upstream_attempts_total", "Upstream HTTP attempts.", ["helper", "status"]
+)
+
+# In-process statistics of the caches, read at scrape time
+_cache_stats: Dict[str, Callable[[], Dict[str, int]]] = {}
+HIT_EVENTS = ("hits", "stale_hits", "not_modified")
+
+
+def register_cache_stats(name: str, stats: Callable[[], Dict[str, int]]) -> None:
+    _cache_stats[name] = stats
+
+
+def hit_ratio(stats: Dict[str, int]) -> float:
+    hits = sum(stats.get(event, 0) for event in HIT_EVENTS)
+    total = hits + stats.get("misses", 0)
+    return hits / total if total else 0.0
+
+
+@REGISTRY.collector
+def collect_cache_stats() -> Iterator[Family]:
+    events, ratios = [], []
+    for name, stats in list(_cache_stats.items()):
+        counts = stats()
+        for event, value in counts.items():
+            events.append(({"cache": name, "event": event}, value))
+        if "misses" in counts:
+            ratios.append(({"cache": name}, hit_ratio(counts)))
+    yield "cache_events_total", "counter", "Cache events.", events
+    yield "cache_hit_ratio", "gauge", "Share of lookups served from cache.", ratios
+
+
+# list_portfolio responses, reported with the cache statistics
+portfolio_cache_events = Counter(
+    "portfolio_cache_events", "list_portfolio response cache events.", ["event"]
+)
+register_cache_stats(
+    "portfolio",
+    lambda: {
+        event: portfolio_cache_events.value(event=event)
+        for event in ("hits", "misses", "not_modified")
+    },
+)
+
+
+# NAV refresh
+nav_refresh_batch_duration = REGISTRY.histogram(
+    "nav_refresh_batch_duration_seconds",
+    "Time to fetch and write one chunk of funds.",
+    ["mode"],
+)
+nav_refresh_funds = REGISTRY.counter(
+    "nav_refresh_funds_total", "Funds processed by update_nav.", ["mode", "result"]
+)
+nav_refresh_throughput = REGISTRY.gauge(
+    "nav_refresh_throughput_funds_per_second",
+    "Throughput of the last update_nav run.",
+    ["mode"],
+)
+
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def render(registry: Optional[Registry] = None) -> str:
+    return (registry or REGISTRY).render()
+
+
+class QueryStats:
+    __slots__ = ("count", "duration")
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+
+# Set while a request is handled, asgiref copies it into sync_to_async threads
+_query_stats: ContextVar[Optional[QueryStats]] = ContextVar("query_stats", default=None)
+
+
+def count_queries(execute, sql, params, many, context):
+    """
+    Database execute wrapper adding every query to the current QueryStats,
+    a plain pass-through outside of tracked blocks.
+    """
+    stats = _query_stats.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.count += 1
+        stats.duration += time.perf_counter() - started
+
+
+def install_query_counter(connection) -> None:
+    if count_queries not in connection.execute_wrappers:
+        connection.execute_wrappers.append(count_queries)
+
+
+@receiver(connection_created)
+def install_query_counter_on_connect(sender, connection, **kwargs):
+    install_query_counter(connection)
+
+
+@contextmanager
+def track_queries() -> Iterator[QueryStats]:
+    stats = QueryStats()
+    token = _query_stats.set(stats)
+    try:
+        yield stats
+    finally:
+        _query_stats.reset(token)
+
+
+def start_http_server(port: int, address: str = "127.0.0.1") -> ThreadingHTTPServer:
+    """
+    Serves the metrics of a process without a web server, e.g.
+    ``update_nav --daemon``, on a background thread.
+    """
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            body = render().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", CONTENT_TYPE)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((address, port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
@@ -0,0 +1,54 @@
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+from api import metrics
+
+
+class MetricsMiddleware:
+    """
+    Records latency, status, query count and database time of every request
+    under the name of the matched URL pattern. Works for sync and async
+    views without moving either to another thread.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.METRICS_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        for connection in connections.all(initialized_only=True):
+            metrics.install_query_counter(connection)
+        started = time.perf_counter()
+        with metrics.track_queries() as queries:
+            response = self.get_response(request)
+        self.record(request, response, time.perf_counter() - started, queries)
+        return response
+
+    async def __acall__(self, request):
+        started = time.perf_counter()
+        with metrics.track_queries() as queries:
+            response = await self.get_response(request)
+        self.record(request, response, time.perf_counter() - started, queries)
+        return response
+
+    def record(self, request, response, elapsed, queries) -> None:
+        match = request.resolver_match
+        view = match.view_name if match else "unmatched"
+        metrics.http_requests.inc(
+            view=view, method=request.method, status=response.status_code
+        )
+        metrics.http_request_duration.observe(elapsed, view=view, method=request.method)
+        metrics.http_request_queries.observe(queries.count, view=view)
+        metrics.http_request_db_duration.observe(queries.duration, view=view)
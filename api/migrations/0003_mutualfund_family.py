@@ -0,0 +1,18 @@
+# Generated by Django 5.1.6 on 2026-10-18 16:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0002_alter_userfunds_quantity"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="mutualfund",
+            name="family",
+            field=models.CharField(blank=True, default="", max_length=100),
+        ),
+    ]
@@ -0,0 +1,58 @@
+# Generated by Django 5.1.6 on 2026-10-18 16:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0003_mutualfund_family"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="mutualfund",
+            name="category",
+            field=models.CharField(blank=True, default="", max_length=255),
+        ),
+        migrations.AddField(
+            model_name="mutualfund",
+            name="isin",
+            field=models.CharField(blank=True, default="", max_length=20),
+        ),
+        migrations.AddField(
+            model_name="mutualfund",
+            name="isin_reinvestment",
+            field=models.CharField(blank=True, default="", max_length=20),
+        ),
+        migrations.AddField(
+            model_name="mutualfund",
+            name="nav_date",
+            field=models.DateField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="mutualfund",
+            name="scheme_type",
+            field=models.CharField(blank=True, default="", max_length=100),
+        ),
+        migrations.AlterField(
+            model_name="mutualfund",
+            name="name",
+            field=models.CharField(max_length=255),
+        ),
+        migrations.AddIndex(
+            model_name="mutualfund",
+            index=models.Index(
+                fields=["scheme_type", "category"],
+                name="api_mutualf_scheme__a9ef48_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="mutualfund",
+            index=models.Index(fields=["family"], name="api_mutualf_family_8be8ff_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="mutualfund",
+            index=models.Index(fields=["name"], name="api_mutualf_name_b57ff5_idx"),
+        ),
+    ]
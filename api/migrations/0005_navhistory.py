@@ -0,0 +1,47 @@
+# Generated by Django 5.1.6 on 2026-10-18 17:02
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0004_mutualfund_catalogue_fields"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="NavHistory",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("date", models.DateField()),
+                ("nav", models.DecimalField(decimal_places=2, max_digits=10)),
+                (
+                    "mutual_fund",
+                    models.ForeignKey(
+                        db_index=False,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="nav_history",
+                        to="api.mutualfund",
+                    ),
+                ),
+            ],
+            options={
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("mutual_fund", "date"),
+                        name="unique_nav_per_fund_per_day",
+                    )
+                ],
+            },
+        ),
+    ]
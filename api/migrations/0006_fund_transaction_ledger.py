@@ -0,0 +1,105 @@
+# Generated by Django 5.1.6 on 2026-10-18 17:06
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def open_ledger(apps, schema_editor):
+    """
+    Merges duplicate holdings and records an opening buy at the current NAV
+    for every existing holding, so the ledger explains current quantities.
+    """
+    UserFunds = apps.get_model("api", "UserFunds")
+    FundTransaction = apps.get_model("api", "FundTransaction")
+    holdings = {}
+    for holding in UserFunds.objects.select_related("mutual_fund").order_by("id"):
+        key = (holding.user_id, holding.mutual_fund_id)
+        if key in holdings:
+            holdings[key].quantity += holding.quantity
+            holding.delete()
+            continue
+        holdings[key] = holding
+    for holding in holdings.values():
+        nav = holding.mutual_fund.nav
+        holding.invested = holding.quantity * nav
+        holding.save()
+        if holding.quantity > 0:
+            FundTransaction.objects.create(
+                user_id=holding.user_id,
+                mutual_fund_id=holding.mutual_fund_id,
+                kind="buy",
+                units=holding.quantity,
+                nav=nav,
+                date=holding.created_at.date(),
+            )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0005_navhistory"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="FundTransaction",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "kind",
+                    models.CharField(
+                        choices=[("buy", "Buy"), ("sell", "Sell")], max_length=4
+                    ),
+                ),
+                ("units", models.PositiveIntegerField()),
+                ("nav", models.DecimalField(decimal_places=2, max_digits=10)),
+                ("date", models.DateField()),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name="userfunds",
+            name="invested",
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=20),
+        ),
+        migrations.AddField(
+            model_name="fundtransaction",
+            name="mutual_fund",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE, to="api.mutualfund"
+            ),
+        ),
+        migrations.AddField(
+            model_name="fundtransaction",
+            name="user",
+            field=models.ForeignKey(
+                db_index=False,
+                on_delete=django.db.models.deletion.CASCADE,
+                to=settings.AUTH_USER_MODEL,
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="fundtransaction",
+            index=models.Index(
+                fields=["user", "mutual_fund", "date"],
+                name="api_fundtra_user_id_ac0dc3_idx",
+            ),
+        ),
+        migrations.RunPython(open_ledger, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name="userfunds",
+            constraint=models.UniqueConstraint(
+                fields=("user", "mutual_fund"), name="unique_holding_per_user"
+            ),
+        ),
+    ]
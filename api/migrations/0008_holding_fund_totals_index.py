@@ -0,0 +1,32 @@
+# Generated by Django 5.1.6 on 2026-10-18 18:13
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0007_portfolio_snapshot"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="userfunds",
+            index=models.Index(
+                fields=["mutual_fund", "quantity", "invested"],
+                name="holding_fund_totals_idx",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="userfunds",
+            name="mutual_fund",
+            field=models.ForeignKey(
+                db_index=False,
+                on_delete=django.db.models.deletion.CASCADE,
+                to="api.mutualfund",
+            ),
+        ),
+    ]
@@ -0,0 +1,77 @@
+# Generated by Django 5.1.6 on 2026-10-18 18:16
+
+import api.fields
+from django.db import migrations, models
+from django.db.models import F, Value
+from django.db.models.functions import Cast, Round
+
+MODELS = ["mutualfund", "fundtransaction", "navhistory"]
+
+
+def scale_navs(apps, schema_editor):
+    for name in MODELS:
+        apps.get_model("api", name).objects.update(
+            nav_units=Cast(
+                Round(F("nav") * Value(api.fields.NAV_SCALE)), models.BigIntegerField()
+            )
+        )
+
+
+def unscale_navs(apps, schema_editor):
+    for name in MODELS:
+        apps.get_model("api", name).objects.update(
+            nav=Cast(
+                F("nav_units") * Value(api.fields.NAV_QUANTUM),
+                models.DecimalField(max_digits=10, decimal_places=2),
+            )
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0008_holding_fund_totals_index"),
+    ]
+
+    operations = (
+        [
+            migrations.AddField(
+                model_name=name,
+                name="nav_units",
+                field=models.BigIntegerField(null=True),
+            )
+            for name in MODELS
+        ]
+        + [
+            migrations.AlterField(
+                model_name=name,
+                name="nav",
+                field=models.DecimalField(max_digits=10, decimal_places=2, null=True),
+            )
+            for name in MODELS
+        ]
+        + [migrations.RunPython(scale_navs, unscale_navs)]
+        + [migrations.RemoveField(model_name=name, name="nav") for name in MODELS]
+        + [
+            migrations.RenameField(
+                model_name=name, old_name="nav_units", new_name="nav"
+            )
+            for name in MODELS
+        ]
+        + [
+            migrations.AlterField(
+                model_name=name,
+                name="nav",
+                field=api.fields.ScaledDecimalField(),
+            )
+            for name in MODELS
+        ]
+        + [
+            migrations.AlterField(
+                model_name="portfoliosnapshot",
+                name=name,
+                field=models.DecimalField(decimal_places=4, default=0, max_digits=22),
+            )
+            for name in ("current_value", "day_change")
+        ]
+    )
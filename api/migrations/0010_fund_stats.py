@@ -0,0 +1,34 @@
+# Generated by Django 5.1.6 on 2026-10-18 18:35
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0009_scaled_integer_nav"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="FundStats",
+            fields=[
+                (
+                    "mutual_fund",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="stats",
+                        serialize=False,
+                        to="api.mutualfund",
+                    ),
+                ),
+                ("holders", models.IntegerField()),
+                ("units", models.BigIntegerField()),
+                ("invested", models.DecimalField(decimal_places=2, max_digits=20)),
+                ("aum", models.DecimalField(decimal_places=2, max_digits=22)),
+                ("computed_at", models.DateTimeField()),
+            ],
+        ),
+    ]
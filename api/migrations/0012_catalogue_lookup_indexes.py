@@ -0,0 +1,31 @@
+# Generated by Django 5.1.6 on 2026-10-18 19:17
+
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0011_job_lease"),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name="mutualfund",
+            name="api_mutualf_name_b57ff5_idx",
+        ),
+        migrations.AddIndex(
+            model_name="mutualfund",
+            index=models.Index(
+                fields=["category"], name="api_mutualf_categor_cb5030_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="mutualfund",
+            index=models.Index(
+                django.db.models.functions.text.Upper("name"),
+                name="mutualfund_upper_name_idx",
+            ),
+        ),
+    ]
@@ -1,6 +1,9 @@
 from django.db import models
+from django.db.models.functions import Upper
 from django.contrib.auth.models import User
 
+from api.fields import ScaledDecimalField
+
 
 class DateMixin(models.Model):
 
@@ -12,12 +15,149 @@ class DateMixin(models.Model):
 
 
 class MutualFund(DateMixin):
-    name = models.CharField(max_length=100)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["scheme_type", "category"]),
+            models.Index(fields=["category"]),
+            models.Index(fields=["family"]),
+            # Serves the case-insensitive name prefix lookup, see
+            # api.catalogue.filter_name_prefix
+            models.Index(Upper("name"), name="mutualfund_upper_name_idx"),
+        ]
+
+    name = models.CharField(max_length=255)
     scheme_Code = models.CharField(max_length=100, unique=True)
-    nav = models.DecimalField(max_digits=10, decimal_places=2)
+    nav = ScaledDecimalField()
+    nav_date = models.DateField(null=True, blank=True)
+    family = models.CharField(max_length=100, blank=True, default="")
+    scheme_type = models.CharField(max_length=100, blank=True, default="")
+    category = models.CharField(max_length=255, blank=True, default="")
+    isin = models.CharField(max_length=20, blank=True, default="")
+    isin_reinvestment = models.CharField(max_length=20, blank=True, default="")
 
 
 class UserFunds(DateMixin):
+    """
+    Current holding of a fund, maintained from the FundTransaction ledger.
+    ``invested`` is the average cost of the units still held. The fund index
+    covers quantity and invested, so per fund aggregates never read the
+    table itself.
+    """
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "mutual_fund"], name="unique_holding_per_user"
+            )
+        ]
+        indexes = [
+            models.Index(
+                fields=["mutual_fund", "quantity", "invested"],
+                name="holding_fund_totals_idx",
+            )
+        ]
+
     user = models.ForeignKey(User, on_delete=models.CASCADE)
-    mutual_fund = models.ForeignKey(MutualFund, on_delete=models.CASCADE)
+    mutual_fund = models.ForeignKey(
+        MutualFund, on_delete=models.CASCADE, db_index=False
+    )
     quantity = models.IntegerField(default=0)
+    invested = models.DecimalField(max_digits=20, decimal_places=2, default=0)
+
+
+class FundTransaction(models.Model):
+    """
+    Append-only ledger of purchases and sales.
+    """
+
+    BUY = "buy"
+    SELL = "sell"
+    KIND_CHOICES = [(BUY, "Buy"), (SELL, "Sell")]
+
+    class Meta:
+        indexes = [models.Index(fields=["user", "mutual_fund", "date"])]
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, db_index=False)
+    mutual_fund = models.ForeignKey(MutualFund, on_delete=models.CASCADE)
+    kind = models.CharField(max_length=4, choices=KIND_CHOICES)
+    units = models.PositiveIntegerField()
+    nav = ScaledDecimalField()
+    date = models.DateField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+
+class NavHistory(models.Model):
+    """
+    One NAV point per scheme per day. Kept narrow, without the DateMixin
+    timestamps, and indexed only by the (mutual_fund, date) unique
+    constraint which also serves range scans for a single scheme.
+    """
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["mutual_fund", "date"], name="unique_nav_per_fund_per_day"
+            )
+        ]
+
+    mutual_fund = models.ForeignKey(
+        MutualFund, on_delete=models.CASCADE, related_name="nav_history", db_index=False
+    )
+    date = models.DateField()
+    nav = ScaledDecimalField()
+
+
+class PortfolioSnapshot(models.Model):
+    """
+    A user's portfolio totals at the end of one day, the row of the current
+    day is kept up to date incrementally. ``day_change`` is the part of the
+    value change on that day caused by NAV moves, not by buys and sells.
+    """
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "date"], name="unique_snapshot_per_user_per_day"
+            )
+        ]
+
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name="portfolio_snapshots",
+        db_index=False,
+    )
+    date = models.DateField()
+    invested = models.DecimalField(max_digits=20, decimal_places=2, default=0)
+    # Units times NAVs, kept at NAV precision
+    current_value = models.DecimalField(max_digits=22, decimal_places=4, default=0)
+    day_change = models.DecimalField(max_digits=22, decimal_places=4, default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+
+class FundStats(models.Model):
+    """
+    Aggregates of one held fund across all users, maintained by
+    ``api.fund_stats``. ``computed_at`` is the time of the last full
+    computation, rows recomputed after a NAV update keep it.
+    """
+
+    mutual_fund = models.OneToOneField(
+        MutualFund, on_delete=models.CASCADE, primary_key=True, related_name="stats"
+    )
+    holders = models.IntegerField()
+    units = models.BigIntegerField()
+    invested = models.DecimalField(max_digits=20, decimal_places=2)
+    aum = models.DecimalField(max_digits=22, decimal_places=2)
+    computed_at = models.DateTimeField()
+
+
+class JobLease(models.Model):
+    """
+    A lease on a job shared by several nodes, see ``api.caching.Lease``.
+    """
+
+    name = models.CharField(max_length=100, primary_key=True)
+    owner = models.CharField(max_length=255)
+    expires_at = models.DateTimeField()
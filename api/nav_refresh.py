@@ -0,0 +1,381 @@
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+from zoneinfo import ZoneInfo
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q, QuerySet
+from django.utils import timezone
+
+from api import metrics
+from api.catalogue import lock_navs, parse_nav, parse_nav_date
+from api.fund_stats import refresh_fund_stats
+from api.history import record_nav_points
+from api.models import MutualFund
+from api.search import invalidate_search_index
+from api.snapshots import propagate_nav_changes
+from api.utils import get_fund_family_data, get_single_fund_details
+
+logger = logging.getLogger(__name__)
+
+
+class RateLimiter:
+    """
+    Thread safe token bucket limiting how many upstream calls are started
+    per second. A rate of 0 disables limiting.
+    """
+
+    def __init__(self, rate: float, burst: Optional[int] = None):
+        self.rate = rate
+        self.capacity = burst or max(1, int(rate))
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self) -> None:
+        if self.rate <= 0:
+            return
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(
+                    self.capacity, self.tokens + (now - self.updated) * self.rate
+                )
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+@dataclass
+class RefreshStats:
+    total: int = 0
+    updated: int = 0
+    unchanged: int = 0
+    failed: int = 0
+    upstream_calls: int = 0
+    calls_saved: int = 0
+    elapsed: float = 0.0
+    failures: List[str] = field(default_factory=list)
+    # Stopped before every fund was processed
+    aborted: bool = False
+
+    @property
+    def throughput(self) -> float:
+        return self.total / self.elapsed if self.elapsed else 0.0
+
+    def summary(self) -> str:
+        return (
+            f"{self.total} funds in {self.elapsed:.2f}s "
+            f"({self.throughput:.1f} funds/s), {self.updated} updated, "
+            f"{self.failed} failed, {self.upstream_calls} upstream calls "
+            f"({self.calls_saved} saved), {self.unchanged} unchanged"
+            + (", aborted" if self.aborted else "")
+        )
+
+
+REFRESHED_FIELDS = ["nav", "nav_date", "family", "updated_at"]
+
+
+def publication_time(day: date) -> datetime:
+    """
+    Returns when the NAVs dated ``day`` are expected from the upstream.
+    """
+    hour, minute = map(int, settings.NAV_PUBLISH_TIME.split(":"))
+    return datetime(
+        day.year,
+        day.month,
+        day.day,
+        hour,
+        minute,
+        tzinfo=ZoneInfo(settings.NAV_PUBLISH_TIMEZONE),
+    )
+
+
+def _previous_business_day(day: date) -> date:
+    day -= timedelta(days=1)
+    while day.weekday() >= 5:
+        day -= timedelta(days=1)
+    return day
+
+
+def latest_nav_date(now: Optional[datetime] = None) -> date:
+    """
+    Returns the most recent NAV date the upstream should have published by
+    ``now``. NAVs are published on business days after the publication time.
+    """
+    now = (now or timezone.now()).astimezone(ZoneInfo(settings.NAV_PUBLISH_TIMEZONE))
+    day = now.date()
+    if day.weekday() >= 5 or now < publication_time(day):
+        day = _previous_business_day(day)
+    return day
+
+
+def next_publication(now: Optional[datetime] = None) -> datetime:
+    """
+    Returns the publication time of the first NAV date after the latest one.
+    """
+    day = latest_nav_date(now) + timedelta(days=1)
+    while day.weekday() >= 5:
+        day += timedelta(days=1)
+    return publication_time(day)
+
+
+def stale_funds(funds: QuerySet, as_of: Optional[date] = None) -> QuerySet:
+    """
+    Narrows ``funds`` to those whose NAV is older than the latest published
+    NAV date, funds already up to date are not fetched again.
+    """
+    as_of = as_of or latest_nav_date()
+    return funds.filter(Q(nav_date__lt=as_of) | Q(nav_date__isnull=True))
+
+
+def fund_state(fund: MutualFund) -> Tuple:
+    return fund.nav, fund.nav_date, fund.family, fund.name
+
+
+def apply_fund_details(fund: MutualFund, fund_details: Optional[Dict]) -> bool:
+    """
+    Copies the upstream NAV and its date onto the fund, returning False when the payload
+    is missing or malformed. The family is recorded so later runs can sync
+    the fund with one call per family.
+    """
+    try:
+        fund.nav = parse_nav(fund_details["Net_Asset_Value"])
+    except (KeyError, TypeError, ValueError):
+        return False
+    fund.nav_date = parse_nav_date(fund_details.get("Date")) or fund.nav_date
+    fund.family = fund_details.get("Mutual_Fund_Family") or fund.family
+    return True
+
+
+def record_metrics(stats: RefreshStats, mode: str) -> None:
+    for result in ("updated", "unchanged", "failed"):
+        metrics.nav_refresh_funds.inc(getattr(stats, result), mode=mode, result=result)
+    metrics.nav_refresh_throughput.set(stats.throughput, mode=mode)
+
+
+def _chunks(items: Iterable, size: int):
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def write_refreshed(funds: List[MutualFund], fields: List[str]) -> Dict[int, Decimal]:
+    """
+    Writes the refreshed funds and adds their NAV changes to the portfolio
+    snapshots in one transaction. The changes are taken from the NAVs stored
+    under the row locks rather than those read before the upstream fetch,
+    so a change written meanwhile by another refresh or ingest is not added
+    twice. Returns the NAV change by fund id.
+    """
+    with transaction.atomic():
+        stored = lock_navs(fund.scheme_Code for fund in funds)
+        nav_changes = {
+            fund.pk: fund.nav - stored[fund.scheme_Code][1]
+            for fund in funds
+            if fund.scheme_Code in stored
+        }
+        # Snapshot rows missing for the day are created from the old NAVs
+        propagate_nav_changes(nav_changes)
+        MutualFund.objects.bulk_update(funds, fields)
+    return nav_changes
+
+
+def iter_funds(funds: QuerySet, chunk_size: int) -> Iterator[MutualFund]:
+    """
+    Yields the funds in primary key order, reading each batch of
+    ``chunk_size`` with its own primary key range query. A batch is fully
+    read before it is handed out, so no cursor on the table stays open while
+    the previous batch is written back with ``bulk_update``.
+    """
+    funds = funds.order_by("pk")
+    batch = list(funds[:chunk_size])
+    while batch:
+        yield from batch
+        if len(batch) < chunk_size:
+            return
+        batch = list(funds.filter(pk__gt=batch[-1].pk)[:chunk_size])
+
+
+def refresh_navs(
+    funds: Iterable[MutualFund],
+    workers: int,
+    rate_limit: float = 0,
+    chunk_size: int = 500,
+    fetch: Optional[Callable[[str], Optional[Dict]]] = None,
+    stop: Optional[threading.Event] = None,
+) -> RefreshStats:
+    """
+    Fetches the latest NAV for every fund concurrently and writes the
+    results back with one ``bulk_update`` per chunk. Funds whose NAV, NAV
+    date and family are unchanged are not written. Once ``stop`` is set no
+    further chunk is fetched or written.
+    """
+    fetch = fetch or get_single_fund_details
+    stats = RefreshStats()
+    limiter = RateLimiter(rate_limit)
+    started = time.perf_counter()
+
+    def fetch_one(fund: MutualFund) -> Optional[Dict]:
+        limiter.acquire()
+        return fetch(fund.scheme_Code)
+
+    # Name and family changes are picked up by the search index
+    renamed = False
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        for chunk in _chunks(funds, chunk_size):
+            if stop and stop.is_set():
+                stats.aborted = True
+                break
+            chunk_started = time.perf_counter()
+            changed = []
+            now = timezone.now()
+            for fund, fund_details in zip(chunk, executor.map(fetch_one, chunk)):
+                stats.total += 1
+                stats.upstream_calls += 1
+                before = fund_state(fund)
+                if not apply_fund_details(fund, fund_details):
+                    stats.failed += 1
+                    stats.failures.append(fund.scheme_Code)
+                    continue
+                if fund_state(fund) == before:
+                    stats.unchanged += 1
+                    continue
+                renamed = renamed or fund_state(fund)[2:] != before[2:]
+                fund.updated_at = now
+                changed.append(fund)
+            if changed:
+                nav_changes = write_refreshed(changed, REFRESHED_FIELDS)
+                record_nav_points(changed)
+                refresh_fund_stats(nav_changes)
+                stats.updated += len(changed)
+            logger.info(f"Refreshed {len(changed)}/{len(chunk)} funds in chunk")
+            metrics.nav_refresh_batch_duration.observe(
+                time.perf_counter() - chunk_started, mode="single"
+            )
+
+    if renamed:
+        invalidate_search_index()
+    stats.elapsed = time.perf_counter() - started
+    record_metrics(stats, "single")
+    return stats
+
+
+def family_source(fund: MutualFund) -> Tuple[str, str]:
+    """
+    The family and upstream scheme type query covering a fund. Types are
+    stored as the upstream reports them, e.g. "Close Ended Schemes", and
+    queried by their first word, funds without one by "Open".
+    """
+    scheme_type = (fund.scheme_type or "Open").split()[0]
+    return fund.family, scheme_type
+
+
+def sync_by_family(
+    funds: Iterable[MutualFund],
+    workers: int,
+    rate_limit: float = 0,
+    chunk_size: int = 500,
+    fetch_family: Optional[Callable[[str, str], Optional[List[Dict]]]] = None,
+    fetch: Optional[Callable[[str], Optional[Dict]]] = None,
+    stop: Optional[threading.Event] = None,
+) -> RefreshStats:
+    """
+    Fetches each distinct fund family and scheme type once and updates every
+    fund found in the payloads from an in-memory scheme code index. Funds
+    without a known family, or missing from their family payload, fall back
+    to single scheme lookups through ``refresh_navs``. Once ``stop`` is set
+    no further chunk is written.
+    """
+    fetch_family = fetch_family or get_fund_family_data
+    started = time.perf_counter()
+    funds = list(funds)
+    sources = sorted({family_source(fund) for fund in funds if fund.family})
+    limiter = RateLimiter(rate_limit)
+
+    def fetch_one(source: Tuple[str, str]) -> Optional[List[Dict]]:
+        limiter.acquire()
+        return fetch_family(*source)
+
+    index: Dict[str, Dict] = {}
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(sources)))) as executor:
+        for source, payload in zip(sources, executor.map(fetch_one, sources)):
+            if not payload:
+                logger.warning(f"No family data for {source}")
+                continue
+            for fund_details in payload:
+                index[str(fund_details.get("Scheme_Code"))] = fund_details
+
+    stats = RefreshStats(upstream_calls=len(sources))
+    fallback = []
+    now = timezone.now()
+    renamed = False
+    for chunk in _chunks(funds, chunk_size):
+        if stop and stop.is_set():
+            stats.aborted = True
+            break
+        chunk_started = time.perf_counter()
+        changed = []
+        for fund in chunk:
+            fund_details = index.get(fund.scheme_Code)
+            before = fund_state(fund)
+            if not apply_fund_details(fund, fund_details):
+                fallback.append(fund)
+                continue
+            fund.name = fund_details.get("Scheme_Name") or fund.name
+            stats.total += 1
+            if fund_state(fund) == before:
+                stats.unchanged += 1
+                continue
+            renamed = renamed or fund_state(fund)[2:] != before[2:]
+            fund.updated_at = now
+            changed.append(fund)
+        if changed:
+            nav_changes = write_refreshed(changed, REFRESHED_FIELDS + ["name"])
+            record_nav_points(changed)
+            refresh_fund_stats(nav_changes)
+            stats.updated += len(changed)
+        metrics.nav_refresh_batch_duration.observe(
+            time.perf_counter() - chunk_started, mode="family"
+        )
+
+    if renamed:
+        invalidate_search_index()
+    stats.calls_saved = max(0, stats.total - len(sources))
+    stats.elapsed = time.perf_counter() - started
+    record_metrics(stats, "family")
+    if fallback and not stats.aborted:
+        logger.info(f"Falling back to single lookups for {len(fallback)} funds")
+        fallback_stats = refresh_navs(
+            fallback,
+            workers,
+            rate_limit=rate_limit,
+            chunk_size=chunk_size,
+            fetch=fetch,
+            stop=stop,
+        )
+        stats.total += fallback_stats.total
+        stats.updated += fallback_stats.updated
+        stats.unchanged += fallback_stats.unchanged
+        stats.failed += fallback_stats.failed
+        stats.upstream_calls += fallback_stats.upstream_calls
+        stats.failures.extend(fallback_stats.failures)
+        stats.aborted = fallback_stats.aborted
+
+    stats.elapsed = time.perf_counter() - started
+    return stats
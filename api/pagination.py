@@ -0,0 +1,14 @@
+from django.conf import settings
+from rest_framework.pagination import LimitOffsetPagination
+
+
+class CataloguePagination(LimitOffsetPagination):
+    """
+    Limit/offset pagination of the catalogue, ``CATALOGUE_PAGE_SIZE``
+    schemes per page unless the client passes ``limit``, which is capped at
+    ``CATALOGUE_MAX_PAGE_SIZE``.
+    """
+
+    def __init__(self):
+        self.default_limit = settings.CATALOGUE_PAGE_SIZE
+        self.max_limit = settings.CATALOGUE_MAX_PAGE_SIZE
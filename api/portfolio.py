@@ -0,0 +1,102 @@
+import hashlib
+from datetime import date
+from typing import Dict, Optional
+
+import numpy as np
+from django.db.models import Count, ExpressionWrapper, F, Max, QuerySet, Sum, Window
+from django.utils import timezone
+
+from api.analytics import CashFlows, compute_metrics, to_rows
+from api.fields import NAV_SCALE, ScaledDecimalField, nav_units
+from api.models import FundTransaction, UserFunds
+
+# Units times the NAV units, an exact integer the field turns into a Decimal
+CURRENT_VALUE = ExpressionWrapper(
+    F("quantity") * F("mutual_fund__nav"), output_field=ScaledDecimalField()
+)
+
+
+def holdings_queryset(user) -> QuerySet:
+    """
+    Returns the user's holdings as ``values()`` rows with the fund name, NAV,
+    current value and the portfolio total computed by the database in a
+    single query.
+    """
+    return (
+        UserFunds.objects.filter(user=user, quantity__gt=0)
+        .order_by("id")
+        .values(
+            "id",
+            "quantity",
+            mf_name=F("mutual_fund__name"),
+            nav=F("mutual_fund__nav"),
+            current_value=CURRENT_VALUE,
+            portfolio_total=Window(Sum(CURRENT_VALUE)),
+        )
+    )
+
+
+def portfolio_version(user_id: int) -> str:
+    """
+    Returns a token identifying the current state of a user's portfolio,
+    derived from the database so every process agrees on it: the number of
+    holdings and the latest change of a holding and of a held fund. Every
+    write path stamps ``updated_at``, so buying, selling and any NAV update
+    of a held fund produce a new token.
+    """
+    state = UserFunds.objects.filter(user_id=user_id).aggregate(
+        holdings=Count("id"),
+        changed=Max("updated_at"),
+        nav_changed=Max("mutual_fund__updated_at"),
+    )
+    fingerprint = f"{state['holdings']}:{state['changed']}:{state['nav_changed']}"
+    return hashlib.blake2b(fingerprint.encode(), digest_size=16).hexdigest()
+
+
+def portfolio_analytics(user, as_of: Optional[date] = None) -> Dict:
+    """
+    Computes return metrics for every holding of a user and the portfolio
+    total from the transaction ledger, with two queries and vectorized
+    arithmetic. NAVs are read as integer units, so no Decimal is built per
+    row.
+    """
+    as_of = as_of or timezone.localdate()
+    rows = list(
+        UserFunds.objects.filter(user=user)
+        .order_by("id")
+        .values_list(
+            "id",
+            "mutual_fund_id",
+            "mutual_fund__name",
+            "quantity",
+            nav_units("mutual_fund__nav"),
+        )
+    )
+    ledger = list(
+        FundTransaction.objects.filter(user=user).values_list(
+            "mutual_fund_id", "kind", "units", nav_units("nav"), "date"
+        )
+    )
+    count, flow_count = len(rows), len(ledger)
+    position = {row[1]: index for index, row in enumerate(rows)}
+    quantity = np.fromiter((row[3] for row in rows), np.int64, count)
+    nav = np.fromiter((row[4] for row in rows), np.int64, count)
+    units = np.fromiter((entry[2] for entry in ledger), np.int64, flow_count)
+    prices = np.fromiter((entry[3] for entry in ledger), np.int64, flow_count)
+    sign = np.fromiter(
+        (-1.0 if entry[1] == FundTransaction.BUY else 1.0 for entry in ledger),
+        np.float64,
+        flow_count,
+    )
+    flows = CashFlows(
+        holding=np.fromiter(
+            (position[entry[0]] for entry in ledger), np.int64, flow_count
+        ),
+        dates=np.array([entry[4] for entry in ledger], dtype="datetime64[D]"),
+        amounts=sign * (units * prices) / NAV_SCALE,
+    )
+    metrics = compute_metrics(flows, quantity * nav / NAV_SCALE, as_of)
+    holdings = to_rows(metrics)
+    for row, holding in zip(rows, holdings):
+        holding.update(id=row[0], mf_name=row[2], quantity=row[3])
+    return {"as_of": as_of, "holdings": holdings, "total": to_rows(metrics["total"])[0]}
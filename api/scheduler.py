@@ -0,0 +1,126 @@
+"""
+Long running NAV refresh for ``update_nav --daemon``.
+
+Every tick the node holding the ``nav_refresh`` lease refreshes only the
+funds whose NAV is older than the latest NAV date the upstream should have
+published, unchanged funds are not written. Ticks that find nothing stale
+sleep until the next publication, ticks where the upstream has not
+published yet back off up to ``max_interval``.
+"""
+
+import logging
+import threading
+from datetime import datetime
+from typing import Callable, Optional
+
+from django.conf import settings
+from django.db import close_old_connections, connection
+from django.db.models import QuerySet
+from django.utils import timezone
+
+from api.caching import Lease
+from api.models import MutualFund
+from api.nav_refresh import (
+    RefreshStats,
+    iter_funds,
+    latest_nav_date,
+    next_publication,
+    stale_funds,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class NavScheduler:
+    def __init__(
+        self,
+        refresh: Callable[..., RefreshStats],
+        funds: Optional[QuerySet] = None,
+        interval: Optional[float] = None,
+        max_interval: Optional[float] = None,
+        lease: Optional[Lease] = None,
+        chunk_size: int = 500,
+        now: Callable[[], datetime] = timezone.now,
+    ):
+        self.refresh = refresh
+        self.funds = funds if funds is not None else MutualFund.objects.all()
+        self.interval = interval or settings.NAV_SCHEDULER_INTERVAL
+        self.max_interval = max(
+            self.interval, max_interval or settings.NAV_SCHEDULER_MAX_INTERVAL
+        )
+        self.lease = lease or Lease("nav_refresh", settings.NAV_SCHEDULER_LEASE_TTL)
+        self.chunk_size = chunk_size
+        self.now = now
+        self.delay = self.interval
+
+    def tick(self) -> Optional[RefreshStats]:
+        """
+        Refreshes the stale funds if this node holds the lease and sets the
+        delay until the next tick. Returns None when there was nothing to do.
+        """
+        close_old_connections()
+        if not self.lease.acquire():
+            self.delay = self.interval
+            return None
+        now = self.now()
+        funds = stale_funds(self.funds.all(), latest_nav_date(now))
+        if not funds.exists():
+            until_published = (next_publication(now) - now).total_seconds()
+            self.delay = min(self.max_interval, max(self.interval, until_published))
+            return None
+
+        done, lost = threading.Event(), threading.Event()
+        keeper = threading.Thread(
+            target=self._keep_lease, args=(done, lost), daemon=True
+        )
+        keeper.start()
+        try:
+            # Another node may take over a lost lease, stop before writing more
+            stats = self.refresh(iter_funds(funds, self.chunk_size), stop=lost)
+        finally:
+            done.set()
+            keeper.join()
+        if stats.updated:
+            self.delay = self.interval
+        else:
+            self.delay = min(self.max_interval, self.delay * 2)
+        return stats
+
+    def _keep_lease(self, done: threading.Event, lost: threading.Event) -> None:
+        try:
+            while not done.wait(self.lease.ttl / 3):
+                if not self.lease.renew():
+                    logger.warning("Lost the NAV refresh lease, stopping the refresh")
+                    lost.set()
+                    return
+        finally:
+            connection.close()
+
+    def run(
+        self,
+        stop: Optional[threading.Event] = None,
+        max_ticks: Optional[int] = None,
+        report: Optional[Callable[[RefreshStats], None]] = None,
+    ) -> None:
+        """
+        Ticks until ``stop`` is set or ``max_ticks`` ticks ran, then gives up
+        the lease so another node can take over at once.
+        """
+        stop = stop or threading.Event()
+        ticks = 0
+        try:
+            while not stop.is_set():
+                try:
+                    stats = self.tick()
+                except Exception:
+                    logger.exception("Scheduled NAV refresh failed")
+                    self.delay = self.interval
+                else:
+                    if stats and report:
+                        report(stats)
+                ticks += 1
+                if max_ticks and ticks >= max_ticks:
+                    break
+                stop.wait(self.delay)
+        finally:
+            self.lease.release()
@@ -0,0 +1,370 @@
+"""
+In-process search index over the fund catalogue for name, scheme code and
+family autocomplete.
+
+Every token of a scheme's name and family maps to a sorted array of
+document numbers, scheme codes are kept in one sorted list. Query tokens
+match vocabulary tokens and codes by prefix, found by bisection, and tokens
+without any prefix match fall back to prefixes one edit away. Candidates are
+intersected with NumPy. Documents are numbered by ascending name length at
+build time, so lower numbers rank first within a tier.
+
+Each process keeps its own index. Catalogue writes bump a version in the
+cache and the index re-reads only rows updated since its last refresh,
+rebuilding from scratch when funds were deleted or too many documents went
+stale.
+"""
+
+import re
+import threading
+import time
+import uuid
+from array import array
+from bisect import bisect_left, bisect_right, insort
+from datetime import timedelta
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from api.models import MutualFund
+
+VERSION_KEY = "search_index_version"
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+# Shorter query tokens are not corrected, too many prefixes are one edit away
+FUZZY_MIN_LENGTH = 4
+# Candidates ranked per step, enough for most queries to stop after one
+RANK_CHUNK = 256
+# Rows written shortly before the last refresh may commit after it
+REFRESH_OVERLAP = timedelta(minutes=5)
+COLUMNS = ("id", "scheme_Code", "name", "family", "updated_at")
+
+Row = Tuple[int, str, str, str]
+
+
+def tokenize(text: str) -> List[str]:
+    return TOKEN_RE.findall(text.lower())
+
+
+def invalidate_search_index() -> None:
+    """
+    Tells every process to refresh its index on the next search, now and
+    again once the surrounding transaction commits.
+    """
+
+    def bump():
+        cache.set(VERSION_KEY, uuid.uuid4().hex, timeout=None)
+
+    bump()
+    transaction.on_commit(bump)
+
+
+def _members(documents: np.ndarray, postings: np.ndarray) -> np.ndarray:
+    """
+    Mask of the sorted ``documents`` found in the sorted ``postings``.
+    """
+    if not len(postings):
+        return np.zeros(len(documents), dtype=bool)
+    positions = np.searchsorted(postings, documents)
+    return postings[np.minimum(positions, len(postings) - 1)] == documents
+
+
+class SearchIndex:
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.version: Optional[str] = None
+        self.checked_at = float("-inf")
+        self.clear()
+
+    def clear(self) -> None:
+        self.fund_ids = array("q")
+        self.codes: List[str] = []
+        self.names: List[str] = []
+        self.family_ids = array("H")
+        self.families: List[str] = []
+        self.family_numbers: Dict[str, int] = {}
+        self.postings: Dict[str, array] = {}
+        self.vocabulary: List[str] = []
+        # Codes are unique, so they get a sorted list instead of postings
+        self.code_order: List[str] = []
+        self.code_documents = array("I")
+        self.documents: Dict[int, int] = {}
+        self.dead: Set[int] = set()
+        self.watermark = None
+
+    def __len__(self) -> int:
+        return len(self.documents)
+
+    def _add(self, row: Row) -> Tuple[int, Set[str]]:
+        fund_id, code, name, family = row
+        document = len(self.names)
+        family_number = self.family_numbers.get(family)
+        if family_number is None:
+            family_number = self.family_numbers[family] = len(self.families)
+            self.families.append(family)
+        self.fund_ids.append(fund_id)
+        self.codes.append(code)
+        self.names.append(name)
+        self.family_ids.append(family_number)
+        self.documents[fund_id] = document
+        new_tokens = set()
+        for token in {*tokenize(name), *tokenize(family)}:
+            postings = self.postings.get(token)
+            if postings is None:
+                postings = self.postings[token] = array("I")
+                new_tokens.add(token)
+            postings.append(document)
+        return document, new_tokens
+
+    def build(self, rows: Iterable[Row]) -> None:
+        """
+        Replaces the index with the given ``(id, scheme_Code, name, family)``
+        rows.
+        """
+        with self.lock:
+            self.clear()
+            for row in sorted(rows, key=lambda row: (len(row[2]), row[2])):
+                self._add(row)
+            self.vocabulary = sorted(self.postings)
+            order = sorted(range(len(self.codes)), key=self.codes.__getitem__)
+            self.code_order = [self.codes[document] for document in order]
+            self.code_documents = array("I", order)
+
+    def update(self, rows: Iterable[Row]) -> int:
+        """
+        Adds new funds and re-indexes funds whose name, code or family
+        changed, the previous document is left out of results. Returns the
+        number of documents added.
+        """
+        added = 0
+        with self.lock:
+            for row in rows:
+                document = self.documents.get(row[0])
+                if document is not None:
+                    if self.row(document) == row:
+                        continue
+                    self.dead.add(document)
+                document, new_tokens = self._add(row)
+                for token in new_tokens:
+                    insort(self.vocabulary, token)
+                position = bisect_right(self.code_order, row[1])
+                self.code_order.insert(position, row[1])
+                self.code_documents.insert(position, document)
+                added += 1
+        return added
+
+    def row(self, document: int) -> Row:
+        return (
+            self.fund_ids[document],
+            self.codes[document],
+            self.names[document],
+            self.families[self.family_ids[document]],
+        )
+
+    def _prefix_matches(self, prefix: str) -> List[str]:
+        # Tokens only hold [a-z0-9], "{" sorts after all of them
+        start = bisect_left(self.vocabulary, prefix)
+        end = bisect_left(self.vocabulary, prefix + "{", start)
+        return self.vocabulary[start:end]
+
+    def _next_chars(self, prefix: str) -> List[str]:
+        """
+        Characters following ``prefix`` in the vocabulary, one bisection
+        each.
+        """
+        chars = []
+        index = bisect_left(self.vocabulary, prefix)
+        end = bisect_left(self.vocabulary, prefix + "{", index)
+        while index < end:
+            token = self.vocabulary[index]
+            if len(token) == len(prefix):
+                index += 1
+                continue
+            char = token[len(prefix)]
+            chars.append(char)
+            index = bisect_left(
+                self.vocabulary, prefix + chr(ord(char) + 1), index, end
+            )
+        return chars
+
+    def _fuzzy_matches(self, token: str) -> Set[str]:
+        """
+        Vocabulary tokens starting with a string one deletion, substitution,
+        insertion or transposition away from ``token``. Characters are only
+        inserted or substituted after a prefix found in the vocabulary and
+        only where they continue it.
+        """
+        edits = set()
+        for i in range(len(token) + 1):
+            left, right = token[:i], token[i:]
+            if right:
+                edits.add(left + right[1:])
+            if len(right) > 1:
+                edits.add(left + right[1] + right[0] + right[2:])
+            chars = self._next_chars(left)
+            for char in chars:
+                edits.add(left + char + right)
+                if right:
+                    edits.add(left + char + right[1:])
+            if not chars:
+                break
+        edits.discard(token)
+        matches = set()
+        for edit in edits:
+            if len(edit) >= FUZZY_MIN_LENGTH - 1:
+                matches.update(self._prefix_matches(edit))
+        return matches
+
+    def _code_matches(self, prefix: str, exact: bool = False) -> np.ndarray:
+        """
+        Sorted documents whose scheme code starts with, or is, ``prefix``.
+        """
+        start = bisect_left(self.code_order, prefix)
+        if exact:
+            end = bisect_right(self.code_order, prefix, start)
+        else:
+            end = bisect_left(self.code_order, prefix + "\U0010ffff", start)
+        documents = np.frombuffer(self.code_documents, dtype=np.uint32)
+        return np.sort(documents[start:end])
+
+    def _documents(self, vocabulary: List[str], codes: np.ndarray) -> np.ndarray:
+        """
+        Sorted documents containing any of the tokens or codes. A single
+        posting array is viewed without copying.
+        """
+        postings = [
+            np.frombuffer(self.postings[match], dtype=np.uint32) for match in vocabulary
+        ]
+        if len(codes):
+            postings.append(codes)
+        if not postings:
+            return np.empty(0, dtype=np.uint32)
+        if len(postings) == 1:
+            return postings[0]
+        return np.unique(np.concatenate(postings))
+
+    def search(self, query: str, limit: int = 10) -> List[Row]:
+        """
+        Returns up to ``limit`` ``(id, scheme_Code, name, family)`` rows
+        matching every token of the query. Funds matching every token
+        exactly come first, then prefix and corrected matches, shorter names
+        first.
+        """
+        tokens = list(dict.fromkeys(tokenize(query)))
+        if not tokens or limit <= 0:
+            return []
+        with self.lock:
+            matches = []
+            for token in tokens:
+                vocabulary = self._prefix_matches(token)
+                codes = self._code_matches(token)
+                if (
+                    not vocabulary
+                    and not len(codes)
+                    and len(token) >= FUZZY_MIN_LENGTH
+                    and not token.isdigit()
+                ):
+                    vocabulary = sorted(self._fuzzy_matches(token))
+                documents = self._documents(vocabulary, codes)
+                if not len(documents):
+                    return []
+                matches.append((token, documents))
+
+            # Intersect starting from the most selective token
+            matches.sort(key=lambda match: len(match[1]))
+            candidates = matches[0][1]
+            for _, documents in matches[1:]:
+                candidates = candidates[_members(candidates, documents)]
+            if self.dead:
+                dead = np.fromiter(sorted(self.dead), dtype=np.uint32)
+                candidates = candidates[~_members(candidates, dead)]
+
+            exact_documents = []
+            for token in tokens:
+                postings = self.postings.get(token)
+                documents = self._documents(
+                    [token] if postings else [], self._code_matches(token, exact=True)
+                )
+                if not len(documents):
+                    return list(map(self.row, candidates[:limit].tolist()))
+                exact_documents.append(documents)
+
+            # Rank growing slices of the candidates until enough of them
+            # match every token exactly
+            exact, partial = [], []
+            start, step = 0, RANK_CHUNK
+            while start < len(candidates) and len(exact) < limit:
+                chunk = candidates[start : start + step]
+                mask = np.ones(len(chunk), dtype=bool)
+                for documents in exact_documents:
+                    mask &= _members(chunk, documents)
+                exact += chunk[mask][: limit - len(exact)].tolist()
+                partial += chunk[~mask][: limit - len(partial)].tolist()
+                start, step = start + step, step * 4
+            ranked = (exact + partial)[:limit]
+            return [self.row(document) for document in ranked]
+
+    def refresh(self, version: Optional[str] = None) -> None:
+        """
+        Brings the index up to date with the catalogue, re-reading only the
+        rows updated since the last refresh unless funds were deleted or a
+        quarter of the documents went stale.
+        """
+        with self.lock:
+            queryset = MutualFund.objects.values_list(*COLUMNS)
+            rows = []
+            if self.watermark is not None:
+                rows = list(
+                    queryset.filter(updated_at__gte=self.watermark - REFRESH_OVERLAP)
+                )
+                self.update(row[:4] for row in rows)
+            if (
+                self.watermark is None
+                or MutualFund.objects.count() != len(self)
+                or len(self.dead) > len(self) // 4
+            ):
+                rows = list(queryset)
+                self.build(row[:4] for row in rows)
+                self.watermark = None
+            if rows:
+                self.watermark = max(
+                    max(row[4] for row in rows), self.watermark or rows[0][4]
+                )
+            self.version = version
+            self.checked_at = time.monotonic()
+
+    def ensure_fresh(self) -> None:
+        """
+        Refreshes the index when the catalogue changed since the last
+        refresh, checking at most every ``SEARCH_INDEX_CHECK_INTERVAL``
+        seconds.
+        """
+        if time.monotonic() - self.checked_at < settings.SEARCH_INDEX_CHECK_INTERVAL:
+            return
+        version = cache.get(VERSION_KEY)
+        if version is None:
+            cache.add(VERSION_KEY, uuid.uuid4().hex, timeout=None)
+            version = cache.get(VERSION_KEY)
+        with self.lock:
+            if version != self.version:
+                self.refresh(version)
+            self.checked_at = time.monotonic()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "funds": len(self),
+            "stale_documents": len(self.dead),
+            "tokens": len(self.vocabulary),
+            "postings": sum(len(postings) for postings in self.postings.values()),
+        }
+
+
+search_index = SearchIndex()
+
+
+def search_funds(query: str, limit: int = 10) -> List[Row]:
+    search_index.ensure_fresh()
+    return search_index.search(query, limit)
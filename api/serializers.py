@@ -1,4 +1,5 @@
 from rest_framework import serializers
+from django.conf import settings
 from django.contrib.auth.models import User
 from django.contrib.auth.hashers import make_password
 
@@ -48,15 +49,28 @@ class UserFundsSerializer(serializers.Serializer):
         return value
 
 
+class BulkUserFundsSerializer(serializers.Serializer):
+    """
+    Envelope of a bulk purchase, every item is validated on its own with
+    ``UserFundsSerializer`` so one bad item does not reject the others.
+    """
+
+    holdings = serializers.ListField(
+        child=serializers.DictField(),
+        allow_empty=False,
+        max_length=settings.BULK_ADD_MAX_ITEMS,
+    )
+
+
 class PortfolioSerializer(serializers.ModelSerializer):
+    """
+    Serializes the annotated rows from ``api.portfolio.holdings_queryset``.
+    """
 
-    mf_name = serializers.ReadOnlyField(source="mutual_fund.name")
-    nav = serializers.ReadOnlyField(source="mutual_fund.nav")
-    current_value = serializers.SerializerMethodField()
+    mf_name = serializers.ReadOnlyField()
+    nav = serializers.ReadOnlyField()
+    current_value = serializers.ReadOnlyField()
 
     class Meta:
         model = UserFunds
         fields = ["id", "mf_name", "nav", "quantity", "current_value"]
-
-    def get_current_value(self, obj):
-        return obj.quantity * obj.mutual_fund.nav
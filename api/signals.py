@@ -0,0 +1,30 @@
+"""
+Invalidates the search index on single-row writes made outside the
+catalogue helpers, e.g. from the admin or the shell. Bulk writes invalidate
+explicitly. Cached token lookups are dropped when the token is deleted, and
+cached users when they are saved or deleted.
+"""
+
+from django.contrib.auth.models import User
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from api.authentication import invalidate_token, invalidate_user
+from api.models import MutualFund
+from api.search import invalidate_search_index
+
+
+@receiver([post_save, post_delete], sender=MutualFund)
+def invalidate_fund_search(sender, instance, **kwargs):
+    invalidate_search_index()
+
+
+@receiver(post_delete, sender=Token)
+def invalidate_deleted_token(sender, instance, **kwargs):
+    invalidate_token(instance.key)
+
+
+@receiver([post_save, post_delete], sender=User)
+def invalidate_cached_user(sender, instance, **kwargs):
+    invalidate_user(instance.pk)
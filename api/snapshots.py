@@ -0,0 +1,199 @@
+"""
+Daily per-user portfolio totals.
+
+The row of the current day is created on the first change of the day,
+carrying the previous row forward, and then adjusted in place: the ledger
+adds the invested amount and value of every buy and sell, ``update_nav``
+adds ``quantity * NAV change`` of every affected holding with one UPDATE
+per chunk of changed funds, whatever the number of holders. Earlier rows are left
+untouched and form the value history.
+"""
+
+from datetime import date
+from decimal import Decimal
+from typing import Dict, Iterable, List, Optional
+
+from django.db.models import (
+    Case,
+    DecimalField,
+    F,
+    OuterRef,
+    Subquery,
+    Sum,
+    Value,
+    When,
+)
+from django.utils import timezone
+
+from api.models import PortfolioSnapshot, UserFunds
+from api.portfolio import CURRENT_VALUE
+
+AMOUNT = DecimalField(max_digits=20, decimal_places=2)
+VALUE = DecimalField(max_digits=22, decimal_places=4)
+# Funds per UPDATE, each adds a WHEN branch with two parameters
+NAV_CHANGE_CHUNK = 500
+
+
+def holding_totals(user_ids: Iterable[int]) -> Dict[int, Dict]:
+    """
+    Invested amount and current value of every given user's holdings,
+    computed by the database in one grouped query.
+    """
+    return {
+        row["user_id"]: row
+        for row in UserFunds.objects.filter(user_id__in=user_ids)
+        .order_by()
+        .values("user_id")
+        .annotate(invested=Sum("invested"), current_value=Sum(CURRENT_VALUE))
+    }
+
+
+def ensure_snapshots(user_ids: Iterable[int], on: Optional[date] = None) -> None:
+    """
+    Creates the day's rows missing for the given users from their latest
+    earlier row, with no day change yet. Users without any row are computed
+    from their holdings, so call this before changing holdings.
+    """
+    on = on or timezone.localdate()
+    user_ids = set(user_ids)
+    if not user_ids:
+        return
+    latest_date = (
+        PortfolioSnapshot.objects.filter(user_id=OuterRef("user_id"), date__lte=on)
+        .order_by("-date")
+        .values("date")[:1]
+    )
+    latest = {
+        row["user_id"]: row
+        for row in PortfolioSnapshot.objects.filter(
+            user_id__in=user_ids, date=Subquery(latest_date)
+        ).values("user_id", "date", "invested", "current_value")
+    }
+    missing = {
+        user_id
+        for user_id in user_ids
+        if user_id not in latest or latest[user_id]["date"] != on
+    }
+    if not missing:
+        return
+    latest.update(holding_totals(missing - latest.keys()))
+    PortfolioSnapshot.objects.bulk_create(
+        [
+            PortfolioSnapshot(
+                user_id=user_id,
+                date=on,
+                invested=latest.get(user_id, {}).get("invested") or 0,
+                current_value=latest.get(user_id, {}).get("current_value") or 0,
+            )
+            for user_id in missing
+        ],
+        ignore_conflicts=True,
+    )
+
+
+def record_holding_change(
+    user_id: int,
+    invested: Decimal,
+    value: Decimal,
+    on: Optional[date] = None,
+) -> None:
+    """
+    Adds a buy or sell to the user's row of the day. ``ensure_snapshots``
+    must have run for the user before the holding was changed.
+    """
+    PortfolioSnapshot.objects.filter(
+        user_id=user_id, date=on or timezone.localdate()
+    ).update(
+        invested=F("invested") + Value(invested, output_field=AMOUNT),
+        current_value=F("current_value") + Value(value, output_field=VALUE),
+        updated_at=timezone.now(),
+    )
+
+
+def propagate_nav_changes(
+    nav_changes: Dict[int, Decimal], on: Optional[date] = None
+) -> None:
+    """
+    Adds ``quantity * NAV change`` of every holding of the changed funds to
+    the value and day change of its holder's row of the day, with one UPDATE
+    for all holders of up to ``NAV_CHANGE_CHUNK`` funds.
+    """
+    changes = [(fund_id, change) for fund_id, change in nav_changes.items() if change]
+    on = on or timezone.localdate()
+    for start in range(0, len(changes), NAV_CHANGE_CHUNK):
+        chunk = dict(changes[start : start + NAV_CHANGE_CHUNK])
+        holdings = UserFunds.objects.filter(
+            mutual_fund_id__in=chunk, quantity__gt=0
+        ).order_by()
+        holders = set(holdings.values_list("user_id", flat=True).distinct())
+        if not holders:
+            continue
+        ensure_snapshots(holders, on)
+        nav_change = Case(
+            *[
+                When(mutual_fund_id=fund_id, then=Value(change, output_field=VALUE))
+                for fund_id, change in chunk.items()
+            ],
+            default=Value(0, output_field=VALUE),
+            output_field=VALUE,
+        )
+        value_change = Subquery(
+            holdings.filter(user_id=OuterRef("user_id"))
+            .values("user_id")
+            .annotate(change=Sum(F("quantity") * nav_change, output_field=VALUE))
+            .values("change"),
+            output_field=VALUE,
+        )
+        PortfolioSnapshot.objects.filter(
+            date=on, user_id__in=holdings.values("user_id")
+        ).update(
+            current_value=F("current_value") + value_change,
+            day_change=F("day_change") + value_change,
+            updated_at=timezone.now(),
+        )
+
+
+def rebuild_snapshots(
+    user_ids: Optional[Iterable[int]] = None,
+    on: Optional[date] = None,
+    batch_size: int = 1000,
+) -> int:
+    """
+    Recomputes the day's rows from the holdings, e.g. after holdings were
+    edited outside the ledger, keeping their day change. Defaults to every
+    user holding a fund.
+    """
+    on = on or timezone.localdate()
+    if user_ids is None:
+        user_ids = UserFunds.objects.values_list("user_id", flat=True).distinct()
+    user_ids: List[int] = sorted(set(user_ids))
+    for start in range(0, len(user_ids), batch_size):
+        batch = user_ids[start : start + batch_size]
+        totals = holding_totals(batch)
+        PortfolioSnapshot.objects.bulk_create(
+            [
+                PortfolioSnapshot(
+                    user_id=user_id,
+                    date=on,
+                    invested=totals.get(user_id, {}).get("invested") or 0,
+                    current_value=totals.get(user_id, {}).get("current_value") or 0,
+                )
+                for user_id in batch
+            ],
+            update_conflicts=True,
+            unique_fields=["user", "date"],
+            update_fields=["invested", "current_value", "updated_at"],
+        )
+    return len(user_ids)
+
+
+def latest_snapshot(user_id: int) -> Optional[PortfolioSnapshot]:
+    return PortfolioSnapshot.objects.filter(user_id=user_id).order_by("-date").first()
+
+
+def snapshot_history(user_id: int, since: date) -> List[Dict]:
+    return list(
+        PortfolioSnapshot.objects.filter(user_id=user_id, date__gte=since)
+        .order_by("date")
+        .values("date", "invested", "current_value", "day_change")
+    )
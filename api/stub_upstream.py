@@ -0,0 +1,120 @@
+"""
+A local stand-in for the RapidAPI mutual fund endpoint, used to benchmark
+and test the upstream code paths without network access or quota.
+"""
+
+import json
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List
+from urllib.parse import parse_qs, urlparse
+
+FAMILIES = ["Axis Mutual Fund", "HDFC Mutual Fund", "SBI Mutual Fund"]
+FIRST_SCHEME_CODE = 100000
+
+
+def make_scheme(index: int) -> Dict:
+    """
+    Builds a deterministic fake scheme record shaped like the upstream payload.
+    """
+    scheme_code = FIRST_SCHEME_CODE + index
+    family = FAMILIES[index % len(FAMILIES)]
+    return {
+        "Scheme_Code": scheme_code,
+        "ISIN_Div_Payout_ISIN_Growth": f"INF{scheme_code:09d}",
+        "ISIN_Div_Reinvestment": "-",
+        "Scheme_Name": f"{family.split()[0]} Stub Fund {index} - Direct Plan - Growth",
+        "Net_Asset_Value": round(10 + (index % 997) * 1.0371, 4),
+        "Date": "28-Feb-2025",
+        "Scheme_Type": "Open Ended Schemes",
+        "Scheme_Category": "Equity Scheme - Large Cap Fund",
+        "Mutual_Fund_Family": family,
+    }
+
+
+class StubUpstreamHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.request_count += 1
+            server.in_flight += 1
+            server.max_in_flight = max(server.max_in_flight, server.in_flight)
+            failing = server.failures > 0
+            server.failures -= failing
+        try:
+            if server.latency:
+                time.sleep(server.latency)
+        finally:
+            # Before answering, so a client's next request never overlaps
+            with server.lock:
+                server.in_flight -= 1
+        if failing:
+            self.send_error(503)
+            return
+        self.send_payload()
+
+    def send_payload(self):
+        server = self.server
+        params = parse_qs(urlparse(self.path).query)
+        if "Scheme_Code" in params:
+            scheme_code = params["Scheme_Code"][0]
+            scheme = server.by_code.get(scheme_code)
+            payload = [scheme] if scheme else []
+        elif "Mutual_Fund_Family" in params:
+            family = params["Mutual_Fund_Family"][0]
+            payload = [s for s in server.schemes if s["Mutual_Fund_Family"] == family]
+        else:
+            payload = server.schemes
+        if "Scheme_Type" in params:
+            # The upstream matches the type by its first word, e.g. "Open"
+            scheme_type = params["Scheme_Type"][0]
+            payload = [s for s in payload if s["Scheme_Type"].startswith(scheme_type)]
+        body = json.dumps(payload).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StubUpstreamServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # The default backlog of 5 drops connections from concurrent benchmarks
+    request_queue_size = 128
+
+    def __init__(self, address, schemes: int = 1000, latency: float = 0.0):
+        super().__init__(address, StubUpstreamHandler)
+        self.schemes: List[Dict] = [make_scheme(i) for i in range(schemes)]
+        self.by_code = {str(s["Scheme_Code"]): s for s in self.schemes}
+        self.latency = latency
+        self.request_count = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        # Number of upcoming requests answered with 503
+        self.failures = 0
+        self.lock = threading.Lock()
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/latest"
+
+
+@contextmanager
+def run_stub_upstream(schemes: int = 1000, latency: float = 0.0, port: int = 0):
+    """
+    Runs the stub in a background thread for the duration of the block.
+    """
+    server = StubUpstreamServer(("127.0.0.1", port), schemes=schemes, latency=latency)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield server
+    finally:
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,453 @@
+"""
+Shared client for the RapidAPI mutual fund endpoint.
+
+Every upstream call goes through ``UpstreamClient``: one pooled keep-alive
+session, a cap on concurrent requests per host, retries with exponential
+backoff and full jitter, and a circuit breaker per host that fails fast
+while the upstream is unhealthy so callers can fall back to cached data.
+``AsyncUpstreamClient`` applies the same policy and breakers on a native
+asyncio transport.
+"""
+
+import asyncio
+import logging
+import random
+import threading
+import time
+import weakref
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+from urllib.parse import urlparse
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+from api import metrics
+
+logger = logging.getLogger(__name__)
+
+# Responses worth retrying, anything else is returned to the caller as is
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+_client = None
+_client_lock = threading.Lock()
+# One async client per event loop
+_async_clients = weakref.WeakKeyDictionary()
+
+
+class UpstreamError(Exception):
+    def __init__(self, message: str, status: Optional[int] = None):
+        super().__init__(message)
+        self.status = status
+
+
+class CircuitOpenError(UpstreamError):
+    pass
+
+
+def current_caller() -> Any:
+    """
+    The asyncio task making a call, or its thread outside an event loop.
+    """
+    try:
+        task = asyncio.current_task()
+    except RuntimeError:
+        task = None
+    return task or threading.get_ident()
+
+
+class CircuitBreaker:
+    """
+    Opens after ``threshold`` consecutive failed calls and rejects calls for
+    ``reset_timeout`` seconds. After that a single trial call is let through,
+    its outcome closes the breaker again or restarts the wait.
+    """
+
+    def __init__(
+        self,
+        threshold: int,
+        reset_timeout: float,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self.lock = threading.Lock()
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self.probing = False
+        self.prober: Any = None
+
+    @property
+    def state(self) -> str:
+        with self.lock:
+            if self.opened_at is None:
+                return "closed"
+            if self.clock() - self.opened_at >= self.reset_timeout:
+                return "half-open"
+            return "open"
+
+    def allow(self) -> bool:
+        with self.lock:
+            if self.opened_at is None:
+                return True
+            if self.clock() - self.opened_at < self.reset_timeout or self.probing:
+                return False
+            self.probing = True
+            self.prober = current_caller()
+            return True
+
+    def release(self) -> None:
+        """
+        Ends the trial call of the caller if it recorded no outcome, e.g. it
+        raised an unexpected error or was cancelled, so a later call can
+        probe the upstream again.
+        """
+        with self.lock:
+            if self.probing and self.prober == current_caller():
+                self.probing = False
+                self.prober = None
+
+    def record_success(self) -> None:
+        with self.lock:
+            self.failures = 0
+            self.opened_at = None
+            self.probing = False
+            self.prober = None
+
+    def record_failure(self) -> None:
+        with self.lock:
+            self.failures += 1
+            if self.probing or self.failures >= self.threshold:
+                if self.opened_at is None or self.probing:
+                    logger.warning("Upstream circuit breaker opened")
+                self.opened_at = self.clock()
+                self.probing = False
+                self.prober = None
+
+
+class UpstreamClient:
+    """
+    Synchronous upstream client, safe to share between threads.
+    """
+
+    def __init__(
+        self,
+        session: Optional[requests.Session] = None,
+        retries: Optional[int] = None,
+        backoff: Optional[float] = None,
+        backoff_max: Optional[float] = None,
+        max_concurrency: Optional[int] = None,
+        breaker_threshold: Optional[int] = None,
+        breaker_reset: Optional[float] = None,
+        sleep: Callable[[float], None] = time.sleep,
+    ):
+        self.session = session or make_session(settings.UPSTREAM_POOL_SIZE)
+        self.retries = settings.UPSTREAM_RETRIES if retries is None else retries
+        self.backoff = settings.UPSTREAM_BACKOFF if backoff is None else backoff
+        self.backoff_max = (
+            settings.UPSTREAM_BACKOFF_MAX if backoff_max is None else backoff_max
+        )
+        self.max_concurrency = max_concurrency or settings.UPSTREAM_MAX_CONCURRENCY
+        self.breaker_threshold = (
+            breaker_threshold or settings.UPSTREAM_BREAKER_THRESHOLD
+        )
+        self.breaker_reset = (
+            settings.UPSTREAM_BREAKER_RESET if breaker_reset is None else breaker_reset
+        )
+        self.sleep = sleep
+        self.lock = threading.Lock()
+        self.hosts: Dict[str, Tuple[threading.BoundedSemaphore, CircuitBreaker]] = {}
+
+    def host_state(self, url: str) -> Tuple[threading.BoundedSemaphore, CircuitBreaker]:
+        host = urlparse(url).netloc
+        with self.lock:
+            if host not in self.hosts:
+                self.hosts[host] = (
+                    threading.BoundedSemaphore(self.max_concurrency),
+                    CircuitBreaker(self.breaker_threshold, self.breaker_reset),
+                )
+            return self.hosts[host]
+
+    def breaker(self, url: Optional[str] = None) -> CircuitBreaker:
+        return self.host_state(url or settings.RAPID_API_URL)[1]
+
+    def backoff_delay(self, attempt: int) -> float:
+        """
+        Full jitter: a random delay up to the exponential backoff cap.
+        """
+        return random.uniform(0, min(self.backoff_max, self.backoff * 2**attempt))
+
+    def request(
+        self, params: Dict, stream: bool = False, name: str = "upstream"
+    ) -> requests.Response:
+        """
+        Calls the configured endpoint and returns the successful response.
+        Raises ``UpstreamError`` once retries are exhausted and
+        ``CircuitOpenError`` without calling out while the breaker is open.
+        Latency and status are recorded under ``name``.
+        """
+        started = time.perf_counter()
+        outcome = "error"
+        try:
+            response = self._request(params, stream, name)
+            outcome = str(response.status_code)
+            return response
+        except CircuitOpenError:
+            outcome = "circuit_open"
+            raise
+        except UpstreamError as e:
+            outcome = str(e.status or outcome)
+            raise
+        finally:
+            metrics.upstream_request_duration.observe(
+                time.perf_counter() - started, helper=name, outcome=outcome
+            )
+
+    def endpoint(self) -> Tuple[str, Dict[str, str]]:
+        """
+        The configured URL and the headers authenticating a call to it.
+        """
+        if not all(
+            [settings.RAPID_API_URL, settings.RAPID_API_HOST, settings.RAPID_API_KEY]
+        ):
+            raise UpstreamError("Missing required API configuration")
+        return settings.RAPID_API_URL, {
+            "x-rapidapi-host": settings.RAPID_API_HOST,
+            "x-rapidapi-key": settings.RAPID_API_KEY,
+        }
+
+    def _request(self, params: Dict, stream: bool, name: str) -> requests.Response:
+        url, headers = self.endpoint()
+        semaphore, breaker = self.host_state(url)
+        if not breaker.allow():
+            raise CircuitOpenError(f"Upstream {urlparse(url).netloc} is unavailable")
+
+        try:
+            for attempt in range(self.retries + 1):
+                try:
+                    with semaphore:
+                        response = self.session.get(
+                            url,
+                            headers=headers,
+                            params=params,
+                            timeout=(
+                                settings.UPSTREAM_CONNECT_TIMEOUT,
+                                settings.UPSTREAM_TIMEOUT,
+                            ),
+                            stream=stream,
+                        )
+                except requests.exceptions.RequestException as e:
+                    metrics.upstream_attempts.inc(helper=name, status="error")
+                    error = UpstreamError(str(e))
+                else:
+                    metrics.upstream_attempts.inc(
+                        helper=name, status=response.status_code
+                    )
+                    if response.status_code == 200:
+                        breaker.record_success()
+                        return response
+                    response.close()
+                    error = UpstreamError(
+                        f"Upstream returned {response.status_code}",
+                        response.status_code,
+                    )
+                    if response.status_code not in RETRY_STATUSES:
+                        breaker.record_success()
+                        raise error
+                if attempt < self.retries:
+                    logger.info(f"{error}, retrying ({attempt + 1}/{self.retries})")
+                    self.sleep(self.backoff_delay(attempt))
+            breaker.record_failure()
+            raise error
+        finally:
+            breaker.release()
+
+    def get_json(self, params: Dict, name: str = "upstream") -> Any:
+        response = self.request(params, name=name)
+        try:
+            return response.json()
+        except ValueError as e:
+            raise UpstreamError(f"Invalid JSON from upstream: {e}")
+
+
+class AsyncUpstreamClient:
+    """
+    asyncio client on a pooled ``httpx.AsyncClient``, so a call waiting on
+    the upstream parks a coroutine instead of a thread. At most
+    ``concurrency`` calls of one event loop are in flight, set apart from
+    the per-host cap of the sync client, while retries, backoff and the
+    circuit breaker per host are those of the shared client.
+    """
+
+    def __init__(
+        self,
+        client: Optional[UpstreamClient] = None,
+        concurrency: Optional[int] = None,
+        sleep: Callable[[float], Any] = asyncio.sleep,
+    ):
+        self.client = client or get_client()
+        self.concurrency = concurrency or settings.UPSTREAM_ASYNC_MAX_CONCURRENCY
+        self.sleep = sleep
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._http: Optional[httpx.AsyncClient] = None
+
+    @property
+    def semaphore(self) -> asyncio.Semaphore:
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+        return self._semaphore
+
+    @property
+    def http(self) -> httpx.AsyncClient:
+        if self._http is None:
+            self._http = httpx.AsyncClient(
+                timeout=httpx.Timeout(
+                    settings.UPSTREAM_TIMEOUT, connect=settings.UPSTREAM_CONNECT_TIMEOUT
+                ),
+                limits=httpx.Limits(
+                    max_connections=self.concurrency,
+                    max_keepalive_connections=self.concurrency,
+                ),
+            )
+        return self._http
+
+    async def aclose(self) -> None:
+        if self._http is not None:
+            await self._http.aclose()
+            self._http = None
+
+    async def request(self, params: Dict, name: str = "upstream") -> httpx.Response:
+        """
+        Async ``UpstreamClient.request``.
+        """
+        started = time.perf_counter()
+        outcome = "error"
+        try:
+            response = await self._request(params, name)
+            outcome = str(response.status_code)
+            return response
+        except CircuitOpenError:
+            outcome = "circuit_open"
+            raise
+        except UpstreamError as e:
+            outcome = str(e.status or outcome)
+            raise
+        finally:
+            metrics.upstream_request_duration.observe(
+                time.perf_counter() - started, helper=name, outcome=outcome
+            )
+
+    async def _request(self, params: Dict, name: str) -> httpx.Response:
+        url, headers = self.client.endpoint()
+        breaker = self.client.breaker(url)
+        if not breaker.allow():
+            raise CircuitOpenError(f"Upstream {urlparse(url).netloc} is unavailable")
+
+        try:
+            retries = self.client.retries
+            for attempt in range(retries + 1):
+                try:
+                    async with self.semaphore:
+                        response = await self.http.get(
+                            url, headers=headers, params=params
+                        )
+                except httpx.HTTPError as e:
+                    metrics.upstream_attempts.inc(helper=name, status="error")
+                    error = UpstreamError(str(e) or type(e).__name__)
+                else:
+                    metrics.upstream_attempts.inc(
+                        helper=name, status=response.status_code
+                    )
+                    if response.status_code == 200:
+                        breaker.record_success()
+                        return response
+                    error = UpstreamError(
+                        f"Upstream returned {response.status_code}",
+                        response.status_code,
+                    )
+                    if response.status_code not in RETRY_STATUSES:
+                        breaker.record_success()
+                        raise error
+                if attempt < retries:
+                    logger.info(f"{error}, retrying ({attempt + 1}/{retries})")
+                    await self.sleep(self.client.backoff_delay(attempt))
+            breaker.record_failure()
+            raise error
+        finally:
+            breaker.release()
+
+    async def get_json(self, params: Dict, name: str = "upstream") -> Any:
+        response = await self.request(params, name=name)
+        try:
+            return response.json()
+        except ValueError as e:
+            raise UpstreamError(f"Invalid JSON from upstream: {e}")
+
+    async def gather_json(self, param_sets: Iterable[Dict]) -> List[Optional[Any]]:
+        """
+        Fetches every parameter set concurrently, failed calls yield None.
+        """
+
+        async def fetch(params):
+            try:
+                return await self.get_json(params)
+            except UpstreamError as e:
+                logger.warning(str(e))
+                return None
+
+        return await asyncio.gather(*(fetch(params) for params in param_sets))
+
+
+def make_session(pool_size: int) -> requests.Session:
+    """
+    Builds a keep-alive session whose connection pool can serve
+    ``pool_size`` concurrent requests.
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def get_client() -> UpstreamClient:
+    """
+    Returns the process wide upstream client.
+    """
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = UpstreamClient()
+    return _client
+
+
+def get_async_client() -> AsyncUpstreamClient:
+    """
+    Returns the async client of the running event loop, its semaphore and
+    connection pool must not be shared between loops.
+    """
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None or client.client is not get_client():
+        client = _async_clients[loop] = AsyncUpstreamClient()
+    return client
+
+
+def reset_client() -> None:
+    """
+    Drops the process wide client, e.g. after changing upstream settings.
+    """
+    global _client
+    with _client_lock:
+        _client = None
+
+
+@receiver(setting_changed)
+def reset_client_on_setting_change(setting, **kwargs):
+    if setting.startswith("UPSTREAM_"):
+        reset_client()
@@ -1,11 +1,24 @@
 from django.urls import path
+from api import async_views
 from api.views import (
     SignupView,
     LoginView,
     LogoutView,
     ListMutualFundsView,
+    SearchFundsView,
     AddFundsView,
     ListPortfolioView,
+    CacheStatsView,
+    FundStatsView,
+    PortfolioAnalyticsView,
+    PortfolioSummaryView,
+    PortfolioHistoryView,
+    SellFundsView,
+    BulkAddFundsView,
+    ExportPortfolioView,
+    ExportHoldingsView,
+    ExportCatalogueView,
+    metrics_view,
 )
 
 urlpatterns = [
@@ -13,6 +26,32 @@ urlpatterns = [
     path("login/", LoginView.as_view(), name="login"),
     path("logout/", LogoutView.as_view(), name="logout"),
     path("list_mfs/", ListMutualFundsView.as_view(), name="list_mutual_funds"),
+    path("search/", SearchFundsView.as_view(), name="search_funds"),
     path("add_fund/", AddFundsView.as_view(), name="add_mf"),
+    path("add_funds/", BulkAddFundsView.as_view(), name="add_mfs"),
+    path("sell_fund/", SellFundsView.as_view(), name="sell_mf"),
     path("list_portfolio/", ListPortfolioView.as_view(), name="portfolio"),
+    path(
+        "portfolio_analytics/",
+        PortfolioAnalyticsView.as_view(),
+        name="portfolio_analytics",
+    ),
+    path(
+        "portfolio_summary/", PortfolioSummaryView.as_view(), name="portfolio_summary"
+    ),
+    path(
+        "portfolio_history/", PortfolioHistoryView.as_view(), name="portfolio_history"
+    ),
+    path("cache_stats/", CacheStatsView.as_view(), name="cache_stats"),
+    path("fund_stats/", FundStatsView.as_view(), name="fund_stats"),
+    path("metrics/", metrics_view, name="metrics"),
+    path("export/portfolio/", ExportPortfolioView.as_view(), name="export_portfolio"),
+    path("export/holdings/", ExportHoldingsView.as_view(), name="export_holdings"),
+    path("export/catalogue/", ExportCatalogueView.as_view(), name="export_catalogue"),
+    path(
+        "async/list_mfs/",
+        async_views.list_mutual_funds,
+        name="async_list_mutual_funds",
+    ),
+    path("async/add_fund/", async_views.add_fund, name="async_add_mf"),
 ]
@@ -1,70 +1,225 @@
-from typing import List, Dict
-import requests
+import json
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, Iterator, List, Tuple
 from django.conf import settings
 from django.core.cache import cache
 
+from api.upstream import UpstreamError, get_async_client, get_client
+
 
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Fund families listed by AMFI, used when MF_CATALOGUE_FAMILIES is "all"
+ALL_FAMILIES = [
+    "360 ONE Mutual Fund",
+    "Aditya Birla Sun Life Mutual Fund",
+    "Angel One Mutual Fund",
+    "Axis Mutual Fund",
+    "Bajaj Finserv Mutual Fund",
+    "Bandhan Mutual Fund",
+    "Bank of India Mutual Fund",
+    "Baroda BNP Paribas Mutual Fund",
+    "Canara Robeco Mutual Fund",
+    "DSP Mutual Fund",
+    "Edelweiss Mutual Fund",
+    "Franklin Templeton Mutual Fund",
+    "Groww Mutual Fund",
+    "HDFC Mutual Fund",
+    "HSBC Mutual Fund",
+    "Helios Mutual Fund",
+    "ICICI Prudential Mutual Fund",
+    "ITI Mutual Fund",
+    "Invesco Mutual Fund",
+    "JM Financial Mutual Fund",
+    "Kotak Mahindra Mutual Fund",
+    "LIC Mutual Fund",
+    "Mahindra Manulife Mutual Fund",
+    "Mirae Asset Mutual Fund",
+    "Motilal Oswal Mutual Fund",
+    "NJ Mutual Fund",
+    "Navi Mutual Fund",
+    "Nippon India Mutual Fund",
+    "Old Bridge Mutual Fund",
+    "PGIM India Mutual Fund",
+    "PPFAS Mutual Fund",
+    "Quant Mutual Fund",
+    "Quantum Mutual Fund",
+    "SBI Mutual Fund",
+    "Samco Mutual Fund",
+    "Shriram Mutual Fund",
+    "Sundaram Mutual Fund",
+    "Tata Mutual Fund",
+    "Taurus Mutual Fund",
+    "Trust Mutual Fund",
+    "UTI Mutual Fund",
+    "Union Mutual Fund",
+    "WhiteOak Capital Mutual Fund",
+    "Zerodha Mutual Fund",
+]
+
+# A (family, scheme type) pair fetched with one upstream call
+Source = Tuple[str, str]
+
 
-def get_mutual_funds_data() -> List[Dict]:
+def catalogue_sources() -> List[Source]:
     """
-    Fetches mutual fund data from a Rapid API endpoint and caches the response.
+    The configured families crossed with the configured scheme types.
     """
+    families = settings.MF_CATALOGUE_FAMILIES
+    if [family.lower() for family in families] == ["all"]:
+        families = ALL_FAMILIES
+    return [
+        (family, scheme_type)
+        for family in dict.fromkeys(families)
+        for scheme_type in dict.fromkeys(settings.MF_CATALOGUE_SCHEME_TYPES)
+    ]
 
-    if not all(
-        [settings.RAPID_API_URL, settings.RAPID_API_HOST, settings.RAPID_API_KEY]
-    ):
-        logger.error("Missing required API configuration")
-        return None
-    cache_key = "mutual_fund_data"
-    cached_data = cache.get(cache_key)
-    if cached_data:
-        logger.info("Using cached data")
-        return cached_data
-    url = settings.RAPID_API_URL
-    querystring = {"Mutual_Fund_Family": "Axis Mutual Fund", "Scheme_Type": "Open"}
-    headers = {
-        "x-rapidapi-host": settings.RAPID_API_HOST,
-        "x-rapidapi-key": settings.RAPID_API_KEY,
-    }
+
+def get_fund_family_data(family: str, scheme_type: str = "Open") -> List[Dict]:
+    """
+    Fetches every scheme of a mutual fund family and scheme type in a
+    single call.
+    """
+    querystring = {"Mutual_Fund_Family": family, "Scheme_Type": scheme_type}
     try:
-        response = requests.get(url, headers=headers, params=querystring, timeout=10)
-        if response.status_code == 200:
-            logger.info(f"Error fetching data: {response.status_code}")
-            return response.json()
-        else:
-            logger.warning(f"Error fetching data: {response.status_code}")
-            return None
-    except requests.exceptions.RequestException as e:
+        return get_client().request(querystring, name="fund_family").json()
+    except (UpstreamError, ValueError) as e:
         logger.error(f"Error fetching data: {e}")
         return None
 
 
+def iter_json_array(chunks: Iterable[str]) -> Iterator[Dict]:
+    """
+    Incrementally decodes a JSON array of objects from text chunks, so large
+    payloads never have to be held in memory as a whole.
+    """
+    decoder = json.JSONDecoder()
+    buffer = ""
+    started = False
+    for chunk in chunks:
+        buffer += chunk
+        position = 0
+        while True:
+            while position < len(buffer) and buffer[position] in " \t\r\n,":
+                position += 1
+            if not started:
+                if position == len(buffer):
+                    break
+                if buffer[position] != "[":
+                    raise ValueError("Expected a JSON array")
+                started = True
+                position += 1
+                continue
+            if position < len(buffer) and buffer[position] == "]":
+                return
+            try:
+                item, position = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                break
+            yield item
+        buffer = buffer[position:]
+
+
+def iter_fund_family_data(family: str, scheme_type: str = "Open") -> Iterator[Dict]:
+    """
+    Streams the schemes of a mutual fund family one record at a time.
+    """
+    querystring = {"Mutual_Fund_Family": family, "Scheme_Type": scheme_type}
+    try:
+        with get_client().request(
+            querystring, stream=True, name="fund_family_stream"
+        ) as response:
+            response.encoding = response.encoding or "utf-8"
+            yield from iter_json_array(
+                response.iter_content(chunk_size=64 * 1024, decode_unicode=True)
+            )
+    except (UpstreamError, ValueError) as e:
+        logger.error(f"Error fetching data: {e}")
+
+
+def iter_catalogue(
+    sources: Iterable[Source], workers: int, buffer_size: int = 1000
+) -> Iterator[Tuple[Source, Dict]]:
+    """
+    Streams the schemes of several sources concurrently, on at most
+    ``workers`` threads, as ``(source, scheme)`` pairs in arrival order. At
+    most ``buffer_size`` schemes wait to be consumed.
+    """
+    sources = list(sources)
+    schemes: queue.Queue = queue.Queue(maxsize=buffer_size)
+    stopped = threading.Event()
+    done = object()
+
+    def put(item) -> bool:
+        while not stopped.is_set():
+            try:
+                schemes.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce(source: Source) -> None:
+        try:
+            for scheme in iter_fund_family_data(*source):
+                if not put((source, scheme)):
+                    return
+        finally:
+            put((source, done))
+
+    executor = ThreadPoolExecutor(max_workers=max(1, min(workers, len(sources) or 1)))
+    for source in sources:
+        executor.submit(produce, source)
+    try:
+        remaining = len(sources)
+        while remaining:
+            source, scheme = schemes.get()
+            if scheme is done:
+                remaining -= 1
+                continue
+            yield source, scheme
+    finally:
+        # Unblocks producers when the consumer stops early
+        stopped.set()
+        executor.shutdown(wait=True, cancel_futures=True)
+
+
 def get_single_fund_details(scheme_code: str) -> Dict:
     """
-    Fetches details of a single mutual fund from a Rapid API endpoint.
+    Fetches details of a single mutual fund from a Rapid API endpoint. The
+    last good answer is kept in the cache and served while the upstream is
+    failing. The scheme type is not filtered on, it is taken from the
+    answer, so close ended and interval schemes resolve too.
     """
-    if not all(
-        [settings.RAPID_API_URL, settings.RAPID_API_HOST, settings.RAPID_API_KEY]
-    ):
-        logger.error("Missing required API configuration")
-        return None
-    url = settings.RAPID_API_URL
-    querystring = {"Scheme_Type": "Open", "Scheme_Code": scheme_code}
-    headers = {
-        "x-rapidapi-host": settings.RAPID_API_HOST,
-        "x-rapidapi-key": settings.RAPID_API_KEY,
-    }
+    key = f"scheme_details:{scheme_code}"
+    querystring = {"Scheme_Code": scheme_code}
     try:
-        response = requests.get(url, headers=headers, params=querystring, timeout=10)
-        if response.status_code == 200:
-            return response.json()[0]
-        else:
-            logger.warning(f"Error fetching data: {response.status_code}")
-            return None
-    except requests.exceptions.RequestException as e:
+        data = get_client().get_json(querystring, name="single_fund")
+    except UpstreamError as e:
         logger.error(f"Error fetching data: {e}")
-        return None
+        return cache.get(key)
+    details = data[0] if data else None
+    if details:
+        cache.set(key, details, timeout=settings.UPSTREAM_STALE_TTL)
+    return details
+
+
+async def aget_single_fund_details(scheme_code: str) -> Dict:
+    """
+    Async ``get_single_fund_details``.
+    """
+    key = f"scheme_details:{scheme_code}"
+    querystring = {"Scheme_Code": scheme_code}
+    try:
+        data = await get_async_client().get_json(querystring, name="single_fund")
+    except UpstreamError as e:
+        logger.error(f"Error fetching data: {e}")
+        return await cache.aget(key)
+    details = data[0] if data else None
+    if details:
+        await cache.aset(key, details, timeout=settings.UPSTREAM_STALE_TTL)
+    return details
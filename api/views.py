@@ -1,16 +1,52 @@
+from abc import ABC, abstractmethod
 from rest_framework.views import APIView
 from rest_framework import generics, permissions
 from rest_framework.response import Response
 from rest_framework import status, permissions
+from datetime import timedelta
+from django.conf import settings
 from django.contrib.auth import authenticate
+from django.core.cache import cache
+from django.http import HttpResponse, HttpResponseForbidden, StreamingHttpResponse
+from django.utils import timezone
+from django.utils.http import parse_etags
 from rest_framework.authtoken.models import Token
+from rest_framework.negotiation import BaseContentNegotiation
 from rest_framework.throttling import AnonRateThrottle
 
 
 from api.serializers import UserSerializer, LoginSerializer
-from api.utils import get_mutual_funds_data, get_single_fund_details
-from api.models import MutualFund, UserFunds
-from api.serializers import UserFundsSerializer, PortfolioSerializer
+from api.catalogue import (
+    catalogue_queryset,
+    resolve_fund,
+    resolve_funds,
+    scheme_from_row,
+    scheme_lookups,
+)
+from api.authentication import invalidate_token
+from api.export import (
+    CATALOGUE_FIELDS,
+    FORMATS,
+    HOLDING_FIELDS,
+    catalogue_rows,
+    export_filename,
+    export_stream,
+    holdings_rows,
+)
+from api import metrics
+from api.pagination import CataloguePagination
+from api.search import search_funds
+from api.fund_stats import ORDERS, fund_stats, summarize, top_funds
+from api.snapshots import ensure_snapshots, latest_snapshot, snapshot_history
+from api.portfolio import holdings_queryset, portfolio_analytics, portfolio_version
+from api.utils import get_single_fund_details
+from api.ledger import InsufficientUnits, record_buy, record_buys, record_sell
+from api.models import MutualFund
+from api.serializers import (
+    BulkUserFundsSerializer,
+    UserFundsSerializer,
+    PortfolioSerializer,
+)
 
 
 class SignupView(generics.CreateAPIView):
@@ -47,7 +83,9 @@ class LogoutView(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
     def post(self, request) -> Response:
+        key = request.user.auth_token.key
         request.user.auth_token.delete()
+        invalidate_token(key)
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
@@ -56,13 +94,113 @@ class ListMutualFundsView(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
     def get(self, request) -> Response:
-        mutual_fund_data = get_mutual_funds_data()
-        if not mutual_fund_data:
+        """
+        Lists the locally stored fund catalogue. Supports ``scheme_type``,
+        ``category``, ``family`` and ``name`` (prefix) filters, ``fields``
+        projection and ``limit``/``offset`` pagination, one page of
+        ``CATALOGUE_PAGE_SIZE`` schemes by default.
+        """
+        fields = request.query_params.get("fields", "").split(",")
+        schemes = catalogue_queryset(
+            fields=fields,
+            scheme_type=request.query_params.get("scheme_type"),
+            category=request.query_params.get("category"),
+            family=request.query_params.get("family"),
+            name_prefix=request.query_params.get("name"),
+        )
+        paginator = CataloguePagination()
+        page = paginator.paginate_queryset(schemes, request, view=self)
+        return paginator.get_paginated_response(list(map(scheme_from_row, page)))
+
+
+class SearchFundsView(APIView):
+
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request) -> Response:
+        """
+        Autocompletes scheme names, codes and families from the in-process
+        search index. Takes the query as ``q`` and at most
+        ``SEARCH_MAX_RESULTS`` as ``limit``.
+        """
+        query = request.query_params.get("q", "").strip()
+        if not query:
             return Response(
-                {"error": "Failed to fetch mutual fund data"},
-                status=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                {"error": "q is required"}, status=status.HTTP_400_BAD_REQUEST
             )
-        return Response(mutual_fund_data)
+        try:
+            limit = int(request.query_params.get("limit", 10))
+        except ValueError:
+            return Response(
+                {"error": "limit must be an integer"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        limit = max(1, min(limit, settings.SEARCH_MAX_RESULTS))
+        return Response(
+            [
+                scheme_from_row({"scheme_Code": code, "name": name, "family": family})
+                for _, code, name, family in search_funds(query, limit)
+            ]
+        )
+
+
+class CacheStatsView(APIView):
+
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request) -> Response:
+        return Response(
+            {
+                "scheme_lookups": scheme_lookups.stats(),
+            }
+        )
+
+
+class FundStatsView(APIView):
+
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request) -> Response:
+        """
+        Holders, units, invested amount and AUM of the ``limit`` largest
+        funds by ``order`` (aum, holders, units or invested), or of the fund
+        given as ``scheme_Code``, with totals over every held fund.
+        """
+        order = request.query_params.get("order", "aum")
+        if order not in ORDERS:
+            return Response(
+                {"error": f"order must be one of {', '.join(ORDERS)}"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        try:
+            limit = int(request.query_params.get("limit", 20))
+        except ValueError:
+            return Response(
+                {"error": "limit must be an integer"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        limit = max(1, min(limit, settings.FUND_STATS_MAX_RESULTS))
+        stats = fund_stats()
+        funds = stats["funds"]
+        scheme_code = request.query_params.get("scheme_Code")
+        if scheme_code is not None:
+            funds = {
+                fund_id: fund
+                for fund_id, fund in funds.items()
+                if fund["scheme_Code"] == scheme_code
+            }
+            if not funds:
+                return Response(
+                    {"error": "Fund not held by anyone"},
+                    status=status.HTTP_404_NOT_FOUND,
+                )
+        return Response(
+            {
+                "computed_at": stats["computed_at"],
+                "totals": summarize(stats["funds"]),
+                "funds": top_funds(funds, order, limit),
+            }
+        )
 
 
 class AddFundsView(APIView):
@@ -77,41 +215,288 @@ class AddFundsView(APIView):
             quantity = serializer.validated_data["quantity"]
             fund = MutualFund.objects.filter(scheme_Code=scheme_code).first()
             if not fund:
-                fund_details = get_single_fund_details(scheme_code=scheme_code)
-                if not fund_details:
+                if not settings.MF_CATALOGUE_UPSTREAM_FALLBACK:
                     return Response(
-                        {"error": "Failed to fetch fund details"},
-                        status=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                        {"error": "Unknown scheme code"},
+                        status=status.HTTP_404_NOT_FOUND,
                     )
                 try:
-                    scheme_name = fund_details["Scheme_Name"]
-                    nav = fund_details["Net_Asset_Value"]
-                    fund = MutualFund.objects.create(
-                        scheme_Code=scheme_code,
-                        name=scheme_name,
-                        nav=nav,
-                    )
-                except KeyError:
+                    fund = resolve_fund(scheme_code, fetch=get_single_fund_details)
+                except (KeyError, ValueError):
                     return Response(
                         {"error": "Invalid fund details"},
                         status=status.HTTP_400_BAD_REQUEST,
                     )
+                if not fund:
+                    return Response(
+                        {"error": "Failed to fetch fund details"},
+                        status=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                    )
 
-            user_funds, created = UserFunds.objects.get_or_create(
-                user=user, mutual_fund=fund
-            )
-            user_funds.quantity += quantity
-            user_funds.save()
+            record_buy(user, fund, quantity)
             return Response(
                 {"message": "Funds added successfully"}, status=status.HTTP_201_CREATED
             )
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
+class BulkAddFundsView(APIView):
+
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request) -> Response:
+        serializer = BulkUserFundsSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        items = serializer.validated_data["holdings"]
+        results = [None] * len(items)
+        valid = []
+        for index, item in enumerate(items):
+            item_serializer = UserFundsSerializer(data=item)
+            if item_serializer.is_valid():
+                valid.append((index, item_serializer.validated_data))
+            else:
+                results[index] = {"status": "error", "errors": item_serializer.errors}
+
+        funds = resolve_funds(
+            {data["scheme_Code"] for _, data in valid},
+            fetch=(
+                get_single_fund_details
+                if settings.MF_CATALOGUE_UPSTREAM_FALLBACK
+                else None
+            ),
+            workers=settings.UPSTREAM_POOL_SIZE,
+        )
+        purchases = []
+        for index, data in valid:
+            fund = funds.get(data["scheme_Code"])
+            result = {"scheme_Code": data["scheme_Code"], "quantity": data["quantity"]}
+            if fund:
+                purchases.append((fund, data["quantity"]))
+                result["status"] = "added"
+            else:
+                result.update(
+                    status="error", errors={"scheme_Code": ["Unknown scheme code"]}
+                )
+            results[index] = result
+        if purchases:
+            record_buys(request.user, purchases)
+        return Response(
+            {
+                "added": len(purchases),
+                "failed": len(items) - len(purchases),
+                "results": results,
+            },
+            status=(
+                status.HTTP_201_CREATED if purchases else status.HTTP_400_BAD_REQUEST
+            ),
+        )
+
+
+class SellFundsView(APIView):
+
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request) -> Response:
+        serializer = UserFundsSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        fund = MutualFund.objects.filter(
+            scheme_Code=serializer.validated_data["scheme_Code"]
+        ).first()
+        if not fund:
+            return Response(
+                {"error": "Unknown scheme code"}, status=status.HTTP_404_NOT_FOUND
+            )
+        try:
+            record_sell(request.user, fund, serializer.validated_data["quantity"])
+        except InsufficientUnits as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(
+            {"message": "Funds sold successfully"}, status=status.HTTP_201_CREATED
+        )
+
+
 class ListPortfolioView(generics.ListAPIView):
 
     serializer_class = PortfolioSerializer
     permission_classes = [permissions.IsAuthenticated]
 
     def get_queryset(self):
-        return UserFunds.objects.filter(user=self.request.user).all()
+        return holdings_queryset(self.request.user)
+
+    def list(self, request, *args, **kwargs) -> Response:
+        """
+        Serves the portfolio from a per-user cache keyed by its version, a
+        client presenting the current version's ETag gets a 304. The version
+        is read before the holdings, so a cached body is never older than
+        its key.
+        """
+        version = portfolio_version(request.user.pk)
+        etag = f'"{version}"'
+        headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+        if etag in parse_etags(request.headers.get("If-None-Match", "")):
+            metrics.portfolio_cache_events.inc(event="not_modified")
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+        key = f"portfolio_response:{request.user.pk}:{version}"
+        cached = cache.get(key)
+        metrics.portfolio_cache_events.inc(event="misses" if cached is None else "hits")
+        if cached is None:
+            holdings = list(self.get_queryset())
+            total = holdings[0]["portfolio_total"] if holdings else 0
+            serializer = self.get_serializer(holdings, many=True)
+            cached = {"data": serializer.data, "total": str(total)}
+            cache.set(key, cached, settings.PORTFOLIO_CACHE_TTL)
+        headers["X-Portfolio-Total"] = cached["total"]
+        return Response(cached["data"], headers=headers)
+
+
+class PortfolioAnalyticsView(APIView):
+
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request) -> Response:
+        """
+        Invested amount, current value, absolute return, CAGR and XIRR for
+        every holding and for the portfolio as a whole.
+        """
+        return Response(portfolio_analytics(request.user))
+
+
+class PortfolioSummaryView(APIView):
+
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request) -> Response:
+        """
+        Invested amount, current value and gain of the portfolio read from its
+        latest daily snapshot, with the change caused by NAV moves that day.
+        """
+        snapshot = latest_snapshot(request.user.pk)
+        if snapshot is None:
+            ensure_snapshots([request.user.pk])
+            snapshot = latest_snapshot(request.user.pk)
+        return Response(
+            {
+                "date": snapshot.date,
+                "invested": snapshot.invested,
+                "current_value": snapshot.current_value,
+                "gain": snapshot.current_value - snapshot.invested,
+                "day_change": snapshot.day_change,
+            }
+        )
+
+
+class PortfolioHistoryView(APIView):
+
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request) -> Response:
+        """
+        Daily snapshots of the last ``days`` days, at most
+        ``PORTFOLIO_HISTORY_MAX_DAYS``. Days without any change have no row,
+        the previous row still applies.
+        """
+        try:
+            days = int(request.query_params.get("days", 30))
+        except ValueError:
+            return Response(
+                {"error": "days must be an integer"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        days = max(1, min(days, settings.PORTFOLIO_HISTORY_MAX_DAYS))
+        since = timezone.localdate() - timedelta(days=days - 1)
+        return Response(snapshot_history(request.user.pk, since))
+
+
+class ExportContentNegotiation(BaseContentNegotiation):
+    """
+    Exports pick their format from ``?output=``, an ``Accept: text/csv``
+    header must not be answered with 406.
+    """
+
+    def select_renderer(self, request, renderers, format_suffix=None):
+        return renderers[0], renderers[0].media_type
+
+
+class ExportView(ABC, APIView):
+    """
+    Streams rows as NDJSON (``?output=ndjson``, the default) or CSV
+    (``?output=csv``), gzipped with ``?gzip=true``. Subclasses name the
+    export and supply its fields and rows.
+    """
+
+    content_negotiation_class = ExportContentNegotiation
+    name = ""
+    fields = []
+
+    @abstractmethod
+    def get_rows(self, request):
+        """
+        The rows of the export, an iterable of dicts keyed by ``fields``.
+        """
+
+    def get(self, request):
+        fmt = request.query_params.get("output", "ndjson")
+        if fmt not in FORMATS:
+            return Response(
+                {"error": f"output must be one of {', '.join(FORMATS)}"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        compress = request.query_params.get("gzip", "").lower() in ("1", "true")
+        response = StreamingHttpResponse(
+            export_stream(
+                self.get_rows(request),
+                self.fields,
+                fmt,
+                compress=compress,
+                chunk_size=settings.EXPORT_CHUNK_SIZE,
+            ),
+            content_type="application/gzip" if compress else FORMATS[fmt],
+        )
+        filename = export_filename(self.name, fmt, compress)
+        response["Content-Disposition"] = f'attachment; filename="{filename}"'
+        return response
+
+
+class ExportPortfolioView(ExportView):
+
+    permission_classes = [permissions.IsAuthenticated]
+    name = "portfolio"
+    fields = HOLDING_FIELDS
+
+    def get_rows(self, request):
+        return holdings_rows(request.user)
+
+
+class ExportHoldingsView(ExportView):
+    """
+    Holdings of every user, for reconciliation.
+    """
+
+    permission_classes = [permissions.IsAdminUser]
+    name = "holdings"
+    fields = HOLDING_FIELDS
+
+    def get_rows(self, request):
+        return holdings_rows()
+
+
+class ExportCatalogueView(ExportView):
+
+    permission_classes = [permissions.IsAuthenticated]
+    name = "catalogue"
+    fields = CATALOGUE_FIELDS
+
+    def get_rows(self, request):
+        return catalogue_rows()
+
+
+def metrics_view(request):
+    """
+    Prometheus scrape endpoint, only served to ``METRICS_ALLOWED_IPS``.
+    """
+    if request.META.get("REMOTE_ADDR") not in settings.METRICS_ALLOWED_IPS:
+        return HttpResponseForbidden()
+    return HttpResponse(metrics.render(), content_type=metrics.CONTENT_TYPE)
@@ -0,0 +1,92 @@
+"""
+Measures portfolio analytics latency against the number of holdings, both
+for the pure NumPy computation and for the full endpoint query path.
+
+    python benchmarks/bench_analytics.py --holdings 10 100 500 1000 --flows 24
+"""
+
+import argparse
+import statistics
+import time
+from datetime import date, timedelta
+
+import numpy as np
+from common import benchmark_database
+
+from django.contrib.auth.models import User
+
+from api.analytics import CashFlows, compute_metrics
+from api.ledger import import_transactions
+from api.models import FundTransaction, MutualFund, UserFunds
+from api.portfolio import portfolio_analytics
+
+
+def synthetic_flows(holdings: int, flows: int, rng) -> CashFlows:
+    holding = np.repeat(np.arange(holdings), flows)
+    start = np.datetime64("2020-01-01")
+    dates = start + rng.integers(0, 5 * 365, size=holding.size).astype("timedelta64[D]")
+    amounts = -rng.uniform(500, 5000, size=holding.size)
+    return CashFlows(holding=holding, dates=dates, amounts=amounts)
+
+
+def timed(function, repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function()
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--holdings", type=int, nargs="+", default=[10, 100, 500])
+    parser.add_argument("--flows", type=int, default=24, help="Cash flows per holding")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+    rng = np.random.default_rng(0)
+    as_of = date(2025, 6, 30)
+
+    for holdings in args.holdings:
+        flows = synthetic_flows(holdings, args.flows, rng)
+        current = -np.bincount(flows.holding, weights=flows.amounts) * rng.uniform(
+            0.8, 2.5, holdings
+        )
+        elapsed = timed(lambda: compute_metrics(flows, current, as_of), args.repeat)
+        print(
+            f"compute holdings={holdings:<5} flows={holdings * args.flows:<7} "
+            f"median={elapsed:.2f}ms"
+        )
+
+    with benchmark_database():
+        user = User.objects.create_user(username="bench", password="bench")
+        for holdings in args.holdings:
+            FundTransaction.objects.all().delete()
+            UserFunds.objects.all().delete()
+            MutualFund.objects.all().delete()
+            funds = MutualFund.objects.bulk_create(
+                [
+                    MutualFund(name=f"Fund {i}", scheme_Code=str(i), nav=10 + i % 50)
+                    for i in range(holdings)
+                ]
+            )
+            import_transactions(
+                [
+                    FundTransaction(
+                        user=user,
+                        mutual_fund=fund,
+                        kind=FundTransaction.BUY,
+                        units=10,
+                        nav=10,
+                        date=date(2020, 1, 1) + timedelta(days=30 * flow),
+                    )
+                    for fund in funds
+                    for flow in range(args.flows)
+                ]
+            )
+            elapsed = timed(lambda: portfolio_analytics(user), args.repeat)
+            print(f"endpoint holdings={holdings:<5} median={elapsed:.2f}ms")
+
+
+if __name__ == "__main__":
+    main()
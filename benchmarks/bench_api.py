@@ -0,0 +1,323 @@
+"""
+Load tests the main API endpoints and the update_nav command against a
+seeded throwaway database and the stub upstream, and writes the results as
+JSON so runs can be compared.
+
+    python benchmarks/bench_api.py --users 200 --funds 2000 --holdings 20 --latency 0.05
+    python benchmarks/bench_api.py --baseline benchmarks/results/bench_api-before.json
+
+Every endpoint gets ``--requests`` requests from ``--concurrency`` client
+threads (``--login-requests`` for login, which hashes a password per call),
+served by an in-process threaded WSGI server. ``--fallback-ratio`` of the
+add_fund requests name schemes only the stub upstream knows. With
+``--baseline`` the p95 of every endpoint is compared to an earlier run and
+the script exits with status 1 when one regressed by more than
+``--max-regression`` percent.
+"""
+
+import argparse
+import json
+import platform
+import random
+import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from io import StringIO
+from pathlib import Path
+from typing import Callable, Dict, List, Tuple
+
+import requests
+from common import BASE_DIR, benchmark_database, latency_summary, stub_upstream
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.servers.basehttp import ThreadedWSGIServer, WSGIRequestHandler
+from django.core.wsgi import get_wsgi_application
+from django.db import connection
+from django.test.utils import override_settings
+from rest_framework.authtoken.models import Token
+
+from api.models import MutualFund, UserFunds
+from api.stub_upstream import FIRST_SCHEME_CODE, make_scheme
+
+PASSWORD = "benchmark-password"
+RESULTS_DIR = BASE_DIR / "benchmarks" / "results"
+
+
+class QuietHandler(WSGIRequestHandler):
+    def log_message(self, *args):
+        pass
+
+
+def seed(users: int, funds: int, holdings: int) -> List[str]:
+    """
+    Creates the users with tokens, the fund catalogue and random holdings
+    with bulk inserts. Returns the token keys.
+    """
+    started = time.perf_counter()
+    password = make_password(PASSWORD)
+    User.objects.bulk_create(
+        [User(username=f"user{i}", password=password) for i in range(users)],
+        batch_size=1000,
+    )
+    user_ids = list(User.objects.order_by("id").values_list("id", flat=True))
+    Token.objects.bulk_create(
+        [Token(user_id=user_id, key=Token.generate_key()) for user_id in user_ids],
+        batch_size=1000,
+    )
+    MutualFund.objects.bulk_create(
+        [
+            MutualFund(
+                name=scheme["Scheme_Name"],
+                scheme_Code=str(scheme["Scheme_Code"]),
+                nav=0,
+                family=scheme["Mutual_Fund_Family"],
+                scheme_type=scheme["Scheme_Type"],
+                category=scheme["Scheme_Category"],
+            )
+            for scheme in map(make_scheme, range(funds))
+        ],
+        batch_size=1000,
+    )
+    fund_ids = list(MutualFund.objects.values_list("id", flat=True))
+    UserFunds.objects.bulk_create(
+        (
+            UserFunds(
+                user_id=user_id,
+                mutual_fund_id=fund_id,
+                quantity=random.randint(1, 100),
+                invested=random.randint(100, 10000),
+            )
+            for user_id in user_ids
+            for fund_id in random.sample(fund_ids, min(holdings, len(fund_ids)))
+        ),
+        batch_size=5000,
+    )
+    print(
+        f"seeded {users} users, {funds} funds and {users * min(holdings, funds)} "
+        f"holdings in {time.perf_counter() - started:.1f}s"
+    )
+    return list(Token.objects.values_list("key", flat=True))
+
+
+def run_load(
+    call: Callable[[requests.Session, int], requests.Response],
+    count: int,
+    concurrency: int,
+) -> Dict:
+    """
+    Sends ``count`` requests from ``concurrency`` threads and summarizes
+    latency and status codes.
+    """
+    local = threading.local()
+
+    def session() -> requests.Session:
+        if not hasattr(local, "session"):
+            local.session = requests.Session()
+        return local.session
+
+    def timed(index: int) -> Tuple[float, int]:
+        began = time.perf_counter()
+        try:
+            status = call(session(), index).status_code
+        except requests.RequestException:
+            status = 0
+        return (time.perf_counter() - began) * 1000, status
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        samples = list(pool.map(timed, range(count)))
+    elapsed = time.perf_counter() - started
+    statuses: Dict[str, int] = {}
+    for _, status in samples:
+        statuses[str(status)] = statuses.get(str(status), 0) + 1
+    return {
+        "requests": count,
+        "errors": sum(1 for _, status in samples if not 200 <= status < 300),
+        "statuses": statuses,
+        "elapsed_s": round(elapsed, 3),
+        "throughput_rps": round(count / elapsed, 1),
+        "latency_ms": {
+            name: round(value, 2)
+            for name, value in latency_summary([ms for ms, _ in samples]).items()
+        },
+    }
+
+
+def bench_update_nav(runs: int, funds: int, workers: int) -> Dict:
+    """
+    Times whole update_nav runs. The first run writes every NAV, later runs
+    find them unchanged.
+    """
+    durations = []
+    for _ in range(runs):
+        began = time.perf_counter()
+        call_command("update_nav", "--workers", str(workers), stdout=StringIO())
+        durations.append(time.perf_counter() - began)
+    return {
+        "runs": runs,
+        "funds": funds,
+        "run_s": [round(duration, 3) for duration in durations],
+        "throughput_funds_per_s": round(funds / min(durations), 1),
+        "latency_ms": {
+            name: round(value, 2)
+            for name, value in latency_summary([d * 1000 for d in durations]).items()
+        },
+    }
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=BASE_DIR,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def compare(results: Dict, baseline: Dict, max_regression: float) -> bool:
+    """
+    Prints the p95 change of every endpoint and returns False when one
+    regressed by more than ``max_regression`` percent.
+    """
+    ok = True
+    for name, result in results["results"].items():
+        before = baseline.get("results", {}).get(name)
+        if not before:
+            continue
+        old, new = before["latency_ms"]["p95"], result["latency_ms"]["p95"]
+        change = (new - old) / old * 100 if old else 0.0
+        flag = ""
+        if change > max_regression:
+            flag, ok = "  REGRESSION", False
+        print(f"{name:<15} p95 {old:>9.2f}ms -> {new:>9.2f}ms ({change:+.1f}%){flag}")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--funds", type=int, default=1000)
+    parser.add_argument("--holdings", type=int, default=10, help="Holdings per user")
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--login-requests", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--latency", type=float, default=0.05, help="Stub latency")
+    parser.add_argument("--fallback-ratio", type=float, default=0.1)
+    parser.add_argument("--nav-runs", type=int, default=3)
+    parser.add_argument("--nav-workers", type=int, default=16)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", type=Path, help="Results file")
+    parser.add_argument("--baseline", type=Path, help="Earlier results to compare")
+    parser.add_argument("--max-regression", type=float, default=20.0)
+    args = parser.parse_args()
+    random.seed(args.seed)
+
+    # The stub serves more schemes than are seeded, for add_fund fallbacks
+    stub_schemes = args.funds + args.requests
+    with benchmark_database(on_disk=True), stub_upstream(
+        stub_schemes, args.latency
+    ), override_settings(ALLOWED_HOSTS=["*"], MF_CATALOGUE_UPSTREAM_FALLBACK=True):
+        tokens = seed(args.users, args.funds, args.holdings)
+        server = ThreadedWSGIServer(("127.0.0.1", 0), QuietHandler)
+        server.set_app(get_wsgi_application())
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        base_url = f"http://127.0.0.1:{server.server_address[1]}/api/v1"
+
+        def auth(index: int) -> Dict[str, str]:
+            return {"Authorization": f"Token {tokens[index % len(tokens)]}"}
+
+        def login(session, index):
+            return session.post(
+                f"{base_url}/login/",
+                json={"username": f"user{index % args.users}", "password": PASSWORD},
+            )
+
+        def list_mfs(session, index):
+            return session.get(
+                f"{base_url}/list_mfs/",
+                params={"limit": 50, "offset": random.randrange(args.funds)},
+                headers=auth(index),
+            )
+
+        def add_fund(session, index):
+            if random.random() < args.fallback_ratio:
+                code = FIRST_SCHEME_CODE + args.funds + index
+            else:
+                code = FIRST_SCHEME_CODE + random.randrange(args.funds)
+            return session.post(
+                f"{base_url}/add_fund/",
+                json={"scheme_Code": str(code), "quantity": 1},
+                headers=auth(index),
+            )
+
+        def list_portfolio(session, index):
+            return session.get(f"{base_url}/list_portfolio/", headers=auth(index))
+
+        endpoints = {
+            "login": (login, args.login_requests),
+            "list_mfs": (list_mfs, args.requests),
+            "add_fund": (add_fund, args.requests),
+            "list_portfolio": (list_portfolio, args.requests),
+        }
+        results = {}
+        try:
+            for name, (call, count) in endpoints.items():
+                results[name] = run_load(call, count, args.concurrency)
+                summary = results[name]
+                print(
+                    f"{name:<15} {summary['throughput_rps']:>8.1f} req/s  "
+                    + "  ".join(
+                        f"{key}={value:.1f}ms"
+                        for key, value in summary["latency_ms"].items()
+                    )
+                    + f"  errors={summary['errors']}"
+                )
+        finally:
+            server.shutdown()
+        results["update_nav"] = bench_update_nav(
+            args.nav_runs, args.funds, args.nav_workers
+        )
+        print(
+            f"{'update_nav':<15} {results['update_nav']['throughput_funds_per_s']:>8.1f} "
+            f"funds/s  runs={results['update_nav']['run_s']}"
+        )
+        vendor = connection.vendor
+
+    report = {
+        "benchmark": "bench_api",
+        "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "git_revision": git_revision(),
+        "python": platform.python_version(),
+        "database": vendor,
+        "parameters": {
+            name: str(value) if isinstance(value, Path) else value
+            for name, value in vars(args).items()
+        },
+        "results": results,
+    }
+    output = args.output or RESULTS_DIR / (
+        f"bench_api-{datetime.now():%Y%m%d-%H%M%S}-{report['git_revision']}.json"
+    )
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2) + "\n")
+    print(f"results written to {output}")
+
+    if args.baseline:
+        if not compare(
+            report, json.loads(args.baseline.read_text()), args.max_regression
+        ):
+            raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+Measures the cost of the authentication path: password hashing under the
+configurable hasher policy, and token authentication with and without the
+token cache.
+
+    python benchmarks/bench_auth.py --iterations 100000 300000 1000000 --lookups 2000
+"""
+
+import argparse
+import time
+
+from common import benchmark_database, latency_summary
+
+from django.contrib.auth.hashers import check_password, make_password
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext, override_settings
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+from api.authentication import CachedTokenAuthentication
+
+PASSWORD = "benchmark-password"
+HASHERS = {
+    "pbkdf2": "api.hashers.ConfigurablePBKDF2PasswordHasher",
+    "scrypt": "django.contrib.auth.hashers.ScryptPasswordHasher",
+}
+
+
+def bench_hash(hasher: str, rounds: int) -> None:
+    encoded = make_password(PASSWORD, hasher=hasher)
+    samples = []
+    for _ in range(rounds):
+        began = time.perf_counter()
+        check_password(PASSWORD, encoded)
+        samples.append((time.perf_counter() - began) * 1000)
+    summary = latency_summary(samples)
+    algorithm, work_factor = encoded.split("$")[:2]
+    print(
+        f"{algorithm + ' ' + work_factor:<28}"
+        f" check p50={summary['p50']:.1f}ms  max={summary['max']:.1f}ms"
+    )
+
+
+def bench_tokens(authentication, keys, lookups: int) -> None:
+    cache.clear()
+    began = time.perf_counter()
+    with CaptureQueriesContext(connection) as queries:
+        for i in range(lookups):
+            authentication.authenticate_credentials(keys[i % len(keys)])
+    elapsed = time.perf_counter() - began
+    print(
+        f"{type(authentication).__name__:<28} {elapsed / lookups * 1e6:>8.1f}us/call"
+        f"  queries={len(queries)}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--iterations", type=int, nargs="+", default=[100_000, 300_000, 1_000_000]
+    )
+    parser.add_argument("--rounds", type=int, default=5, help="Checks per hasher")
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--lookups", type=int, default=2000)
+    args = parser.parse_args()
+
+    for iterations in args.iterations:
+        with override_settings(PASSWORD_PBKDF2_ITERATIONS=iterations):
+            bench_hash("pbkdf2_sha256", args.rounds)
+    bench_hash("scrypt", args.rounds)
+
+    with benchmark_database(), override_settings(DEBUG=True):
+        User.objects.bulk_create(User(username=f"user{i}") for i in range(args.users))
+        Token.objects.bulk_create(
+            Token(user=user, key=Token.generate_key()) for user in User.objects.all()
+        )
+        keys = list(Token.objects.values_list("key", flat=True))
+        bench_tokens(TokenAuthentication(), keys, args.lookups)
+        # Local memory is enough within this one process
+        with override_settings(AUTH_TOKEN_CACHE_TTL=60):
+            bench_tokens(CachedTokenAuthentication(), keys, args.lookups)
+
+
+if __name__ == "__main__":
+    main()
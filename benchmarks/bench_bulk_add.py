@@ -0,0 +1,83 @@
+"""
+Compares onboarding a user's holdings one add_fund request at a time with a
+single add_funds request, for schemes already in the catalogue and for
+schemes fetched from the stub upstream.
+
+    python benchmarks/bench_bulk_add.py --holdings 50 --latency 0.05
+"""
+
+import argparse
+import time
+
+from common import benchmark_database, stub_upstream
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from api.models import FundTransaction, MutualFund, UserFunds
+from api.stub_upstream import make_scheme
+
+
+def reset(known: bool, holdings: int) -> list:
+    FundTransaction.objects.all().delete()
+    UserFunds.objects.all().delete()
+    MutualFund.objects.all().delete()
+    schemes = [make_scheme(i) for i in range(holdings)]
+    if known:
+        MutualFund.objects.bulk_create(
+            [
+                MutualFund(
+                    name=scheme["Scheme_Name"],
+                    scheme_Code=str(scheme["Scheme_Code"]),
+                    nav=scheme["Net_Asset_Value"],
+                )
+                for scheme in schemes
+            ]
+        )
+    return [{"scheme_Code": str(s["Scheme_Code"]), "quantity": 10} for s in schemes]
+
+
+def run(client: APIClient, label: str, requests: list) -> None:
+    started = time.perf_counter()
+    with CaptureQueriesContext(connection) as queries:
+        for url, payload in requests:
+            response = client.post(url, payload, format="json")
+            assert response.status_code == 201, response.data
+    elapsed = (time.perf_counter() - started) * 1000
+    print(
+        f"{label:<28} requests={len(requests):<4} queries={len(queries):<5} "
+        f"time={elapsed:.1f}ms"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--holdings", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=0.05)
+    args = parser.parse_args()
+
+    with benchmark_database(), stub_upstream(
+        schemes=args.holdings, latency=args.latency
+    ), override_settings(
+        MF_CATALOGUE_UPSTREAM_FALLBACK=True, ALLOWED_HOSTS=["testserver"]
+    ):
+        client = APIClient()
+        client.force_authenticate(User.objects.create_user(username="bench"))
+        single, bulk = reverse("add_mf"), reverse("add_mfs")
+        for known in (True, False):
+            source = "catalogue" if known else "upstream"
+            holdings = reset(known, args.holdings)
+            run(
+                client,
+                f"add_fund x{args.holdings} ({source})",
+                [(single, holding) for holding in holdings],
+            )
+            holdings = reset(known, args.holdings)
+            run(client, f"add_funds ({source})", [(bulk, {"holdings": holdings})])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+"""
+Measures concurrent read/write throughput of the list_portfolio and add_fund
+paths for each database profile. Every profile runs in its own process so
+the DB_* environment is read afresh.
+
+    python benchmarks/bench_database.py --threads 16 --operations 2000
+    python benchmarks/bench_database.py --profiles postgres postgres-pool
+
+The PostgreSQL profiles use the DB_NAME/DB_USER/DB_PASSWORD/DB_HOST/DB_PORT
+variables of the calling environment and need a running server.
+"""
+
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+PROFILES = {
+    "sqlite-default": {"DB_ENGINE": "sqlite", "SQLITE_TUNED": "false"},
+    "sqlite-tuned": {"DB_ENGINE": "sqlite", "SQLITE_TUNED": "true"},
+    "postgres": {"DB_ENGINE": "postgres", "DB_POOL_MAX_SIZE": "0"},
+    "postgres-pool": {"DB_ENGINE": "postgres", "DB_POOL_MAX_SIZE": "20"},
+}
+
+
+def worker(args) -> dict:
+    from common import benchmark_database, latency_summary
+
+    from django.contrib.auth.models import User
+    from django.db import connection
+    from django.test import Client
+    from django.test.utils import override_settings
+    from rest_framework.authtoken.models import Token
+
+    from api.ledger import record_buy
+    from api.models import MutualFund
+
+    with benchmark_database(on_disk=True), override_settings(
+        ALLOWED_HOSTS=["testserver"]
+    ):
+        funds = MutualFund.objects.bulk_create(
+            [
+                MutualFund(name=f"Fund {i}", scheme_Code=str(i), nav=10 + i)
+                for i in range(args.funds)
+            ]
+        )
+        tokens = []
+        for i in range(args.users):
+            user = User.objects.create_user(username=f"user{i}")
+            tokens.append(Token.objects.create(user=user).key)
+            for fund in random.sample(funds, min(10, len(funds))):
+                record_buy(user, fund, 10)
+        connection.close()
+
+        local = threading.local()
+        results = {"read": [], "write": []}
+        errors = {"read": 0, "write": 0}
+        lock = threading.Lock()
+
+        def operation(_):
+            if not hasattr(local, "client"):
+                local.client = Client()
+            headers = {"Authorization": f"Token {random.choice(tokens)}"}
+            kind = "write" if random.random() < args.write_ratio else "read"
+            started = time.perf_counter()
+            try:
+                if kind == "write":
+                    response = local.client.post(
+                        "/api/v1/add_fund/",
+                        {
+                            "scheme_Code": str(random.randrange(args.funds)),
+                            "quantity": 1,
+                        },
+                        content_type="application/json",
+                        headers=headers,
+                    )
+                    ok = response.status_code == 201
+                else:
+                    response = local.client.get(
+                        "/api/v1/list_portfolio/", headers=headers
+                    )
+                    ok = response.status_code == 200
+            except Exception:
+                ok = False
+            elapsed = (time.perf_counter() - started) * 1000
+            with lock:
+                results[kind].append(elapsed)
+                errors[kind] += not ok
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(args.threads) as pool:
+            list(pool.map(operation, range(args.operations)))
+        elapsed = time.perf_counter() - started
+        return {
+            kind: {
+                "ops_per_second": len(results[kind]) / elapsed,
+                "errors": errors[kind],
+                **latency_summary(results[kind]),
+            }
+            for kind in results
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--profiles",
+        nargs="+",
+        choices=PROFILES,
+        default=["sqlite-default", "sqlite-tuned"],
+    )
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--operations", type=int, default=2000)
+    parser.add_argument("--write-ratio", type=float, default=0.3)
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--funds", type=int, default=100)
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(worker(args)))
+        return
+
+    for profile in args.profiles:
+        env = {**os.environ, **PROFILES[profile]}
+        command = [sys.executable, __file__, "--worker"] + [
+            f"--{name.replace('_', '-')}={value}"
+            for name, value in vars(args).items()
+            if name not in ("profiles", "worker")
+        ]
+        output = subprocess.run(
+            command, env=env, capture_output=True, text=True, check=False
+        )
+        if output.returncode:
+            print(f"{profile:<15} failed: {output.stderr.strip().splitlines()[-1]}")
+            continue
+        result = json.loads(output.stdout.strip().splitlines()[-1])
+        for kind, stats in result.items():
+            print(
+                f"{profile:<15} {kind:<5} {stats['ops_per_second']:7.0f} ops/s "
+                f"errors={stats['errors']:<4} p50={stats['p50']:.1f}ms "
+                f"p95={stats['p95']:.1f}ms p99={stats['p99']:.1f}ms"
+            )
+
+
+if __name__ == "__main__":
+    main()
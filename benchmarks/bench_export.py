@@ -0,0 +1,102 @@
+"""
+Measures throughput and peak Python memory of the streaming holdings export
+against a fully buffered JSON dump of the same rows. The peak of the
+streaming export should stay flat as the number of rows grows.
+
+    python benchmarks/bench_export.py --holdings 10000 50000 200000
+"""
+
+import argparse
+import json
+import time
+import tracemalloc
+
+from common import benchmark_database
+
+from django.contrib.auth.models import User
+from django.core.serializers.json import DjangoJSONEncoder
+
+from api.export import HOLDING_FIELDS, export_stream, holdings_rows
+from api.models import MutualFund, UserFunds
+
+USERS = 100
+
+
+def seed(holdings: int) -> None:
+    UserFunds.objects.all().delete()
+    if not User.objects.exists():
+        User.objects.bulk_create(User(username=f"user{i}") for i in range(USERS))
+    user_ids = list(User.objects.values_list("id", flat=True))
+    per_user = -(-holdings // USERS)
+    existing = MutualFund.objects.count()
+    MutualFund.objects.bulk_create(
+        (
+            MutualFund(name=f"Fund {i}", scheme_Code=str(i), nav=10)
+            for i in range(existing, per_user)
+        ),
+        batch_size=5000,
+    )
+    fund_ids = list(MutualFund.objects.values_list("id", flat=True)[:per_user])
+    UserFunds.objects.bulk_create(
+        (
+            UserFunds(user_id=user_id, mutual_fund_id=fund_id, quantity=1)
+            for user_id in user_ids
+            for fund_id in fund_ids
+        ),
+        batch_size=5000,
+    )
+
+
+def measure(run):
+    tracemalloc.start()
+    started = time.perf_counter()
+    size = run()
+    elapsed = time.perf_counter() - started
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, peak, size
+
+
+def streamed(fmt, compress, chunk_size):
+    def run():
+        return sum(
+            len(chunk)
+            for chunk in export_stream(
+                holdings_rows(), HOLDING_FIELDS, fmt, compress, chunk_size
+            )
+        )
+
+    return run
+
+
+def buffered():
+    return len(json.dumps(list(holdings_rows()), cls=DjangoJSONEncoder))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--holdings", type=int, nargs="+", default=[10000, 50000])
+    parser.add_argument("--chunk-size", type=int, default=2000)
+    args = parser.parse_args()
+
+    with benchmark_database():
+        for holdings in args.holdings:
+            seed(holdings)
+            rows = UserFunds.objects.count()
+            runs = {
+                "buffered json": buffered,
+                "ndjson": streamed("ndjson", False, args.chunk_size),
+                "csv": streamed("csv", False, args.chunk_size),
+                "ndjson.gz": streamed("ndjson", True, args.chunk_size),
+            }
+            for label, run in runs.items():
+                elapsed, peak, size = measure(run)
+                print(
+                    f"{rows:>8} rows {label:<14} {elapsed:6.2f}s "
+                    f"{rows / elapsed:>9,.0f} rows/s  peak {peak / 2**20:7.1f} MiB  "
+                    f"output {size / 2**20:7.1f} MiB"
+                )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+Times the fund level aggregates over growing numbers of holdings: a scan
+summing every holding in Python, the grouped query over the covering index,
+the in-place refresh of the funds one update_nav chunk changed and a read
+of the top funds from the stored aggregates.
+
+    python benchmarks/bench_fund_stats.py --holdings 100000 1000000 --funds 5000
+"""
+
+import argparse
+import random
+import time
+from collections import defaultdict
+
+from common import benchmark_database
+
+from django.contrib.auth.models import User
+
+from api.fund_stats import compute_fund_stats, fund_stats, refresh_fund_stats, top_funds
+from api.models import MutualFund, UserFunds
+
+
+def scan():
+    totals = defaultdict(lambda: [0, 0, 0])
+    for fund_id, quantity, nav in UserFunds.objects.filter(quantity__gt=0).values_list(
+        "mutual_fund_id", "quantity", "mutual_fund__nav"
+    ):
+        total = totals[fund_id]
+        total[0] += 1
+        total[1] += quantity
+        total[2] += quantity * nav
+    return totals
+
+
+def timed(fn, rounds: int) -> float:
+    began = time.perf_counter()
+    for _ in range(rounds):
+        fn()
+    return (time.perf_counter() - began) / rounds * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--holdings", type=int, nargs="+", default=[100_000, 1_000_000])
+    parser.add_argument("--funds", type=int, default=5000)
+    parser.add_argument("--per-user", type=int, default=20, help="Holdings per user")
+    parser.add_argument("--changed", type=int, default=500, help="Funds per NAV chunk")
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    random.seed(args.seed)
+
+    with benchmark_database():
+        MutualFund.objects.bulk_create(
+            [
+                MutualFund(name=f"Fund {i}", scheme_Code=str(100000 + i), nav=10)
+                for i in range(args.funds)
+            ],
+            batch_size=5000,
+        )
+        fund_ids = list(MutualFund.objects.values_list("id", flat=True))
+        for holdings in sorted(args.holdings):
+            users = User.objects.count()
+            new_users = holdings // args.per_user - users
+            User.objects.bulk_create(
+                [User(username=f"user{users + i}") for i in range(new_users)],
+                batch_size=5000,
+            )
+            UserFunds.objects.bulk_create(
+                (
+                    UserFunds(
+                        user_id=user_id,
+                        mutual_fund_id=fund_id,
+                        quantity=random.randint(1, 100),
+                        invested=random.randint(100, 10000),
+                    )
+                    for user_id in User.objects.order_by("id")
+                    .values_list("id", flat=True)[users:]
+                    .iterator()
+                    for fund_id in random.sample(fund_ids, args.per_user)
+                ),
+                batch_size=5000,
+            )
+            changed = random.sample(fund_ids, min(args.changed, len(fund_ids)))
+            fund_stats(refresh=True)
+            results = {
+                "python scan": timed(scan, 1),
+                "grouped query": timed(compute_fund_stats, args.rounds),
+                f"refresh {len(changed)} funds": timed(
+                    lambda: refresh_fund_stats(changed), args.rounds
+                ),
+                "stored top 20": timed(
+                    lambda: top_funds(fund_stats()["funds"]), args.rounds * 10
+                ),
+            }
+            print(f"{UserFunds.objects.count()} holdings, {args.funds} funds")
+            for name, elapsed in results.items():
+                print(f"  {name:<20} {elapsed:>10.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+Measures NAV history insert throughput and range-scan latency.
+
+    python benchmarks/bench_nav_history.py --funds 1000 --days 1000 --scans 200
+"""
+
+import argparse
+import random
+import statistics
+import time
+from datetime import date, timedelta
+
+from common import benchmark_database
+
+from api.history import nav_series
+from api.models import MutualFund, NavHistory
+
+
+def seed(funds: int, days: int) -> list:
+    MutualFund.objects.bulk_create(
+        [
+            MutualFund(name=f"Fund {i}", scheme_Code=str(i), nav=10)
+            for i in range(funds)
+        ],
+        batch_size=1000,
+    )
+    fund_ids = list(MutualFund.objects.values_list("id", flat=True))
+    first_day = date(2020, 1, 1)
+    started = time.perf_counter()
+    for offset in range(days):
+        day = first_day + timedelta(days=offset)
+        NavHistory.objects.bulk_create(
+            [
+                NavHistory(mutual_fund_id=fund_id, date=day, nav=10 + offset / 100)
+                for fund_id in fund_ids
+            ],
+            batch_size=5000,
+        )
+    elapsed = time.perf_counter() - started
+    print(
+        f"inserted {funds * days} points in {elapsed:.2f}s "
+        f"({funds * days / elapsed:,.0f} points/s)"
+    )
+    return fund_ids
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--funds", type=int, default=500)
+    parser.add_argument("--days", type=int, default=730)
+    parser.add_argument("--scans", type=int, default=200)
+    parser.add_argument("--window", type=int, default=365, help="Days per scan")
+    args = parser.parse_args()
+
+    with benchmark_database():
+        fund_ids = seed(args.funds, args.days)
+        latencies = []
+        for _ in range(args.scans):
+            fund_id = random.choice(fund_ids)
+            start = date(2020, 1, 1) + timedelta(
+                days=random.randrange(max(1, args.days - args.window))
+            )
+            began = time.perf_counter()
+            dates, navs = nav_series(
+                fund_id, start, start + timedelta(days=args.window)
+            )
+            latencies.append((time.perf_counter() - began) * 1000)
+        latencies.sort()
+        print(
+            f"range scan of {args.window} days over {args.funds * args.days:,} points: "
+            f"p50={statistics.median(latencies):.2f}ms "
+            f"p99={latencies[int(len(latencies) * 0.99) - 1]:.2f}ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
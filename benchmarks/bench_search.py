@@ -0,0 +1,163 @@
+"""
+Compares the in-process search index with ``icontains`` queries on the
+database for autocomplete style queries over a generated catalogue, and
+reports the index build time and size.
+
+    python benchmarks/bench_search.py --funds 10000 40000 --rounds 200
+"""
+
+import argparse
+import time
+import tracemalloc
+from functools import reduce
+from operator import and_
+
+from common import benchmark_database, latency_summary
+
+from django.db.models import Q
+
+from api.models import MutualFund
+from api.search import SearchIndex, tokenize
+
+FAMILIES = [
+    "Aditya Birla Sun Life",
+    "Axis",
+    "Bandhan",
+    "DSP",
+    "Edelweiss",
+    "Franklin Templeton",
+    "HDFC",
+    "ICICI Prudential",
+    "Invesco",
+    "Kotak Mahindra",
+    "Mirae Asset",
+    "Motilal Oswal",
+    "Nippon India",
+    "Parag Parikh",
+    "Quant",
+    "SBI",
+    "Tata",
+    "UTI",
+]
+SCHEMES = [
+    "Bluechip",
+    "Flexi Cap",
+    "Large & Mid Cap",
+    "Midcap Opportunities",
+    "Small Cap",
+    "Focused Equity",
+    "ELSS Tax Saver",
+    "Balanced Advantage",
+    "Corporate Bond",
+    "Liquid",
+    "Overnight",
+    "Gilt",
+    "Banking & PSU Debt",
+    "Nifty 50 Index",
+    "Nifty Next 50 Index",
+    "Healthcare",
+    "Technology",
+    "Infrastructure",
+    "Value Discovery",
+    "Dividend Yield",
+]
+PLANS = ["Direct Plan", "Regular Plan"]
+OPTIONS = ["Growth", "IDCW", "IDCW Reinvestment", "Bonus"]
+QUERIES = {
+    "prefix": ["ax", "axis blu", "hdfc mid", "icici pru tech", "nippon small ca"],
+    "code": ["1003", "100345", "1099"],
+    "token": ["liquid direct growth", "parag parikh flexi", "sbi gilt idcw"],
+    "typo": ["bluchip", "axsi bluechip", "midacp oportunities", "tecnology"],
+}
+
+
+def catalogue(start: int, stop: int):
+    for i in range(start, stop):
+        family = FAMILIES[i % len(FAMILIES)]
+        scheme = SCHEMES[i // len(FAMILIES) % len(SCHEMES)]
+        plan = PLANS[i % 2]
+        option = OPTIONS[i // 2 % len(OPTIONS)]
+        series = f" Series {i // 1440}" if i >= 1440 else ""
+        yield MutualFund(
+            name=f"{family} {scheme} Fund{series} - {plan} - {option}",
+            scheme_Code=str(100000 + i),
+            nav=10,
+            family=f"{family} Mutual Fund",
+        )
+
+
+def icontains(query: str, limit: int):
+    condition = reduce(
+        and_,
+        (
+            Q(name__icontains=token)
+            | Q(family__icontains=token)
+            | Q(scheme_Code__startswith=token)
+            for token in tokenize(query)
+        ),
+    )
+    return list(
+        MutualFund.objects.filter(condition)
+        .order_by("id")
+        .values_list("id", "scheme_Code", "name", "family")[:limit]
+    )
+
+
+def timed(search, queries, rounds: int):
+    samples = []
+    hits = 0
+    for _ in range(rounds):
+        for query in queries:
+            began = time.perf_counter()
+            hits += bool(search(query))
+            samples.append((time.perf_counter() - began) * 1000)
+    return latency_summary(samples), hits / (rounds * len(queries))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--funds", type=int, nargs="+", default=[10_000, 40_000])
+    parser.add_argument("--rounds", type=int, default=100)
+    parser.add_argument("--limit", type=int, default=10)
+    args = parser.parse_args()
+
+    with benchmark_database():
+        for funds in sorted(args.funds):
+            MutualFund.objects.bulk_create(
+                catalogue(MutualFund.objects.count(), funds), batch_size=5000
+            )
+            rows = list(
+                MutualFund.objects.values_list("id", "scheme_Code", "name", "family")
+            )
+            index = SearchIndex()
+            tracemalloc.start()
+            began = time.perf_counter()
+            index.build(rows)
+            build = time.perf_counter() - began
+            size = tracemalloc.get_traced_memory()[0]
+            tracemalloc.stop()
+            stats = index.stats()
+            print(
+                f"{funds} funds: built in {build * 1000:.0f}ms, "
+                f"{size / 2**20:.1f}MiB, {stats['tokens']} tokens, "
+                f"{stats['postings']} postings"
+            )
+            for kind, queries in QUERIES.items():
+                for name, search, rounds in (
+                    ("index", index.search, args.rounds),
+                    ("icontains", icontains, max(1, args.rounds // 10)),
+                ):
+                    summary, hit_rate = timed(
+                        lambda query: search(query, args.limit), queries, rounds
+                    )
+                    print(
+                        f"  {kind:<7} {name:<10} "
+                        + "  ".join(
+                            f"{key}={value:.3f}ms" for key, value in summary.items()
+                        )
+                        + f"  hits={hit_rate:.0%}"
+                    )
+
+
+if __name__ == "__main__":
+    main()
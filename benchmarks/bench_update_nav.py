@@ -0,0 +1,60 @@
+"""
+Measures update_nav refresh throughput against the stub upstream.
+
+    python benchmarks/bench_update_nav.py --funds 2000 --latency 0.02 --workers 1 8 32
+    python benchmarks/bench_update_nav.py --funds 2000 --by-family
+"""
+
+import argparse
+
+from common import benchmark_database, stub_upstream
+
+from api.models import MutualFund
+from api.nav_refresh import iter_funds, refresh_navs, sync_by_family
+from api.stub_upstream import make_scheme
+
+
+def seed_funds(count: int, with_family: bool) -> None:
+    MutualFund.objects.all().delete()
+    MutualFund.objects.bulk_create(
+        [
+            MutualFund(
+                name=scheme["Scheme_Name"],
+                scheme_Code=str(scheme["Scheme_Code"]),
+                nav=0,
+                family=scheme["Mutual_Fund_Family"] if with_family else "",
+            )
+            for scheme in map(make_scheme, range(count))
+        ],
+        batch_size=500,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--funds", type=int, default=1000)
+    parser.add_argument("--latency", type=float, default=0.02)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--rate-limit", type=float, default=0)
+    parser.add_argument("--chunk-size", type=int, default=500)
+    parser.add_argument("--by-family", action="store_true")
+    args = parser.parse_args()
+
+    with benchmark_database(), stub_upstream(args.funds, args.latency) as server:
+        seed_funds(args.funds, with_family=args.by_family)
+        refresh = sync_by_family if args.by_family else refresh_navs
+        for workers in args.workers:
+            # Unchanged funds are skipped, so every run starts from the seeded NAVs
+            MutualFund.objects.update(nav=0, nav_date=None)
+            server.request_count = 0
+            stats = refresh(
+                iter_funds(MutualFund.objects.all(), args.chunk_size),
+                workers=workers,
+                rate_limit=args.rate_limit,
+                chunk_size=args.chunk_size,
+            )
+            print(f"workers={workers:<3} {stats.summary()}")
+
+
+if __name__ == "__main__":
+    main()
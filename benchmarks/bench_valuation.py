@@ -0,0 +1,143 @@
+"""
+Compares bulk valuation of holdings with Decimal NAVs, read the way the
+former DecimalField column was, against the integer NAV units path: totals
+in Python, on NumPy integer arrays and summed by the database, and the
+export formatting of every row. Exits with status 1 unless every path gives
+exactly the same result.
+
+    python benchmarks/bench_valuation.py --holdings 10000 100000 1000000
+"""
+
+import argparse
+import random
+import time
+from decimal import Decimal
+
+import numpy as np
+from common import benchmark_database
+
+from django.contrib.auth.models import User
+from django.db.models import DecimalField, ExpressionWrapper, F, Sum, Value
+
+from api.fields import NAV_PLACES, NAV_QUANTUM, format_units, from_units, nav_units
+from api.models import MutualFund, UserFunds
+from api.portfolio import CURRENT_VALUE
+
+# The NAV as a decimal column, converted to a Decimal per row by the backend
+DECIMAL_NAV = ExpressionWrapper(
+    F("mutual_fund__nav") * Value(NAV_QUANTUM),
+    output_field=DecimalField(max_digits=18, decimal_places=NAV_PLACES),
+)
+
+
+def decimal_total(holdings):
+    rows = holdings.values_list("quantity", DECIMAL_NAV)
+    return sum((quantity * nav for quantity, nav in rows), Decimal(0))
+
+
+def integer_total(holdings):
+    rows = holdings.values_list("quantity", nav_units("mutual_fund__nav"))
+    values = np.array(list(rows), dtype=np.int64).reshape(-1, 2)
+    return from_units(int(np.dot(values[:, 0], values[:, 1])))
+
+
+def database_total(holdings):
+    return holdings.aggregate(total=Sum(CURRENT_VALUE))["total"]
+
+
+def decimal_rows(holdings):
+    rows = holdings.values_list("quantity", DECIMAL_NAV)
+    return [str(quantity * nav) for quantity, nav in rows]
+
+
+def integer_rows(holdings):
+    rows = holdings.values_list("quantity", nav_units("mutual_fund__nav"))
+    return [format_units(quantity * units) for quantity, units in rows]
+
+
+def timed(fn, holdings, rounds: int):
+    durations, result = [], None
+    for _ in range(rounds):
+        began = time.perf_counter()
+        result = fn(holdings)
+        durations.append(time.perf_counter() - began)
+    return min(durations) * 1000, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--holdings", type=int, nargs="+", default=[10_000, 100_000, 1_000_000]
+    )
+    parser.add_argument("--funds", type=int, default=5000)
+    parser.add_argument("--per-user", type=int, default=20, help="Holdings per user")
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    random.seed(args.seed)
+
+    exact = True
+    with benchmark_database():
+        MutualFund.objects.bulk_create(
+            [
+                MutualFund(
+                    name=f"Fund {i}",
+                    scheme_Code=str(100000 + i),
+                    nav=Decimal(random.randint(1, 5_000_000)).scaleb(-NAV_PLACES),
+                )
+                for i in range(args.funds)
+            ],
+            batch_size=5000,
+        )
+        fund_ids = list(MutualFund.objects.values_list("id", flat=True))
+        for count in sorted(args.holdings):
+            users = User.objects.count()
+            User.objects.bulk_create(
+                [
+                    User(username=f"user{users + i}")
+                    for i in range(count // args.per_user - users)
+                ],
+                batch_size=5000,
+            )
+            UserFunds.objects.bulk_create(
+                (
+                    UserFunds(
+                        user_id=user_id,
+                        mutual_fund_id=fund_id,
+                        quantity=random.randint(1, 10_000),
+                    )
+                    for user_id in User.objects.order_by("id")
+                    .values_list("id", flat=True)[users:]
+                    .iterator()
+                    for fund_id in random.sample(fund_ids, args.per_user)
+                ),
+                batch_size=5000,
+            )
+            holdings = UserFunds.objects.order_by()
+            print(f"{holdings.count()} holdings")
+            totals = {}
+            for name, fn in (
+                ("decimal total", decimal_total),
+                ("integer total", integer_total),
+                ("database total", database_total),
+            ):
+                elapsed, totals[name] = timed(fn, holdings, args.rounds)
+                print(f"  {name:<16} {elapsed:>10.1f}ms  {totals[name]}")
+            rows = {}
+            for name, fn in (
+                ("decimal rows", decimal_rows),
+                ("integer rows", integer_rows),
+            ):
+                elapsed, rows[name] = timed(fn, holdings, args.rounds)
+                print(f"  {name:<16} {elapsed:>10.1f}ms")
+            same = len(set(totals.values())) == 1 and all(
+                Decimal(a) == Decimal(b) for a, b in zip(*rows.values())
+            )
+            print(f"  exactly equal: {same}")
+            exact = exact and same
+    if not exact:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
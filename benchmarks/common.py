@@ -0,0 +1,84 @@
+"""
+Shared helpers for the benchmark scripts.
+
+Benchmarks run against a throwaway test database and a local stub of the
+upstream API, so they never touch ``db.sqlite3`` or RapidAPI quota.
+"""
+
+import os
+import sys
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, List
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+if str(BASE_DIR) not in sys.path:
+    sys.path.insert(0, str(BASE_DIR))
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "mf_broker.settings")
+os.environ.setdefault("SECRET_KEY", "benchmark")
+os.environ.setdefault("RAPID_API_URL", "http://127.0.0.1:8001/latest")
+os.environ.setdefault("RAPID_API_HOST", "localhost")
+os.environ.setdefault("RAPID_API_KEY", "benchmark")
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.conf import settings  # noqa: E402
+from django.db import connection  # noqa: E402
+from django.test.utils import override_settings  # noqa: E402
+
+from api.stub_upstream import run_stub_upstream  # noqa: E402
+
+
+@contextmanager
+def benchmark_database(on_disk: bool = False):
+    """
+    Creates a fresh test database for the duration of the block. ``on_disk``
+    keeps a SQLite test database in a file, so it can be shared by the
+    threads of a live server.
+    """
+    old_name = settings.DATABASES["default"]["NAME"]
+    test_settings = settings.DATABASES["default"].setdefault("TEST", {})
+    if on_disk and connection.vendor == "sqlite":
+        test_settings["NAME"] = str(BASE_DIR / "benchmark.sqlite3")
+    connection.creation.create_test_db(verbosity=0, autoclobber=True)
+    try:
+        yield
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        name = test_settings.pop("NAME", None)
+        if name:
+            # WAL files of connections other threads left open
+            for suffix in ("-wal", "-shm"):
+                Path(name + suffix).unlink(missing_ok=True)
+
+
+@contextmanager
+def stub_upstream(schemes: int = 1000, latency: float = 0.0):
+    """
+    Starts the stub upstream and points the RapidAPI settings at it.
+    """
+    with run_stub_upstream(schemes=schemes, latency=latency) as server:
+        with override_settings(RAPID_API_URL=server.url):
+            yield server
+
+
+def latency_summary(samples: List[float]) -> Dict[str, float]:
+    """
+    Returns p50/p95/p99 and max of latency samples in milliseconds.
+    """
+    ordered = sorted(samples)
+    if not ordered:
+        return {"p50": 0.0, "p95": 0.0, "p99": 0.0, "max": 0.0}
+
+    def pick(quantile):
+        return ordered[min(len(ordered) - 1, int(len(ordered) * quantile))]
+
+    return {
+        "p50": pick(0.50),
+        "p95": pick(0.95),
+        "p99": pick(0.99),
+        "max": ordered[-1],
+    }
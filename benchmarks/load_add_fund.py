@@ -0,0 +1,96 @@
+"""
+Fires parallel purchases and sales at add_fund/sell_fund and checks that no
+update was lost: the holding must equal the sum of the accepted requests and
+match a replay of the ledger.
+
+    python benchmarks/load_add_fund.py --requests 500 --concurrency 32
+"""
+
+import argparse
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from common import benchmark_database
+
+from django.contrib.auth import get_user_model
+from django.core.servers.basehttp import ThreadedWSGIServer, WSGIRequestHandler
+from django.core.wsgi import get_wsgi_application
+from django.test.utils import override_settings
+from rest_framework.authtoken.models import Token
+
+from api.ledger import replay
+from api.models import FundTransaction, MutualFund, UserFunds
+
+
+class QuietHandler(WSGIRequestHandler):
+    def log_message(self, *args):
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument(
+        "--sell-ratio", type=float, default=0.3, help="Share of requests that sell"
+    )
+    args = parser.parse_args()
+
+    with benchmark_database(on_disk=True), override_settings(ALLOWED_HOSTS=["*"]):
+        user = get_user_model().objects.create_user(username="load@example.com")
+        token = Token.objects.create(user=user)
+        fund = MutualFund.objects.create(name="Load Fund", scheme_Code="100", nav=10)
+
+        server = ThreadedWSGIServer(("127.0.0.1", 0), QuietHandler)
+        server.set_app(get_wsgi_application())
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        base_url = f"http://127.0.0.1:{server.server_address[1]}/api/v1"
+
+        session = requests.Session()
+        session.headers["Authorization"] = f"Token {token.key}"
+        adapter = requests.adapters.HTTPAdapter(pool_maxsize=args.concurrency)
+        session.mount("http://", adapter)
+
+        def post(_):
+            sell = random.random() < args.sell_ratio
+            units = random.randint(1, 10)
+            endpoint = "sell_fund" if sell else "add_fund"
+            response = session.post(
+                f"{base_url}/{endpoint}/",
+                json={"scheme_Code": "100", "quantity": units},
+            )
+            accepted = response.status_code == 201
+            return (-units if sell else units) if accepted else 0, response.status_code
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(args.concurrency) as pool:
+            results = list(pool.map(post, range(args.requests)))
+        elapsed = time.perf_counter() - started
+        server.shutdown()
+
+        statuses = {}
+        for _, code in results:
+            statuses[code] = statuses.get(code, 0) + 1
+        expected = sum(delta for delta, _ in results)
+        holding = UserFunds.objects.filter(user=user, mutual_fund=fund).first()
+        quantity = holding.quantity if holding else 0
+        ledger = FundTransaction.objects.filter(user=user).order_by("date", "id")
+        replayed, invested = replay(ledger)
+        print(
+            f"{args.requests} requests in {elapsed:.2f}s "
+            f"({args.requests / elapsed:.0f} req/s), statuses {statuses}"
+        )
+        print(
+            f"holding={quantity} accepted={expected} "
+            f"ledger={replayed} ledger_entries={ledger.count()}"
+        )
+        if not quantity == expected == replayed:
+            raise SystemExit("Lost update detected")
+        print("No lost updates")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,177 @@
+"""
+Compares throughput and tail latency of the sync (WSGI) and async (ASGI)
+add_fund/list_mfs endpoints while the stub upstream answers slowly.
+
+Both servers run in this process against a throwaway on-disk database: the
+WSGI side on a fixed pool of worker threads like ``gunicorn --threads``, the
+ASGI side on a single uvicorn event loop (``pip install uvicorn``).
+
+    python benchmarks/load_asgi_wsgi.py --requests 400 --concurrency 200 --latency 0.2
+"""
+
+import argparse
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from common import benchmark_database, latency_summary, stub_upstream
+
+from django.contrib.auth.models import User
+from django.core.asgi import get_asgi_application
+from django.core.servers.basehttp import WSGIRequestHandler, WSGIServer
+from django.core.wsgi import get_wsgi_application
+from django.test.utils import override_settings
+from rest_framework.authtoken.models import Token
+
+from api.catalogue import ingest_schemes
+from api.stub_upstream import FIRST_SCHEME_CODE, make_scheme
+
+
+class QuietHandler(WSGIRequestHandler):
+    def log_message(self, *args):
+        pass
+
+
+class PooledWSGIServer(WSGIServer):
+    """
+    Serves requests on a fixed number of threads, like one gunicorn worker
+    with ``--threads``.
+    """
+
+    def __init__(self, *args, threads: int, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.pool = ThreadPoolExecutor(threads)
+
+    def process_request(self, request, client_address):
+        self.pool.submit(self.process_request_thread, request, client_address)
+
+    def process_request_thread(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+
+def start_wsgi(threads: int):
+    server = PooledWSGIServer(("127.0.0.1", 0), QuietHandler, threads=threads)
+    server.set_app(get_wsgi_application())
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{server.server_address[1]}", server.shutdown
+
+
+def start_asgi():
+    try:
+        import uvicorn
+    except ImportError:
+        raise SystemExit("The ASGI side needs uvicorn: pip install uvicorn")
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        port = probe.getsockname()[1]
+    config = uvicorn.Config(
+        get_asgi_application(),
+        host="127.0.0.1",
+        port=port,
+        lifespan="off",
+        log_level="warning",
+        backlog=4096,
+    )
+    server = uvicorn.Server(config)
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.01)
+
+    def stop():
+        server.should_exit = True
+        thread.join()
+
+    return f"http://127.0.0.1:{port}", stop
+
+
+def run_load(url: str, token: str, endpoint: str, codes: list, concurrency: int):
+    local = threading.local()
+
+    def call(code):
+        if not hasattr(local, "session"):
+            local.session = requests.Session()
+            local.session.headers["Authorization"] = f"Token {token}"
+        started = time.perf_counter()
+        try:
+            if endpoint == "add_fund":
+                response = local.session.post(
+                    url, json={"scheme_Code": str(code), "quantity": 1}, timeout=120
+                )
+            else:
+                response = local.session.get(url, params={"limit": 50}, timeout=120)
+            ok = response.status_code in (200, 201)
+        except requests.RequestException:
+            ok = False
+        return ok, (time.perf_counter() - started) * 1000
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        results = list(pool.map(call, codes))
+    elapsed = time.perf_counter() - started
+    latencies = [latency for _, latency in results]
+    errors = sum(1 for ok, _ in results if not ok)
+    return elapsed, errors, latency_summary(latencies)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.2)
+    parser.add_argument(
+        "--threads", type=int, default=8, help="Worker threads of the WSGI server"
+    )
+    parser.add_argument(
+        "--endpoint", choices=["add_fund", "list_mfs"], default="add_fund"
+    )
+    parser.add_argument("--servers", nargs="+", default=["wsgi", "asgi"])
+    args = parser.parse_args()
+
+    schemes = args.requests * len(args.servers)
+    with benchmark_database(on_disk=True), stub_upstream(
+        schemes=schemes, latency=args.latency
+    ), override_settings(
+        ALLOWED_HOSTS=["*"],
+        MF_CATALOGUE_UPSTREAM_FALLBACK=True,
+        UPSTREAM_MAX_CONCURRENCY=args.concurrency,
+        UPSTREAM_ASYNC_MAX_CONCURRENCY=args.concurrency,
+        UPSTREAM_POOL_SIZE=args.concurrency,
+    ):
+        token = Token.objects.create(user=User.objects.create_user(username="load"))
+        if args.endpoint == "list_mfs":
+            ingest_schemes(make_scheme(i) for i in range(schemes))
+        for index, name in enumerate(args.servers):
+            base_url, stop = (
+                start_wsgi(args.threads) if name == "wsgi" else start_asgi()
+            )
+            prefix = "/api/v1/" if name == "wsgi" else "/api/v1/async/"
+            first = FIRST_SCHEME_CODE + index * args.requests
+            codes = range(first, first + args.requests)
+            try:
+                elapsed, errors, latency = run_load(
+                    f"{base_url}{prefix}{args.endpoint}/",
+                    token.key,
+                    args.endpoint,
+                    codes,
+                    args.concurrency,
+                )
+            finally:
+                stop()
+            print(
+                f"{name:<5} {args.endpoint} requests={args.requests} "
+                f"concurrency={args.concurrency} {args.requests / elapsed:.0f} req/s "
+                f"errors={errors} p50={latency['p50']:.0f}ms "
+                f"p95={latency['p95']:.0f}ms p99={latency['p99']:.0f}ms"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+Builds ``DATABASES["default"]`` from the environment.
+
+``DB_ENGINE=sqlite`` (the default) keeps a local SQLite file. Unless
+``SQLITE_TUNED`` is false it runs in WAL mode with ``synchronous=NORMAL``,
+memory mapped reads, a busy timeout and ``BEGIN IMMEDIATE`` transactions,
+so concurrent writers queue for the lock instead of failing with
+"database is locked".
+
+``DB_ENGINE=postgres`` connects to PostgreSQL. Connections are kept open
+for ``DB_CONN_MAX_AGE`` seconds, or drawn from a psycopg connection pool
+when ``DB_POOL_MAX_SIZE`` is set.
+"""
+
+from pathlib import Path
+from typing import Callable, Dict
+
+from django.core.exceptions import ImproperlyConfigured
+
+
+def sqlite_settings(
+    name: str,
+    tuned: bool = True,
+    busy_timeout: float = 20,
+    mmap_size: int = 256 * 1024 * 1024,
+    cache_size_kb: int = 20000,
+) -> Dict:
+    database = {"ENGINE": "django.db.backends.sqlite3", "NAME": name}
+    if tuned:
+        database["OPTIONS"] = {
+            "timeout": busy_timeout,
+            "transaction_mode": "IMMEDIATE",
+            "init_command": ";".join(
+                [
+                    "PRAGMA journal_mode=WAL",
+                    "PRAGMA synchronous=NORMAL",
+                    f"PRAGMA mmap_size={mmap_size}",
+                    f"PRAGMA cache_size=-{cache_size_kb}",
+                    "PRAGMA temp_store=MEMORY",
+                ]
+            ),
+        }
+    return database
+
+
+def postgres_settings(
+    name: str,
+    user: str,
+    password: str,
+    host: str,
+    port: str,
+    conn_max_age: int = 60,
+    pool_min_size: int = 0,
+    pool_max_size: int = 0,
+    pool_timeout: float = 10,
+) -> Dict:
+    database = {
+        "ENGINE": "django.db.backends.postgresql",
+        "NAME": name,
+        "USER": user,
+        "PASSWORD": password,
+        "HOST": host,
+        "PORT": port,
+        "CONN_MAX_AGE": conn_max_age,
+        "CONN_HEALTH_CHECKS": conn_max_age > 0,
+        "OPTIONS": {},
+    }
+    if pool_max_size:
+        # Pooled connections are returned after every request, Django
+        # refuses persistent connections on top of a pool
+        database["CONN_MAX_AGE"] = 0
+        database["CONN_HEALTH_CHECKS"] = False
+        database["OPTIONS"]["pool"] = {
+            "min_size": pool_min_size,
+            "max_size": pool_max_size,
+            "timeout": pool_timeout,
+        }
+    return database
+
+
+def database_from_env(config: Callable, base_dir: Path) -> Dict:
+    """
+    Reads the ``DB_*``/``SQLITE_*`` variables through ``decouple.config``.
+    """
+    engine = config("DB_ENGINE", default="sqlite")
+    if engine == "sqlite":
+        return sqlite_settings(
+            config("DB_NAME", default=str(base_dir / "db.sqlite3")),
+            tuned=config("SQLITE_TUNED", default=True, cast=bool),
+            busy_timeout=config("SQLITE_BUSY_TIMEOUT", default=20, cast=float),
+            mmap_size=config("SQLITE_MMAP_SIZE", default=256 * 1024 * 1024, cast=int),
+        )
+    if engine == "postgres":
+        return postgres_settings(
+            config("DB_NAME", default="mf_broker"),
+            config("DB_USER", default="postgres"),
+            config("DB_PASSWORD", default=""),
+            config("DB_HOST", default="localhost"),
+            config("DB_PORT", default="5432"),
+            conn_max_age=config("DB_CONN_MAX_AGE", default=60, cast=int),
+            pool_min_size=config("DB_POOL_MIN_SIZE", default=0, cast=int),
+            pool_max_size=config("DB_POOL_MAX_SIZE", default=0, cast=int),
+            pool_timeout=config("DB_POOL_TIMEOUT", default=10, cast=float),
+        )
+    raise ImproperlyConfigured(f"Unsupported DB_ENGINE {engine!r}")
@@ -11,7 +11,10 @@ https://docs.djangoproject.com/en/5.1/ref/settings/
 """
 
 from pathlib import Path
-from decouple import config
+from decouple import Csv, config
+from django.core.exceptions import ImproperlyConfigured
+
+from mf_broker.database import database_from_env
 
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -54,6 +57,7 @@ MIDDLEWARE = [
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
+    "api.middleware.MetricsMiddleware",
 ]
 
 ROOT_URLCONF = "mf_broker.urls"
@@ -80,12 +84,10 @@ WSGI_APPLICATION = "mf_broker.wsgi.application"
 # Database
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
 
-DATABASES = {
-    "default": {
-        "ENGINE": "django.db.backends.sqlite3",
-        "NAME": BASE_DIR / "db.sqlite3",
-    }
-}
+# DB_ENGINE selects "sqlite" (default, tuned for concurrent access) or
+# "postgres", see mf_broker/database.py for the other DB_* variables
+
+DATABASES = {"default": database_from_env(config, BASE_DIR)}
 
 
 # Password validation
@@ -106,6 +108,30 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+# Password hashing
+# https://docs.djangoproject.com/en/5.1/topics/auth/passwords/
+# PASSWORD_HASHER picks the hasher for new hashes: "pbkdf2", "scrypt" or
+# "argon2" (needs argon2-cffi). Hashes made by the others, or with another
+# PASSWORD_PBKDF2_ITERATIONS (0 keeps Django's default), still verify and
+# are rehashed on the next login.
+PASSWORD_HASHER = config("PASSWORD_HASHER", default="pbkdf2")
+PASSWORD_PBKDF2_ITERATIONS = config("PASSWORD_PBKDF2_ITERATIONS", default=0, cast=int)
+_PASSWORD_HASHERS = {
+    "pbkdf2": "api.hashers.ConfigurablePBKDF2PasswordHasher",
+    "scrypt": "django.contrib.auth.hashers.ScryptPasswordHasher",
+    "argon2": "django.contrib.auth.hashers.Argon2PasswordHasher",
+}
+if PASSWORD_HASHER not in _PASSWORD_HASHERS:
+    raise ImproperlyConfigured(f"Unsupported PASSWORD_HASHER {PASSWORD_HASHER!r}")
+PASSWORD_HASHERS = (
+    [_PASSWORD_HASHERS[PASSWORD_HASHER]]
+    + [hasher for name, hasher in _PASSWORD_HASHERS.items() if name != PASSWORD_HASHER]
+    + [
+        "django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher",
+        "django.contrib.auth.hashers.BCryptSHA256PasswordHasher",
+    ]
+)
+
 
 # Internationalization
 # https://docs.djangoproject.com/en/5.1/topics/i18n/
@@ -132,7 +158,7 @@ DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": [
-        "rest_framework.authentication.TokenAuthentication",
+        "api.authentication.CachedTokenAuthentication",
         "rest_framework.authentication.SessionAuthentication",
     ],
 }
@@ -141,3 +167,106 @@ REST_FRAMEWORK = {
 RAPID_API_URL = config("RAPID_API_URL")
 RAPID_API_HOST = config("RAPID_API_HOST")
 RAPID_API_KEY = config("RAPID_API_KEY")
+
+# Cache
+# https://docs.djangoproject.com/en/5.1/topics/cache/
+# Any backend works, e.g. django.core.cache.backends.filebased.FileBasedCache
+# or django.core.cache.backends.redis.RedisCache (needs the redis package).
+# Use a shared backend when running several workers so they share one fetch.
+
+CACHES = {
+    "default": {
+        "BACKEND": config(
+            "CACHE_BACKEND", default="django.core.cache.backends.locmem.LocMemCache"
+        ),
+        "LOCATION": config("CACHE_LOCATION", default=""),
+    }
+}
+
+# Fund families and upstream scheme types (Open, Close, Interval) making up
+# the catalogue, "all" covers every AMFI listed family. ingest_catalogue
+# streams each pair with one call, at most MF_CATALOGUE_MAX_CONCURRENCY at once.
+MF_CATALOGUE_FAMILIES = config("MF_CATALOGUE_FAMILIES", default="all", cast=Csv())
+MF_CATALOGUE_SCHEME_TYPES = config(
+    "MF_CATALOGUE_SCHEME_TYPES", default="Open", cast=Csv()
+)
+MF_CATALOGUE_MAX_CONCURRENCY = config(
+    "MF_CATALOGUE_MAX_CONCURRENCY", default=4, cast=int
+)
+# Whether add_fund may call upstream for schemes missing from the local catalogue
+MF_CATALOGUE_UPSTREAM_FALLBACK = config(
+    "MF_CATALOGUE_UPSTREAM_FALLBACK", default=False, cast=bool
+)
+# Seconds a scheme code unknown to the upstream is not looked up again
+SCHEME_LOOKUP_NEGATIVE_TTL = config("SCHEME_LOOKUP_NEGATIVE_TTL", default=60, cast=int)
+# Schemes per list_mfs page without a limit, and the largest limit accepted
+CATALOGUE_PAGE_SIZE = config("CATALOGUE_PAGE_SIZE", default=100, cast=int)
+CATALOGUE_MAX_PAGE_SIZE = config("CATALOGUE_MAX_PAGE_SIZE", default=1000, cast=int)
+# Maximum number of holdings accepted by one add_funds request
+BULK_ADD_MAX_ITEMS = config("BULK_ADD_MAX_ITEMS", default=500, cast=int)
+# Seconds a rendered list_portfolio response is kept, it is invalidated
+# early whenever the user's holdings or the NAV of a held fund change
+PORTFOLIO_CACHE_TTL = config("PORTFOLIO_CACHE_TTL", default=300, cast=int)
+# Seconds a token to user id lookup is cached, dropped early on logout. Off
+# by default, enabling it requires a shared CACHE_BACKEND
+AUTH_TOKEN_CACHE_TTL = config("AUTH_TOKEN_CACHE_TTL", default=0, cast=int)
+# Seconds between checks whether the in-process search index is stale, and
+# the most results one search may return
+SEARCH_INDEX_CHECK_INTERVAL = config(
+    "SEARCH_INDEX_CHECK_INTERVAL", default=1.0, cast=float
+)
+SEARCH_MAX_RESULTS = config("SEARCH_MAX_RESULTS", default=50, cast=int)
+# Most days of daily snapshots one portfolio_history request may return
+PORTFOLIO_HISTORY_MAX_DAYS = config("PORTFOLIO_HISTORY_MAX_DAYS", default=365, cast=int)
+# Seconds the stored fund level aggregates are kept, funds changed by
+# update_nav are recomputed in place, and the most funds one fund_stats
+# request returns
+FUND_STATS_TTL = config("FUND_STATS_TTL", default=900, cast=int)
+FUND_STATS_MAX_RESULTS = config("FUND_STATS_MAX_RESULTS", default=500, cast=int)
+# Rows fetched per round trip by the streaming exports
+EXPORT_CHUNK_SIZE = config("EXPORT_CHUNK_SIZE", default=2000, cast=int)
+
+# Prometheus metrics at api/v1/metrics/, only served to these client addresses
+METRICS_ENABLED = config("METRICS_ENABLED", default=True, cast=bool)
+METRICS_ALLOWED_IPS = config("METRICS_ALLOWED_IPS", default="127.0.0.1,::1", cast=Csv())
+
+# Upper bound on how long a single upstream fetch may hold the cache lock
+CACHE_LOCK_TIMEOUT = config("CACHE_LOCK_TIMEOUT", default=30, cast=int)
+
+# Upstream HTTP client
+UPSTREAM_CONNECT_TIMEOUT = config("UPSTREAM_CONNECT_TIMEOUT", default=3, cast=float)
+UPSTREAM_TIMEOUT = config("UPSTREAM_TIMEOUT", default=10, cast=float)
+UPSTREAM_POOL_SIZE = config("UPSTREAM_POOL_SIZE", default=16, cast=int)
+# Concurrent requests allowed per upstream host
+UPSTREAM_MAX_CONCURRENCY = config("UPSTREAM_MAX_CONCURRENCY", default=8, cast=int)
+# Concurrent requests of the async views per event loop, on their own pool
+UPSTREAM_ASYNC_MAX_CONCURRENCY = config(
+    "UPSTREAM_ASYNC_MAX_CONCURRENCY", default=200, cast=int
+)
+# Retries of failed calls, spaced by exponential backoff with jitter (seconds)
+UPSTREAM_RETRIES = config("UPSTREAM_RETRIES", default=2, cast=int)
+UPSTREAM_BACKOFF = config("UPSTREAM_BACKOFF", default=0.25, cast=float)
+UPSTREAM_BACKOFF_MAX = config("UPSTREAM_BACKOFF_MAX", default=4, cast=float)
+# Consecutive failed calls that open the circuit breaker, and seconds it stays open
+UPSTREAM_BREAKER_THRESHOLD = config("UPSTREAM_BREAKER_THRESHOLD", default=5, cast=int)
+UPSTREAM_BREAKER_RESET = config("UPSTREAM_BREAKER_RESET", default=30, cast=float)
+# Seconds the last good scheme lookup is served while the upstream is failing
+UPSTREAM_STALE_TTL = config("UPSTREAM_STALE_TTL", default=86400, cast=int)
+
+# NAV refresh engine used by the update_nav command
+NAV_REFRESH_WORKERS = config("NAV_REFRESH_WORKERS", default=8, cast=int)
+# Upstream requests per second, 0 disables rate limiting
+NAV_REFRESH_RATE_LIMIT = config("NAV_REFRESH_RATE_LIMIT", default=0, cast=float)
+NAV_REFRESH_CHUNK_SIZE = config("NAV_REFRESH_CHUNK_SIZE", default=500, cast=int)
+
+# Upstream NAV publication, NAVs dated a business day appear after this time
+NAV_PUBLISH_TIME = config("NAV_PUBLISH_TIME", default="23:00")
+NAV_PUBLISH_TIMEZONE = config("NAV_PUBLISH_TIMEZONE", default="Asia/Kolkata")
+# update_nav --daemon: seconds between refreshes while NAVs are due, the
+# longest back-off while the upstream has not published them yet, and how
+# long a node's lease lasts without being renewed
+NAV_SCHEDULER_INTERVAL = config("NAV_SCHEDULER_INTERVAL", default=300, cast=float)
+NAV_SCHEDULER_MAX_INTERVAL = config(
+    "NAV_SCHEDULER_MAX_INTERVAL", default=3600, cast=float
+)
+NAV_SCHEDULER_LEASE_TTL = config("NAV_SCHEDULER_LEASE_TTL", default=900, cast=int)
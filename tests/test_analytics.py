@@ -0,0 +1,106 @@
+from datetime import date, timedelta
+import numpy as np
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+from api.analytics import CashFlows, compute_metrics, xirr_matrix
+from api.ledger import record_buy, record_sell
+from api.models import FundTransaction, MutualFund, UserFunds
+
+
+class XirrTests(TestCase):
+
+    def test_single_period_matches_simple_return(self):
+        rates = xirr_matrix(np.array([[-100.0, 110.0]]), np.array([[0.0, 1.0]]))
+        self.assertAlmostEqual(rates[0], 0.10, places=9)
+
+    def test_rows_are_solved_independently(self):
+        amounts = np.array(
+            [[-1000.0, -1000.0, 2300.0], [-500.0, 400.0, 0.0], [100.0, 50.0, 0.0]]
+        )
+        years = np.array([[0.0, 0.5, 1.0], [0.0, 2.0, 0.0], [0.0, 1.0, 0.0]])
+        rates = xirr_matrix(amounts, years)
+        npv = (amounts[:2] * (1 + rates[:2, None]) ** -years[:2]).sum(axis=1)
+        np.testing.assert_allclose(npv, 0, atol=1e-6)
+        self.assertLess(rates[1], 0)
+        self.assertTrue(np.isnan(rates[2]))
+
+    def test_many_holdings_converge(self):
+        rng = np.random.default_rng(7)
+        amounts = -rng.uniform(100, 1000, size=(500, 24))
+        amounts[:, -1] = -amounts[:, :-1].sum(axis=1) * rng.uniform(0.5, 3, 500)
+        years = np.tile(np.arange(24) / 12.0, (500, 1))
+        rates = xirr_matrix(amounts, years)
+        npv = (amounts * (1 + rates[:, None]) ** -years).sum(axis=1)
+        self.assertTrue(np.isfinite(rates).all())
+        np.testing.assert_allclose(npv / np.abs(amounts).sum(axis=1), 0, atol=1e-9)
+
+    def test_compute_metrics(self):
+        flows = CashFlows(
+            holding=np.array([0, 1]),
+            dates=np.array(["2024-01-01", "2024-07-01"], dtype="datetime64[D]"),
+            amounts=np.array([-100.0, -200.0]),
+        )
+        metrics = compute_metrics(flows, np.array([121.0, 200.0]), date(2025, 12, 31))
+        np.testing.assert_allclose(metrics["invested"], [100, 200])
+        np.testing.assert_allclose(metrics["absolute_return"], [0.21, 0.0])
+        self.assertAlmostEqual(metrics["cagr"][0], 0.1, places=3)
+        self.assertAlmostEqual(metrics["total"]["invested"][0], 300)
+        self.assertAlmostEqual(metrics["total"]["current_value"][0], 321)
+
+
+class PortfolioAnalyticsViewTests(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+        self.url = reverse("portfolio_analytics")
+        self.user = get_user_model().objects.create_user(
+            username="test@example.com", password="testpass123"
+        )
+        self.client.force_authenticate(user=self.user)
+        fund = MutualFund.objects.create(name="Fund A", scheme_Code="100", nav=12)
+        record_buy(
+            self.user,
+            fund,
+            10,
+            nav=10,
+            on=timezone.localdate() - timedelta(days=365),
+        )
+
+    def test_unauthenticated_access(self):
+        self.client.force_authenticate(user=None)
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_metrics(self):
+        with self.assertNumQueries(2):
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        holding = response.data["holdings"][0]
+        self.assertEqual(holding["mf_name"], "Fund A")
+        self.assertEqual(holding["invested"], 100)
+        self.assertEqual(holding["current_value"], 120)
+        self.assertEqual(holding["absolute_return"], 0.2)
+        self.assertAlmostEqual(holding["cagr"], 0.2, places=3)
+        self.assertAlmostEqual(holding["xirr"], 0.2, places=3)
+        self.assertEqual(response.data["total"]["current_value"], 120)
+
+    def test_sold_out_holding_keeps_realised_return(self):
+        fund = MutualFund.objects.get(scheme_Code="100")
+        record_sell(self.user, fund, 10, nav=12)
+        response = self.client.get(self.url)
+        holding = response.data["holdings"][0]
+        self.assertEqual(holding["quantity"], 0)
+        self.assertEqual(holding["current_value"], 0)
+        self.assertEqual(holding["absolute_return"], 0.2)
+
+    def test_empty_portfolio(self):
+        FundTransaction.objects.all().delete()
+        UserFunds.objects.all().delete()
+        response = self.client.get(self.url)
+        self.assertEqual(response.data["holdings"], [])
+        self.assertEqual(response.data["total"]["invested"], 0)
+        self.assertIsNone(response.data["total"]["xirr"])
@@ -0,0 +1,100 @@
+from unittest.mock import patch
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+from api.catalogue import ingest_schemes
+from api.models import MutualFund, UserFunds
+from api.stub_upstream import make_scheme
+
+
+class AsyncViewTests(TestCase):
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            username="test@example.com", password="testpass123"
+        )
+        token = Token.objects.create(user=self.user)
+        self.headers = {"Authorization": f"Token {token.key}"}
+        ingest_schemes(make_scheme(i) for i in range(5))
+
+    async def test_unauthenticated_access(self):
+        response = await self.async_client.get(reverse("async_list_mutual_funds"))
+        self.assertEqual(response.status_code, 401)
+        response = await self.async_client.post(
+            reverse("async_add_mf"),
+            {"scheme_Code": "100000", "quantity": 1},
+            content_type="application/json",
+            headers={"Authorization": "Token nope"},
+        )
+        self.assertEqual(response.status_code, 401)
+
+    async def test_list_matches_sync_view(self):
+        url = "?family=Axis%20Mutual%20Fund&fields=Scheme_Code,Net_Asset_Value"
+        sync_response = await self.async_client.get(
+            reverse("list_mutual_funds") + url, headers=self.headers
+        )
+        response = await self.async_client.get(
+            reverse("async_list_mutual_funds") + url, headers=self.headers
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), sync_response.json())
+        self.assertEqual(len(response.json()["results"]), 2)
+
+    async def test_list_paginated(self):
+        response = await self.async_client.get(
+            reverse("async_list_mutual_funds") + "?limit=2&offset=2",
+            headers=self.headers,
+        )
+        data = response.json()
+        self.assertEqual(data["count"], 5)
+        self.assertEqual(len(data["results"]), 2)
+        self.assertIn("offset=4", data["next"])
+
+    async def test_add_known_fund(self):
+        for _ in range(2):
+            response = await self.async_client.post(
+                reverse("async_add_mf"),
+                {"scheme_Code": "100000", "quantity": 5},
+                content_type="application/json",
+                headers=self.headers,
+            )
+            self.assertEqual(response.status_code, 201)
+        holding = await UserFunds.objects.aget(user=self.user)
+        self.assertEqual(holding.quantity, 10)
+
+    async def test_add_invalid_and_unknown(self):
+        response = await self.async_client.post(
+            reverse("async_add_mf"),
+            {"scheme_Code": "100000", "quantity": 0},
+            content_type="application/json",
+            headers=self.headers,
+        )
+        self.assertEqual(response.status_code, 400)
+        response = await self.async_client.post(
+            reverse("async_add_mf"),
+            {"scheme_Code": "999", "quantity": 1},
+            content_type="application/json",
+            headers=self.headers,
+        )
+        self.assertEqual(response.status_code, 404)
+
+    @override_settings(MF_CATALOGUE_UPSTREAM_FALLBACK=True)
+    async def test_add_fetches_unknown_fund(self):
+        async def lookup(scheme_code):
+            return {
+                "Scheme_Code": 999,
+                "Scheme_Name": "New Fund",
+                "Net_Asset_Value": 12,
+            }
+
+        with patch("api.async_views.aget_single_fund_details", side_effect=lookup):
+            response = await self.async_client.post(
+                reverse("async_add_mf"),
+                {"scheme_Code": "999", "quantity": 1},
+                content_type="application/json",
+                headers=self.headers,
+            )
+        self.assertEqual(response.status_code, 201)
+        fund = await MutualFund.objects.aget(scheme_Code="999")
+        self.assertEqual(fund.name, "New Fund")
@@ -0,0 +1,164 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import identify_hasher
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+from rest_framework.exceptions import AuthenticationFailed
+from api.authentication import (
+    CachedTokenAuthentication,
+    token_cache_key,
+    user_cache_keys,
+)
+from api.checks import check_token_cache
+
+LOCAL_CACHE = {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}
+FILE_CACHE = {
+    "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+    "LOCATION": "/tmp/mf-broker-test-cache",
+}
+
+
+@override_settings(AUTH_TOKEN_CACHE_TTL=60)
+class CachedTokenAuthenticationTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            username="test@example.com", password="testpass123"
+        )
+        self.token = Token.objects.create(user=self.user)
+        self.headers = {"Authorization": f"Token {self.token.key}"}
+
+    def test_warm_lookup_runs_no_query(self):
+        authentication = CachedTokenAuthentication()
+        with self.assertNumQueries(1):
+            user, token = authentication.authenticate_credentials(self.token.key)
+        # The first cached lookup reads the user into its snapshot
+        with self.assertNumQueries(1):
+            authentication.authenticate_credentials(self.token.key)
+        with self.assertNumQueries(0):
+            cached_user, _ = authentication.authenticate_credentials(self.token.key)
+        self.assertEqual((user.pk, token.key), (cached_user.pk, self.token.key))
+        self.assertEqual(cached_user.username, "test@example.com")
+
+    def test_only_the_user_id_is_cached_for_the_token(self):
+        CachedTokenAuthentication().authenticate_credentials(self.token.key)
+        self.assertEqual(cache.get(token_cache_key(self.token.key)), self.user.pk)
+
+    def test_password_is_not_cached(self):
+        authentication = CachedTokenAuthentication()
+        for _ in range(2):
+            authentication.authenticate_credentials(self.token.key)
+        self.assertNotIn(
+            self.user.password, str(cache.get(user_cache_keys(self.user.pk)[0]))
+        )
+        user, _ = authentication.authenticate_credentials(self.token.key)
+        # Deferred, so saving the cached user leaves the password alone
+        user.first_name = "Test"
+        user.save()
+        self.assertTrue(
+            get_user_model().objects.get(pk=self.user.pk).check_password("testpass123")
+        )
+
+    def test_saving_the_user_elsewhere_is_seen(self):
+        for _ in range(2):
+            self.client.get(reverse("portfolio"), headers=self.headers)
+        user = get_user_model().objects.get(pk=self.user.pk)
+        user.is_active = False
+        user.save()
+        response = self.client.get(reverse("portfolio"), headers=self.headers)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_deleted_user_is_rejected(self):
+        authentication = CachedTokenAuthentication()
+        for _ in range(2):
+            authentication.authenticate_credentials(self.token.key)
+        user_id, key = self.user.pk, self.token.key
+        self.user.delete()
+        with self.assertRaises(AuthenticationFailed):
+            authentication.authenticate_credentials(key)
+        self.assertIsNone(cache.get(user_cache_keys(user_id)[1]))
+
+    def test_logout_invalidates_cached_token(self):
+        self.client.get(reverse("portfolio"), headers=self.headers)
+        response = self.client.post(reverse("logout"), headers=self.headers)
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        response = self.client.get(reverse("portfolio"), headers=self.headers)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_deactivating_user_invalidates_cached_token(self):
+        self.client.get(reverse("portfolio"), headers=self.headers)
+        self.user.is_active = False
+        self.user.save()
+        response = self.client.get(reverse("portfolio"), headers=self.headers)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_async_views_share_the_cache(self):
+        for _ in range(2):
+            self.client.get(reverse("portfolio"), headers=self.headers)
+        # The count and the page
+        with self.assertNumQueries(2):
+            response = self.client.get(
+                reverse("async_list_mutual_funds"), {"limit": 1}, headers=self.headers
+            )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+
+class TokenCacheCheckTests(TestCase):
+
+    def test_local_cache_is_refused(self):
+        with self.settings(CACHES={"default": LOCAL_CACHE}, AUTH_TOKEN_CACHE_TTL=60):
+            self.assertEqual(
+                [error.id for error in check_token_cache(None)], ["api.E001"]
+            )
+
+    def test_shared_cache_or_disabled_cache_passes(self):
+        with self.settings(CACHES={"default": FILE_CACHE}, AUTH_TOKEN_CACHE_TTL=60):
+            self.assertEqual(check_token_cache(None), [])
+        with self.settings(CACHES={"default": LOCAL_CACHE}, AUTH_TOKEN_CACHE_TTL=0):
+            self.assertEqual(check_token_cache(None), [])
+
+
+class PasswordHasherTests(TestCase):
+
+    def login(self):
+        return APIClient().post(
+            reverse("login"),
+            {"username": "test@example.com", "password": "testpass123"},
+            format="json",
+        )
+
+    @override_settings(PASSWORD_PBKDF2_ITERATIONS=1000)
+    def test_iterations_follow_setting(self):
+        user = get_user_model().objects.create_user(
+            username="test@example.com", password="testpass123"
+        )
+        self.assertTrue(user.password.startswith("pbkdf2_sha256$1000$"))
+
+    def test_rehashes_on_login_when_policy_changes(self):
+        with self.settings(PASSWORD_PBKDF2_ITERATIONS=1000):
+            user = get_user_model().objects.create_user(
+                username="test@example.com", password="testpass123"
+            )
+        with self.settings(PASSWORD_PBKDF2_ITERATIONS=2000):
+            self.assertEqual(self.login().status_code, status.HTTP_200_OK)
+        user.refresh_from_db()
+        self.assertTrue(user.password.startswith("pbkdf2_sha256$2000$"))
+
+    def test_upgrades_to_preferred_algorithm(self):
+        with self.settings(PASSWORD_PBKDF2_ITERATIONS=1000):
+            user = get_user_model().objects.create_user(
+                username="test@example.com", password="testpass123"
+            )
+        hashers = [
+            "django.contrib.auth.hashers.ScryptPasswordHasher",
+            "api.hashers.ConfigurablePBKDF2PasswordHasher",
+        ]
+        with self.settings(PASSWORD_HASHERS=hashers):
+            self.assertEqual(self.login().status_code, status.HTTP_200_OK)
+            user.refresh_from_db()
+            self.assertEqual(identify_hasher(user.password).algorithm, "scrypt")
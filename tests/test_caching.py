@@ -0,0 +1,32 @@
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+from django.contrib.auth import get_user_model
+from api.utils import catalogue_sources
+
+
+@override_settings(
+    MF_CATALOGUE_FAMILIES=["Axis Mutual Fund"], MF_CATALOGUE_SCHEME_TYPES=["Open"]
+)
+class CatalogueSourcesTests(TestCase):
+
+    def test_configured_sources(self):
+        self.assertEqual(catalogue_sources(), [("Axis Mutual Fund", "Open")])
+
+    @override_settings(MF_CATALOGUE_FAMILIES=["all"])
+    def test_all_families(self):
+        self.assertGreater(len(catalogue_sources()), 40)
+        self.assertIn(("SBI Mutual Fund", "Open"), catalogue_sources())
+
+    def test_cache_stats_requires_admin(self):
+        client = APIClient()
+        user = get_user_model().objects.create_user(username="user", password="pw")
+        client.force_authenticate(user=user)
+        response = client.get(reverse("cache_stats"))
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        user.is_staff = True
+        user.save()
+        response = client.get(reverse("cache_stats"))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn("calls", response.data["scheme_lookups"])
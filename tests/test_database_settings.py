@@ -0,0 +1,52 @@
+from pathlib import Path
+from django.core.exceptions import ImproperlyConfigured
+from django.test import SimpleTestCase
+from mf_broker.database import database_from_env
+
+
+def fake_config(env):
+    def config(name, default=None, cast=None):
+        value = env.get(name, default)
+        if cast is bool and isinstance(value, str):
+            return value.lower() in ("1", "true", "yes", "on")
+        return cast(value) if cast else value
+
+    return config
+
+
+class DatabaseSettingsTests(SimpleTestCase):
+
+    def test_tuned_sqlite_by_default(self):
+        database = database_from_env(fake_config({}), Path("/app"))
+        self.assertEqual(database["NAME"], "/app/db.sqlite3")
+        options = database["OPTIONS"]
+        self.assertEqual(options["transaction_mode"], "IMMEDIATE")
+        self.assertIn("PRAGMA journal_mode=WAL", options["init_command"])
+        self.assertIn("PRAGMA synchronous=NORMAL", options["init_command"])
+
+    def test_plain_sqlite(self):
+        database = database_from_env(
+            fake_config({"SQLITE_TUNED": "false"}), Path("/app")
+        )
+        self.assertNotIn("OPTIONS", database)
+
+    def test_postgres_persistent_connections(self):
+        database = database_from_env(
+            fake_config({"DB_ENGINE": "postgres", "DB_HOST": "db"}), Path("/app")
+        )
+        self.assertEqual(database["ENGINE"], "django.db.backends.postgresql")
+        self.assertEqual(database["HOST"], "db")
+        self.assertEqual(database["CONN_MAX_AGE"], 60)
+        self.assertNotIn("pool", database["OPTIONS"])
+
+    def test_postgres_pool_disables_persistent_connections(self):
+        database = database_from_env(
+            fake_config({"DB_ENGINE": "postgres", "DB_POOL_MAX_SIZE": "20"}),
+            Path("/app"),
+        )
+        self.assertEqual(database["CONN_MAX_AGE"], 0)
+        self.assertEqual(database["OPTIONS"]["pool"]["max_size"], 20)
+
+    def test_unknown_engine(self):
+        with self.assertRaises(ImproperlyConfigured):
+            database_from_env(fake_config({"DB_ENGINE": "oracle"}), Path("/app"))
@@ -0,0 +1,111 @@
+import csv
+import gzip
+import io
+import json
+import os
+import tempfile
+from decimal import Decimal
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+from api.export import export_stream, holdings_rows
+from api.models import MutualFund, UserFunds
+from api.views import ExportView
+
+
+class ExportTests(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(username="alice", password="x")
+        self.other = get_user_model().objects.create_user(username="bob", password="x")
+        self.funds = [
+            MutualFund.objects.create(
+                name=f"Fund {i}", scheme_Code=str(100 + i), nav="12.50"
+            )
+            for i in range(3)
+        ]
+        for fund in self.funds:
+            UserFunds.objects.create(
+                user=self.user, mutual_fund=fund, quantity=2, invested=20
+            )
+        UserFunds.objects.create(user=self.other, mutual_fund=self.funds[0], quantity=1)
+
+    def content(self, response) -> bytes:
+        return b"".join(response.streaming_content)
+
+    def test_portfolio_as_ndjson(self):
+        self.client.force_authenticate(user=self.user)
+        response = self.client.get(reverse("export_portfolio"))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+        rows = [json.loads(line) for line in self.content(response).splitlines()]
+        self.assertEqual(len(rows), 3)
+        self.assertEqual(rows[0]["username"], "alice")
+        self.assertEqual(rows[0]["scheme_Code"], "100")
+        self.assertEqual(Decimal(rows[0]["current_value"]), 25)
+
+    def test_catalogue_as_gzipped_csv(self):
+        self.client.force_authenticate(user=self.user)
+        response = self.client.get(
+            reverse("export_catalogue"),
+            {"output": "csv", "gzip": "true"},
+            HTTP_ACCEPT="text/csv",
+        )
+        self.assertEqual(response["Content-Type"], "application/gzip")
+        self.assertIn('filename="catalogue.csv.gz"', response["Content-Disposition"])
+        text = gzip.decompress(self.content(response)).decode()
+        rows = list(csv.DictReader(io.StringIO(text)))
+        self.assertEqual([row["scheme_Code"] for row in rows], ["100", "101", "102"])
+        self.assertEqual(rows[0]["nav"], "12.5000")
+
+    def test_unknown_format(self):
+        self.client.force_authenticate(user=self.user)
+        response = self.client.get(reverse("export_catalogue"), {"output": "xml"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_all_holdings_require_admin(self):
+        self.client.force_authenticate(user=self.user)
+        response = self.client.get(reverse("export_holdings"))
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+        self.user.is_staff = True
+        self.user.save()
+        response = self.client.get(reverse("export_holdings"))
+        self.assertEqual(len(self.content(response).splitlines()), 4)
+
+    def test_stream_is_buffered(self):
+        funds = MutualFund.objects.bulk_create(
+            MutualFund(name=f"Fund {i}", scheme_Code=str(100 + i), nav=1)
+            for i in range(3, 500)
+        )
+        UserFunds.objects.bulk_create(
+            UserFunds(user=self.other, mutual_fund=fund) for fund in funds
+        )
+        chunks = list(
+            export_stream(holdings_rows(), ["id", "username"], "csv", chunk_size=50)
+        )
+        # 501 rows and the header fit in one buffer
+        self.assertEqual(len(chunks), 1)
+        self.assertEqual(chunks[0].count(b"\n"), 502)
+
+    def test_command_writes_file(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "holdings.ndjson.gz")
+            out = io.StringIO()
+            call_command(
+                "export_data", "holdings", "--output", path, "--gzip", stdout=out
+            )
+            with gzip.open(path, "rt") as f:
+                self.assertEqual(len(f.readlines()), 4)
+        self.assertIn("Exported holdings", out.getvalue())
+
+    def test_export_view_requires_rows(self):
+        class NoRowsView(ExportView):
+            name = "empty"
+
+        with self.assertRaises(TypeError):
+            NoRowsView()
@@ -0,0 +1,34 @@
+from decimal import Decimal
+from django.db import connection
+from django.test import SimpleTestCase, TestCase
+from api.fields import format_units, from_units, to_units
+from api.models import MutualFund
+
+
+class ConversionTests(SimpleTestCase):
+
+    def test_round_trip(self):
+        for value in ("0", "0.0001", "12.3456", "-7.5", "99999.9999"):
+            self.assertEqual(from_units(to_units(value)), Decimal(value))
+            self.assertEqual(Decimal(format_units(to_units(value))), Decimal(value))
+
+    def test_rounds_half_to_even(self):
+        self.assertEqual(to_units("1.00005"), 10000)
+        self.assertEqual(to_units("1.00015"), 10002)
+        self.assertEqual(to_units(0.1), 1000)
+
+
+class ScaledDecimalFieldTests(TestCase):
+
+    def test_stores_integer_units(self):
+        fund = MutualFund.objects.create(name="A", scheme_Code="1", nav="2624.3258")
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT nav FROM api_mutualfund WHERE id = %s", [fund.pk])
+            self.assertEqual(cursor.fetchone()[0], 26243258)
+        fund.refresh_from_db()
+        self.assertEqual(fund.nav, Decimal("2624.3258"))
+
+    def test_lookups_use_units(self):
+        MutualFund.objects.create(name="A", scheme_Code="1", nav="10.5")
+        self.assertTrue(MutualFund.objects.filter(nav=Decimal("10.5000")).exists())
+        self.assertFalse(MutualFund.objects.filter(nav__gt=10.5).exists())
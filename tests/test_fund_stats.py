@@ -0,0 +1,149 @@
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+from api.fund_stats import compute_fund_stats, fund_stats, summarize, top_funds
+from api.models import FundStats, MutualFund, UserFunds
+from api.nav_refresh import refresh_navs
+
+# A separate cache, as seen by update_nav or a worker in another process
+OTHER_PROCESS_CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "other-process",
+    }
+}
+
+
+class FundStatsTests(TestCase):
+
+    def setUp(self):
+        users = [
+            get_user_model().objects.create_user(username=f"u{i}") for i in range(3)
+        ]
+        self.fund_a = MutualFund.objects.create(name="A", scheme_Code="100", nav=10)
+        self.fund_b = MutualFund.objects.create(name="B", scheme_Code="200", nav=50)
+        self.fund_c = MutualFund.objects.create(name="C", scheme_Code="300", nav=1)
+        for user in users:
+            UserFunds.objects.create(
+                user=user, mutual_fund=self.fund_a, quantity=10, invested=90
+            )
+        UserFunds.objects.create(
+            user=users[0], mutual_fund=self.fund_b, quantity=4, invested=180
+        )
+        UserFunds.objects.create(
+            user=users[1], mutual_fund=self.fund_c, quantity=0, invested=0
+        )
+
+    def test_aggregates_every_held_fund_in_one_query(self):
+        with self.assertNumQueries(1):
+            computed = compute_fund_stats()
+        funds = fund_stats()["funds"]
+        self.assertEqual(funds, computed)
+        self.assertEqual(set(funds), {self.fund_a.pk, self.fund_b.pk})
+        self.assertEqual(funds[self.fund_a.pk]["holders"], 3)
+        self.assertEqual(funds[self.fund_a.pk]["units"], 30)
+        self.assertEqual(funds[self.fund_a.pk]["invested"], Decimal("270.00"))
+        self.assertEqual(funds[self.fund_a.pk]["aum"], Decimal("300.00"))
+        self.assertEqual(
+            summarize(funds),
+            {
+                "funds": 2,
+                "holdings": 4,
+                "invested": Decimal("450.00"),
+                "aum": Decimal("500.00"),
+            },
+        )
+        self.assertEqual(
+            [fund["scheme_Code"] for fund in top_funds(funds, "holders", 1)], ["100"]
+        )
+
+    def test_stored_until_refreshed(self):
+        fund_stats()
+        UserFunds.objects.filter(mutual_fund=self.fund_a).update(quantity=1)
+        # One read of the stored rows
+        with self.assertNumQueries(1):
+            self.assertEqual(fund_stats()["funds"][self.fund_a.pk]["units"], 30)
+        self.assertEqual(fund_stats(refresh=True)["funds"][self.fund_a.pk]["units"], 3)
+
+    def test_nav_update_recomputes_changed_funds(self):
+        fund_stats()
+        refresh_navs(
+            [self.fund_b],
+            workers=1,
+            fetch=lambda code: {"Net_Asset_Value": 55},
+        )
+        funds = fund_stats()["funds"]
+        self.assertEqual(funds[self.fund_b.pk]["aum"], Decimal("220.00"))
+        self.assertEqual(funds[self.fund_a.pk]["aum"], Decimal("300.00"))
+
+    def test_nav_update_in_another_process_reaches_readers(self):
+        fund_stats()
+        # update_nav running in another process does not share our cache
+        with override_settings(CACHES=OTHER_PROCESS_CACHES):
+            refresh_navs(
+                [self.fund_b],
+                workers=1,
+                fetch=lambda code: {"Net_Asset_Value": 55},
+            )
+        with self.assertNumQueries(1):
+            funds = fund_stats()["funds"]
+        self.assertEqual(funds[self.fund_b.pk]["aum"], Decimal("220.00"))
+
+    def test_expired_stats_are_recomputed(self):
+        fund_stats()
+        FundStats.objects.update(computed_at=timezone.now() - timedelta(days=1))
+        UserFunds.objects.filter(mutual_fund=self.fund_b).delete()
+        self.assertEqual(set(fund_stats()["funds"]), {self.fund_a.pk})
+        self.assertEqual(FundStats.objects.count(), 1)
+
+    def test_command_prints_top_funds(self):
+        out = StringIO()
+        call_command("fund_stats", "--order", "units", "--limit", "1", stdout=out)
+        lines = out.getvalue().splitlines()
+        self.assertTrue(lines[1].startswith("100 "))
+        self.assertEqual(len(lines), 3)
+        self.assertIn("2 funds, 4 holdings, AUM 500.00", lines[2])
+
+
+class FundStatsViewTests(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+        self.url = reverse("fund_stats")
+        self.admin = get_user_model().objects.create_user(
+            username="admin", is_staff=True
+        )
+        self.client.force_authenticate(user=self.admin)
+        fund = MutualFund.objects.create(name="A", scheme_Code="100", nav=10)
+        UserFunds.objects.create(
+            user=self.admin, mutual_fund=fund, quantity=2, invested=15
+        )
+
+    def test_returns_top_funds_and_totals(self):
+        response = self.client.get(self.url, {"order": "holders"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["totals"]["aum"], Decimal("20.00"))
+        self.assertEqual(response.data["funds"][0]["scheme_Code"], "100")
+
+    def test_single_fund(self):
+        response = self.client.get(self.url, {"scheme_Code": "100"})
+        self.assertEqual(response.data["funds"][0]["holders"], 1)
+        response = self.client.get(self.url, {"scheme_Code": "999"})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_rejects_unknown_order(self):
+        response = self.client.get(self.url, {"order": "name"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_requires_staff(self):
+        user = get_user_model().objects.create_user(username="user")
+        self.client.force_authenticate(user=user)
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
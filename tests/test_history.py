@@ -0,0 +1,56 @@
+from datetime import date
+import numpy as np
+from django.test import TestCase
+from api.history import nav_series, nav_series_many, record_nav_points
+from api.models import MutualFund, NavHistory
+from api.nav_refresh import refresh_navs
+
+
+class NavHistoryTests(TestCase):
+
+    def setUp(self):
+        self.fund = MutualFund.objects.create(
+            name="Fund A", scheme_Code="100", nav=10, nav_date=date(2025, 2, 27)
+        )
+        self.other = MutualFund.objects.create(
+            name="Fund B", scheme_Code="200", nav=20, nav_date=date(2025, 2, 27)
+        )
+
+    def test_record_is_idempotent_per_day(self):
+        record_nav_points([self.fund, self.other])
+        self.fund.nav = 11
+        record_nav_points([self.fund])
+        self.assertEqual(NavHistory.objects.count(), 2)
+        self.assertEqual(NavHistory.objects.get(mutual_fund=self.fund).nav, 11)
+
+    def test_funds_without_nav_date_are_skipped(self):
+        self.fund.nav_date = None
+        self.assertEqual(record_nav_points([self.fund]), 0)
+
+    def test_range_query_returns_arrays(self):
+        for day, nav in [(25, 9.5), (26, 9.75), (27, 10)]:
+            NavHistory.objects.create(
+                mutual_fund=self.fund, date=date(2025, 2, day), nav=nav
+            )
+        dates, navs = nav_series(self.fund.pk, start=date(2025, 2, 26))
+        self.assertEqual(dates.dtype, np.dtype("datetime64[D]"))
+        np.testing.assert_array_equal(
+            dates, np.array(["2025-02-26", "2025-02-27"], dtype="datetime64[D]")
+        )
+        np.testing.assert_array_equal(navs, [9.75, 10.0])
+
+    def test_range_query_for_many_funds(self):
+        record_nav_points([self.fund, self.other])
+        series = nav_series_many([self.fund.pk, self.other.pk, 999])
+        np.testing.assert_array_equal(series[self.other.pk][1], [20.0])
+        self.assertEqual(len(series[999][0]), 0)
+
+    def test_refresh_appends_history(self):
+        refresh_navs(
+            MutualFund.objects.all(),
+            workers=2,
+            fetch=lambda code: {"Net_Asset_Value": 12, "Date": "28-Feb-2025"},
+        )
+        self.assertEqual(
+            NavHistory.objects.filter(date=date(2025, 2, 28), nav=12).count(), 2
+        )
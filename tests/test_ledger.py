@@ -0,0 +1,153 @@
+import tempfile
+from datetime import date
+from decimal import Decimal
+from django.contrib.auth import get_user_model
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+from api.ledger import (
+    InsufficientUnits,
+    import_transactions,
+    rebuild_holdings,
+    record_buy,
+    record_sell,
+)
+from api.models import FundTransaction, MutualFund, UserFunds
+
+
+class LedgerTests(TestCase):
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            username="test@example.com", password="testpass123"
+        )
+        self.fund = MutualFund.objects.create(name="Fund A", scheme_Code="100", nav=10)
+
+    def holding(self):
+        return UserFunds.objects.get(user=self.user, mutual_fund=self.fund)
+
+    def test_buys_accumulate(self):
+        record_buy(self.user, self.fund, 10)
+        record_buy(self.user, self.fund, 10, nav=Decimal("12.50"))
+        holding = self.holding()
+        self.assertEqual(holding.quantity, 20)
+        self.assertEqual(holding.invested, Decimal("225.00"))
+        self.assertEqual(FundTransaction.objects.count(), 2)
+
+    def test_sell_keeps_average_cost(self):
+        record_buy(self.user, self.fund, 10, nav=10)
+        record_buy(self.user, self.fund, 10, nav=20)
+        record_sell(self.user, self.fund, 5, nav=30)
+        holding = self.holding()
+        self.assertEqual(holding.quantity, 15)
+        self.assertEqual(holding.invested, Decimal("225.00"))
+
+    def test_oversell_is_rejected(self):
+        record_buy(self.user, self.fund, 5)
+        with self.assertRaises(InsufficientUnits):
+            record_sell(self.user, self.fund, 6)
+        self.assertEqual(self.holding().quantity, 5)
+        self.assertEqual(FundTransaction.objects.count(), 1)
+
+    def test_rebuild_matches_incremental_holding(self):
+        record_buy(self.user, self.fund, 10, nav=10, on=date(2024, 1, 1))
+        record_sell(self.user, self.fund, 4, nav=11, on=date(2024, 6, 1))
+        expected = self.holding()
+        UserFunds.objects.update(quantity=0, invested=0)
+        rebuild_holdings({(self.user.pk, self.fund.pk)})
+        holding = self.holding()
+        self.assertEqual(holding.quantity, expected.quantity)
+        self.assertEqual(holding.invested, expected.invested)
+
+    def test_import_is_all_or_nothing(self):
+        entries = [
+            FundTransaction(
+                user=self.user,
+                mutual_fund=self.fund,
+                kind=kind,
+                units=units,
+                nav=10,
+                date=date(2024, 1, day),
+            )
+            for kind, units, day in [
+                (FundTransaction.BUY, 5, 1),
+                (FundTransaction.SELL, 6, 2),
+            ]
+        ]
+        with self.assertRaises(InsufficientUnits):
+            import_transactions(entries)
+        self.assertFalse(FundTransaction.objects.exists())
+        self.assertFalse(UserFunds.objects.exists())
+
+    def test_import_command(self):
+        with tempfile.NamedTemporaryFile("w", suffix=".csv") as f:
+            f.write(
+                "user,scheme_code,kind,units,nav,date\n"
+                "test@example.com,100,buy,10,10.00,2024-01-01\n"
+                "test@example.com,100,sell,4,12.00,2024-02-01\n"
+            )
+            f.flush()
+            call_command("import_transactions", f.name, stdout=open("/dev/null", "w"))
+            self.assertEqual(self.holding().quantity, 6)
+            with self.assertRaises(CommandError):
+                call_command("import_transactions", f.name.replace(".csv", ".x"))
+
+    def test_import_command_rejects_invalid_rows(self):
+        header = "user,scheme_code,kind,units,nav,date\n"
+        for content, message in (
+            (header + "test@example.com,100,by,10,10.00,2024-01-01\n", "Line 2: kind"),
+            (header + "test@example.com,100,buy,ten,10.00,2024-01-01\n", "Line 2"),
+            (header + "test@example.com,100,buy,10,N.A.,2024-01-01\n", "Line 2"),
+            (header + "test@example.com,100,buy,10,10.00,01/01/2024\n", "Line 2"),
+            (header + "test@example.com,100,buy,10\n", "Line 2"),
+            ("user,scheme_code,kind,units\n", "Missing columns: date, nav"),
+        ):
+            with self.subTest(content=content), tempfile.NamedTemporaryFile(
+                "w", suffix=".csv"
+            ) as f:
+                f.write(content)
+                f.flush()
+                with self.assertRaisesMessage(CommandError, message):
+                    call_command("import_transactions", f.name)
+        self.assertFalse(FundTransaction.objects.exists())
+
+
+class SellFundsViewTests(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+        self.url = reverse("sell_mf")
+        self.user = get_user_model().objects.create_user(
+            username="test@example.com", password="testpass123"
+        )
+        self.client.force_authenticate(user=self.user)
+        self.fund = MutualFund.objects.create(name="Fund A", scheme_Code="100", nav=10)
+        record_buy(self.user, self.fund, 10)
+
+    def test_sell(self):
+        response = self.client.post(
+            self.url, {"scheme_Code": "100", "quantity": 4}, format="json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(UserFunds.objects.get(user=self.user).quantity, 6)
+
+    def test_sell_more_than_held(self):
+        response = self.client.post(
+            self.url, {"scheme_Code": "100", "quantity": 11}, format="json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_sell_unknown_fund(self):
+        response = self.client.post(
+            self.url, {"scheme_Code": "999", "quantity": 1}, format="json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_sold_out_holding_is_hidden_from_portfolio(self):
+        self.client.post(
+            self.url, {"scheme_Code": "100", "quantity": 10}, format="json"
+        )
+        response = self.client.get(reverse("portfolio"))
+        self.assertEqual(response.data, [])
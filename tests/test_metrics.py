@@ -0,0 +1,139 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+from api import metrics
+from api.models import MutualFund
+from api.nav_refresh import refresh_navs
+from api.stub_upstream import FIRST_SCHEME_CODE, run_stub_upstream
+from api.upstream import UpstreamClient
+from api.utils import get_fund_family_data
+
+
+class RegistryTests(SimpleTestCase):
+
+    def setUp(self):
+        self.registry = metrics.Registry()
+
+    def test_histogram_text_format(self):
+        histogram = self.registry.histogram(
+            "latency_seconds", "Latency.", ["view"], buckets=(0.1, 1)
+        )
+        histogram.observe(0.05, view="a")
+        histogram.observe(0.5, view="a")
+        histogram.observe(5, view="a")
+        text = self.registry.render()
+        self.assertIn("# TYPE latency_seconds histogram", text)
+        self.assertIn('latency_seconds_bucket{view="a",le="0.1"} 1', text)
+        self.assertIn('latency_seconds_bucket{view="a",le="1.0"} 2', text)
+        self.assertIn('latency_seconds_bucket{view="a",le="+Inf"} 3', text)
+        self.assertIn('latency_seconds_sum{view="a"} 5.55', text)
+        self.assertIn('latency_seconds_count{view="a"} 3', text)
+
+    def test_counter_escapes_labels(self):
+        counter = self.registry.counter("events_total", "Events.", ["name"])
+        counter.inc(name='say "hi"')
+        counter.inc(2, name='say "hi"')
+        self.assertIn('events_total{name="say \\"hi\\""} 3', self.registry.render())
+
+    def test_metric_requires_samples(self):
+        class NoSamples(metrics.Metric):
+            type = "untyped"
+
+        with self.assertRaises(TypeError):
+            NoSamples("nothing", "Nothing.")
+
+    def test_cache_hit_ratio(self):
+        self.assertEqual(
+            metrics.hit_ratio({"hits": 3, "stale_hits": 1, "misses": 4}), 0.5
+        )
+        self.assertEqual(metrics.hit_ratio({"misses": 0}), 0.0)
+
+
+class RequestMetricsTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(username="u", password="x")
+
+    def test_records_latency_and_queries_per_view(self):
+        self.client.force_authenticate(user=self.user)
+        requests_before = metrics.http_requests.value(
+            view="portfolio", method="GET", status=200
+        )
+        queries = metrics.http_request_queries.sum(view="portfolio")
+        self.client.get(reverse("portfolio"))
+        self.assertEqual(
+            metrics.http_requests.value(view="portfolio", method="GET", status=200),
+            requests_before + 1,
+        )
+        self.assertGreaterEqual(
+            metrics.http_request_queries.sum(view="portfolio"), queries + 1
+        )
+        self.assertGreater(
+            metrics.http_request_duration.count(view="portfolio", method="GET"), 0
+        )
+
+    def test_track_queries(self):
+        with metrics.track_queries() as stats:
+            list(MutualFund.objects.all())
+            list(MutualFund.objects.all())
+        self.assertEqual(stats.count, 2)
+        self.assertGreater(stats.duration, 0)
+
+    def test_metrics_endpoint_is_local_only(self):
+        self.client.get(reverse("portfolio"))
+        response = self.client.get(reverse("metrics"))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], metrics.CONTENT_TYPE)
+        text = response.content.decode()
+        self.assertIn(
+            'http_requests_total{view="portfolio",method="GET",status="401"}', text
+        )
+        self.assertIn('cache_hit_ratio{cache="portfolio"}', text)
+
+        response = self.client.get(reverse("metrics"), REMOTE_ADDR="10.0.0.1")
+        self.assertEqual(response.status_code, 403)
+
+    def test_nav_refresh_throughput(self):
+        MutualFund.objects.create(name="A", scheme_Code="1", nav=1)
+        updated = metrics.nav_refresh_funds.value(mode="single", result="updated")
+        refresh_navs(
+            MutualFund.objects.all(),
+            workers=1,
+            fetch=lambda code: {"Net_Asset_Value": 2},
+        )
+        self.assertEqual(
+            metrics.nav_refresh_funds.value(mode="single", result="updated"),
+            updated + 1,
+        )
+        self.assertGreater(metrics.nav_refresh_throughput.value(mode="single"), 0)
+
+
+class UpstreamMetricsTests(SimpleTestCase):
+
+    def test_records_attempts_and_latency_per_helper(self):
+        with run_stub_upstream(schemes=5) as server:
+            with override_settings(RAPID_API_URL=server.url):
+                server.failures = 1
+                client = UpstreamClient(retries=1, sleep=lambda delay: None)
+                failed = metrics.upstream_attempts.value(helper="test", status=503)
+                calls = metrics.upstream_request_duration.count(
+                    helper="test", outcome="200"
+                )
+                client.get_json({"Scheme_Code": FIRST_SCHEME_CODE}, name="test")
+        self.assertEqual(
+            metrics.upstream_attempts.value(helper="test", status=503), failed + 1
+        )
+        self.assertEqual(
+            metrics.upstream_request_duration.count(helper="test", outcome="200"),
+            calls + 1,
+        )
+
+    def test_family_fetch_does_not_log_errors_on_success(self):
+        with run_stub_upstream(schemes=5) as server:
+            with override_settings(RAPID_API_URL=server.url):
+                with self.assertNoLogs("api.utils", level="INFO"):
+                    self.assertTrue(get_fund_family_data("Axis Mutual Fund"))
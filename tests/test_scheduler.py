@@ -0,0 +1,195 @@
+import time
+from datetime import date, datetime, timedelta, timezone
+from zoneinfo import ZoneInfo
+from django.core.cache import cache
+from django.test import TestCase
+from api.caching import Lease
+from api.models import JobLease, MutualFund
+from api.nav_refresh import (
+    latest_nav_date,
+    next_publication,
+    refresh_navs,
+    stale_funds,
+)
+from api.scheduler import NavScheduler
+
+IST = ZoneInfo("Asia/Kolkata")
+# Friday 2026-10-16, after the 23:00 IST publication time
+FRIDAY_NIGHT = datetime(2026, 10, 16, 23, 30, tzinfo=IST)
+
+
+class PublicationTests(TestCase):
+
+    def test_latest_nav_date_follows_publication_time(self):
+        self.assertEqual(
+            latest_nav_date(datetime(2026, 10, 16, 12, 0, tzinfo=IST)),
+            date(2026, 10, 15),
+        )
+        self.assertEqual(latest_nav_date(FRIDAY_NIGHT), date(2026, 10, 16))
+
+    def test_weekends_keep_fridays_nav(self):
+        self.assertEqual(
+            latest_nav_date(datetime(2026, 10, 19, 1, 0, tzinfo=timezone.utc)),
+            date(2026, 10, 16),
+        )
+        self.assertEqual(
+            next_publication(FRIDAY_NIGHT), datetime(2026, 10, 19, 23, 0, tzinfo=IST)
+        )
+
+    def test_stale_funds(self):
+        MutualFund.objects.create(name="A", scheme_Code="1", nav=1)
+        MutualFund.objects.create(
+            name="B", scheme_Code="2", nav=1, nav_date=date(2026, 10, 15)
+        )
+        MutualFund.objects.create(
+            name="C", scheme_Code="3", nav=1, nav_date=date(2026, 10, 16)
+        )
+        codes = stale_funds(MutualFund.objects.all(), date(2026, 10, 16))
+        self.assertCountEqual(codes.values_list("scheme_Code", flat=True), ["1", "2"])
+
+
+class ChangeDetectionTests(TestCase):
+
+    def setUp(self):
+        MutualFund.objects.create(
+            name="A", scheme_Code="1", nav=10, nav_date=date(2026, 10, 15)
+        )
+
+    def test_unchanged_funds_are_not_written(self):
+        funds = list(MutualFund.objects.all())
+        with self.assertNumQueries(0):
+            stats = refresh_navs(
+                funds,
+                workers=1,
+                fetch=lambda code: {"Net_Asset_Value": "10.00", "Date": "15-Oct-2026"},
+            )
+        self.assertEqual((stats.updated, stats.unchanged), (0, 1))
+
+    def test_advanced_nav_date_is_written(self):
+        stats = refresh_navs(
+            MutualFund.objects.all(),
+            workers=1,
+            fetch=lambda code: {"Net_Asset_Value": 10, "Date": "16-Oct-2026"},
+        )
+        self.assertEqual(stats.updated, 1)
+        self.assertEqual(MutualFund.objects.get().nav_date, date(2026, 10, 16))
+
+    def test_malformed_nav_fails(self):
+        stats = refresh_navs(
+            MutualFund.objects.all(),
+            workers=1,
+            fetch=lambda code: {"Net_Asset_Value": "N.A."},
+        )
+        self.assertEqual(stats.failures, ["1"])
+
+
+class NavSchedulerTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        MutualFund.objects.create(
+            name="A", scheme_Code="1", nav=10, nav_date=date(2026, 10, 15)
+        )
+        MutualFund.objects.create(
+            name="B", scheme_Code="2", nav=20, nav_date=date(2026, 10, 16)
+        )
+        self.fetched = []
+        self.payload = {"Net_Asset_Value": 11, "Date": "16-Oct-2026"}
+
+    def refresh(self, funds, stop=None):
+        return refresh_navs(funds, workers=1, fetch=self.fetch, stop=stop)
+
+    def fetch(self, scheme_code):
+        self.fetched.append(scheme_code)
+        return self.payload
+
+    def scheduler(self, lease=None):
+        return NavScheduler(
+            self.refresh,
+            interval=60,
+            max_interval=3600,
+            lease=lease or Lease("test_nav_refresh", 600),
+            now=lambda: FRIDAY_NIGHT,
+        )
+
+    def test_refreshes_only_stale_funds(self):
+        scheduler = self.scheduler()
+        stats = scheduler.tick()
+        self.assertEqual(self.fetched, ["1"])
+        self.assertEqual(stats.updated, 1)
+        self.assertEqual(scheduler.delay, 60)
+
+        # Everything is current, sleep until the next publication
+        self.assertIsNone(scheduler.tick())
+        self.assertEqual(self.fetched, ["1"])
+        self.assertEqual(scheduler.delay, 3600)
+
+    def test_backs_off_while_upstream_has_not_published(self):
+        self.payload = {"Net_Asset_Value": 10, "Date": "15-Oct-2026"}
+        scheduler = self.scheduler()
+        scheduler.tick()
+        self.assertEqual(scheduler.delay, 120)
+        scheduler.tick()
+        self.assertEqual(scheduler.delay, 240)
+        self.assertEqual(MutualFund.objects.get(scheme_Code="1").nav_date.day, 15)
+
+    def test_stops_refreshing_once_the_lease_is_lost(self):
+        lease = Lease("test_nav_refresh", 0.03)
+        lease.renew = lambda: False
+        scheduler = self.scheduler(lease)
+        MutualFund.objects.create(
+            name="C", scheme_Code="3", nav=10, nav_date=date(2026, 10, 15)
+        )
+
+        def fetch(scheme_code):
+            # The keeper finds the lease lost while the first chunk is fetched
+            time.sleep(0.1)
+            return self.fetch(scheme_code)
+
+        scheduler.refresh = lambda funds, stop: refresh_navs(
+            funds, workers=1, chunk_size=1, fetch=fetch, stop=stop
+        )
+        stats = scheduler.tick()
+        self.assertTrue(stats.aborted)
+        self.assertEqual(self.fetched, ["1"])
+
+    def test_only_the_lease_holder_refreshes(self):
+        leader = self.scheduler(Lease("test_nav_refresh", 600))
+        follower = self.scheduler(Lease("test_nav_refresh", 600))
+        self.assertTrue(leader.lease.acquire())
+        self.assertIsNone(follower.tick())
+        self.assertEqual(self.fetched, [])
+
+        leader.run(max_ticks=1)
+        self.assertEqual(self.fetched, ["1"])
+        # The lease is given up on exit so the follower takes over at once
+        self.assertIsNone(leader.lease.holder())
+        self.assertTrue(follower.lease.acquire())
+
+
+class LeaseTests(TestCase):
+
+    def expire(self):
+        JobLease.objects.update(
+            expires_at=datetime.now(timezone.utc) - timedelta(seconds=1)
+        )
+
+    def test_renew_after_takeover_keeps_the_new_holder(self):
+        first, second = Lease("job", 600), Lease("job", 600)
+        self.assertTrue(first.acquire())
+        self.assertFalse(second.acquire())
+        self.assertTrue(first.renew())
+        self.assertFalse(second.renew())
+
+        self.expire()
+        self.assertIsNone(first.holder())
+        self.assertFalse(first.renew())
+        self.assertTrue(second.acquire())
+        self.assertFalse(first.renew())
+        self.assertEqual(first.holder(), second.owner)
+
+        # Releasing a lease taken over by another node leaves it alone
+        first.release()
+        self.assertEqual(second.holder(), second.owner)
+        second.release()
+        self.assertFalse(JobLease.objects.exists())
@@ -0,0 +1,133 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+from api.models import MutualFund
+from api.search import SearchIndex, search_funds, search_index
+
+ROWS = [
+    (1, "120465", "Axis Bluechip Fund - Direct Plan - Growth", "Axis Mutual Fund"),
+    (2, "120466", "Axis Bluechip Fund - Regular Plan - Growth", "Axis Mutual Fund"),
+    (3, "119551", "HDFC Top 100 Fund - Direct Plan - Growth", "HDFC Mutual Fund"),
+    (4, "125497", "SBI Small Cap Fund - Direct Plan - Growth", "SBI Mutual Fund"),
+    (5, "118989", "HDFC Mid-Cap Opportunities Fund - Growth", "HDFC Mutual Fund"),
+]
+
+
+def codes(rows):
+    return [row[1] for row in rows]
+
+
+class SearchIndexTests(SimpleTestCase):
+
+    def setUp(self):
+        self.index = SearchIndex()
+        self.index.build(ROWS)
+
+    def test_prefix_tokens(self):
+        self.assertEqual(codes(self.index.search("axis blue")), ["120465", "120466"])
+        self.assertEqual(codes(self.index.search("hd mid")), ["118989"])
+
+    def test_scheme_code_prefix(self):
+        self.assertEqual(codes(self.index.search("11955")), ["119551"])
+        self.assertEqual(codes(self.index.search("1204")), ["120465", "120466"])
+
+    def test_family_tokens(self):
+        self.assertEqual(codes(self.index.search("sbi mutual")), ["125497"])
+
+    def test_typos(self):
+        self.assertEqual(codes(self.index.search("bluchip")), ["120465", "120466"])
+        self.assertEqual(codes(self.index.search("opportunites")), ["118989"])
+        self.assertEqual(codes(self.index.search("smlal cap")), ["125497"])
+
+    def test_short_tokens_are_not_corrected(self):
+        self.assertEqual(self.index.search("sbx"), [])
+
+    def test_every_token_must_match(self):
+        self.assertEqual(self.index.search("axis small"), [])
+
+    def test_exact_matches_rank_first(self):
+        index = SearchIndex()
+        index.build(
+            [
+                (1, "1", "Growthmax Fund", ""),
+                (2, "2", "Long Named Growth Fund", ""),
+            ]
+        )
+        self.assertEqual(codes(index.search("growth")), ["2", "1"])
+        self.assertEqual(codes(index.search("grow")), ["1", "2"])
+
+    def test_limit(self):
+        self.assertEqual(len(self.index.search("fund", limit=2)), 2)
+        self.assertEqual(len(self.index.search("fund", limit=10)), 5)
+
+    def test_update_reindexes_changed_rows(self):
+        added = self.index.update(
+            [
+                ROWS[0],
+                (4, "125497", "SBI Smallcap Fund - Direct Plan - Growth", "SBI"),
+                (6, "130000", "Quant Flexi Cap Fund - Growth", "Quant Mutual Fund"),
+            ]
+        )
+        self.assertEqual(added, 2)
+        self.assertEqual(self.index.search("small cap"), [])
+        self.assertEqual(codes(self.index.search("smallcap")), ["125497"])
+        self.assertEqual(codes(self.index.search("quant flexi")), ["130000"])
+        self.assertEqual(self.index.stats()["stale_documents"], 1)
+
+
+@override_settings(SEARCH_INDEX_CHECK_INTERVAL=0)
+class SearchRefreshTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        search_index.clear()
+        self.fund = MutualFund.objects.create(
+            name="Axis Bluechip Fund", scheme_Code="120465", nav=10
+        )
+
+    def test_follows_catalogue_changes(self):
+        self.assertEqual(codes(search_funds("bluechip")), ["120465"])
+
+        MutualFund.objects.create(name="Axis Midcap Fund", scheme_Code="120505", nav=10)
+        self.assertEqual(codes(search_funds("axis")), ["120465", "120505"])
+
+        self.fund.name = "Axis Large Cap Fund"
+        self.fund.save()
+        self.assertEqual(search_funds("bluechip"), [])
+        self.assertEqual(codes(search_funds("large cap")), ["120465"])
+
+        self.fund.delete()
+        self.assertEqual(search_funds("large"), [])
+        self.assertEqual(search_index.stats()["funds"], 1)
+
+    def test_unchanged_catalogue_is_not_reread(self):
+        search_funds("axis")
+        with self.assertNumQueries(0):
+            search_funds("axis")
+
+    def test_view(self):
+        client = APIClient()
+        response = client.get(reverse("search_funds"), {"q": "axis"})
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+        user = get_user_model().objects.create_user(username="alice", password="x")
+        client.force_authenticate(user=user)
+        response = client.get(reverse("search_funds"), {"q": "axis blue"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            response.data,
+            [
+                {
+                    "Scheme_Code": 120465,
+                    "Scheme_Name": "Axis Bluechip Fund",
+                    "Mutual_Fund_Family": "",
+                }
+            ],
+        )
+        response = client.get(reverse("search_funds"))
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = client.get(reverse("search_funds"), {"q": "axis", "limit": "x"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
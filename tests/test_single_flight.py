@@ -0,0 +1,107 @@
+import asyncio
+import threading
+import time
+from django.core.cache import cache
+from django.test import TransactionTestCase, override_settings
+from api.caching import SingleFlight
+from api.catalogue import aresolve_fund, resolve_fund, scheme_lookups
+from api.models import MutualFund
+
+
+def details(scheme_code):
+    return {
+        "Scheme_Code": int(scheme_code),
+        "Scheme_Name": f"Fund {scheme_code}",
+        "Net_Asset_Value": 12.5,
+    }
+
+
+@override_settings(CACHE_LOCK_TIMEOUT=5)
+class SingleFlightTests(TransactionTestCase):
+
+    def setUp(self):
+        cache.clear()
+        scheme_lookups.reset_stats()
+        self.calls = []
+
+    def slow_fetch(self, scheme_code):
+        self.calls.append(scheme_code)
+        time.sleep(0.1)
+        return details(scheme_code) if scheme_code != "404" else None
+
+    def run_threads(self, count, target):
+        results = [None] * count
+        errors = []
+
+        def run(index):
+            try:
+                results[index] = target()
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=run, args=(i,)) for i in range(count)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+        return results
+
+    def test_concurrent_lookups_fetch_and_insert_once(self):
+        funds = self.run_threads(10, lambda: resolve_fund("999", self.slow_fetch))
+        self.assertEqual(self.calls, ["999"])
+        self.assertEqual(MutualFund.objects.filter(scheme_Code="999").count(), 1)
+        self.assertEqual({fund.pk for fund in funds}, {funds[0].pk})
+        self.assertEqual(scheme_lookups.stats()["calls"], 1)
+
+    def test_unknown_codes_are_negatively_cached(self):
+        self.assertIsNone(resolve_fund("404", self.slow_fetch))
+        self.assertIsNone(resolve_fund("404", self.slow_fetch))
+        self.assertEqual(self.calls, ["404"])
+
+    def test_waits_for_leader_in_another_process(self):
+        cache.set(scheme_lookups.lock_key("999"), "other-process", timeout=5)
+
+        def other_process_finishes():
+            time.sleep(0.2)
+            MutualFund.objects.create(name="Fund 999", scheme_Code="999", nav=12)
+            cache.delete(scheme_lookups.lock_key("999"))
+
+        threading.Thread(target=other_process_finishes).start()
+        fund = resolve_fund("999", self.slow_fetch)
+        self.assertEqual(fund.name, "Fund 999")
+        self.assertEqual(self.calls, [])
+        self.assertEqual(scheme_lookups.stats()["remote_waits"], 1)
+
+    def test_errors_are_shared(self):
+        flight = SingleFlight("test")
+
+        def fail():
+            time.sleep(0.1)
+            raise KeyError("Scheme_Name")
+
+        def call():
+            try:
+                flight.do("key", fail)
+            except KeyError:
+                return "failed"
+
+        self.assertEqual(self.run_threads(3, call), ["failed"] * 3)
+        self.assertEqual(flight.stats()["calls"], 1)
+
+    def test_async_lookups_fetch_once(self):
+        calls = []
+
+        async def fetch(scheme_code):
+            calls.append(scheme_code)
+            await asyncio.sleep(0.1)
+            return details(scheme_code)
+
+        async def main():
+            return await asyncio.gather(
+                *(aresolve_fund("999", fetch) for _ in range(10))
+            )
+
+        funds = asyncio.run(main())
+        self.assertEqual(calls, ["999"])
+        self.assertEqual(len({fund.pk for fund in funds}), 1)
@@ -0,0 +1,188 @@
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from django.contrib.auth import get_user_model
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+from api.catalogue import ingest_schemes
+from api.ledger import record_buy, record_buys, record_sell
+from api.models import MutualFund, PortfolioSnapshot, UserFunds
+from api.nav_refresh import refresh_navs
+from api.snapshots import holding_totals, propagate_nav_changes
+
+
+class SnapshotTests(TestCase):
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(username="a", password="x")
+        self.fund_a = MutualFund.objects.create(name="A", scheme_Code="100", nav=10)
+        self.fund_b = MutualFund.objects.create(name="B", scheme_Code="200", nav=20)
+
+    def snapshot(self, user=None, on=None):
+        return PortfolioSnapshot.objects.get(
+            user=user or self.user, date=on or timezone.localdate()
+        )
+
+    def assertMatchesHoldings(self, user=None):
+        user = user or self.user
+        totals = holding_totals([user.pk])[user.pk]
+        snapshot = self.snapshot(user)
+        self.assertEqual(snapshot.invested, totals["invested"])
+        self.assertEqual(snapshot.current_value, totals["current_value"])
+
+    def test_buys_and_sells_update_todays_row(self):
+        record_buy(self.user, self.fund_a, 10, nav=Decimal("8.00"))
+        record_buys(self.user, [(self.fund_a, 2), (self.fund_b, 5)])
+        snapshot = self.snapshot()
+        self.assertEqual(snapshot.invested, Decimal("200.00"))
+        self.assertEqual(snapshot.current_value, Decimal("220.00"))
+        self.assertEqual(snapshot.day_change, 0)
+
+        record_sell(self.user, self.fund_a, 6)
+        self.assertMatchesHoldings()
+        self.assertEqual(PortfolioSnapshot.objects.count(), 1)
+
+    def test_first_snapshot_includes_existing_holdings(self):
+        UserFunds.objects.create(
+            user=self.user, mutual_fund=self.fund_b, quantity=3, invested=45
+        )
+        record_buy(self.user, self.fund_a, 1)
+        snapshot = self.snapshot()
+        self.assertEqual(snapshot.invested, Decimal("55.00"))
+        self.assertEqual(snapshot.current_value, Decimal("70.00"))
+
+    def test_nav_change_reaches_every_holder(self):
+        other = get_user_model().objects.create_user(username="b", password="x")
+        record_buy(self.user, self.fund_a, 10)
+        record_buy(other, self.fund_a, 1)
+        record_buy(other, self.fund_b, 2)
+        refresh_navs(
+            MutualFund.objects.all(),
+            workers=1,
+            fetch=lambda code: {"Net_Asset_Value": 12 if code == "100" else 19.5},
+        )
+        self.assertEqual(self.snapshot().day_change, Decimal("20.00"))
+        self.assertEqual(self.snapshot(other).day_change, Decimal("1.00"))
+        self.assertMatchesHoldings()
+        self.assertMatchesHoldings(other)
+
+    def test_overlapping_refresh_adds_a_nav_change_once(self):
+        record_buy(self.user, self.fund_a, 10)
+        funds = list(MutualFund.objects.filter(pk=self.fund_a.pk))
+        # Another writer applies the same NAV after these funds were read
+        for writer in (MutualFund.objects.filter(pk=self.fund_a.pk), funds):
+            refresh_navs(writer, workers=1, fetch=lambda code: {"Net_Asset_Value": 12})
+        self.assertEqual(self.snapshot().day_change, Decimal("20.00"))
+        self.assertMatchesHoldings()
+
+    def test_nav_propagation_queries_do_not_grow_with_holders(self):
+        def queries(holders):
+            for i in range(holders):
+                user = get_user_model().objects.create_user(username=f"h{holders}{i}")
+                record_buy(user, self.fund_a, 1)
+            self.fund_a.refresh_from_db()
+            with CaptureQueriesContext(connection) as context:
+                propagate_nav_changes({self.fund_a.pk: Decimal("1.00")})
+            return len(context)
+
+        self.assertEqual(queries(2), queries(20))
+        self.assertEqual(
+            PortfolioSnapshot.objects.filter(day_change=Decimal("2.00")).count(), 2
+        )
+
+    def test_day_without_changes_carries_previous_row_forward(self):
+        yesterday = timezone.localdate() - timedelta(days=1)
+        UserFunds.objects.create(
+            user=self.user, mutual_fund=self.fund_a, quantity=4, invested=30
+        )
+        PortfolioSnapshot.objects.create(
+            user=self.user,
+            date=yesterday,
+            invested=30,
+            current_value=40,
+            day_change=5,
+        )
+        propagate_nav_changes({self.fund_a.pk: Decimal("0.50")})
+        snapshot = self.snapshot()
+        self.assertEqual(snapshot.invested, 30)
+        self.assertEqual(snapshot.current_value, Decimal("42.00"))
+        self.assertEqual(snapshot.day_change, Decimal("2.00"))
+        self.assertEqual(self.snapshot(on=yesterday).current_value, 40)
+
+    def test_catalogue_ingest_propagates_nav(self):
+        record_buy(self.user, self.fund_b, 3)
+        ingest_schemes(
+            [
+                {
+                    "Scheme_Code": 200,
+                    "Scheme_Name": "B",
+                    "Net_Asset_Value": "21.004",
+                }
+            ]
+        )
+        self.assertEqual(self.snapshot().day_change, Decimal("3.012"))
+        self.assertMatchesHoldings()
+
+    def test_rebuild_command_keeps_day_change(self):
+        record_buy(self.user, self.fund_a, 2)
+        PortfolioSnapshot.objects.update(invested=0, current_value=0, day_change=7)
+        out = StringIO()
+        call_command("rebuild_snapshots", stdout=out)
+        self.assertIn("Rebuilt 1 snapshots", out.getvalue())
+        self.assertMatchesHoldings()
+        self.assertEqual(self.snapshot().day_change, 7)
+
+    def test_rebuild_command_rejects_unknown_users(self):
+        with self.assertRaises(CommandError):
+            call_command("rebuild_snapshots", "nobody", stdout=StringIO())
+
+
+class PortfolioSnapshotViewTests(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(username="a", password="x")
+        self.client.force_authenticate(user=self.user)
+        self.fund = MutualFund.objects.create(name="A", scheme_Code="100", nav=10)
+
+    def test_summary_reads_latest_snapshot(self):
+        record_buy(self.user, self.fund, 3, nav=Decimal("9.00"))
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse("portfolio_summary"))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["invested"], Decimal("27.00"))
+        self.assertEqual(response.data["current_value"], Decimal("30.00"))
+        self.assertEqual(response.data["gain"], Decimal("3.00"))
+
+    def test_summary_without_snapshot_computes_one(self):
+        UserFunds.objects.create(
+            user=self.user, mutual_fund=self.fund, quantity=2, invested=15
+        )
+        response = self.client.get(reverse("portfolio_summary"))
+        self.assertEqual(response.data["current_value"], Decimal("20.00"))
+        self.assertEqual(PortfolioSnapshot.objects.count(), 1)
+
+    def test_history_returns_daily_rows(self):
+        today = timezone.localdate()
+        for days_ago in (40, 5, 1):
+            PortfolioSnapshot.objects.create(
+                user=self.user,
+                date=today - timedelta(days=days_ago),
+                current_value=days_ago,
+            )
+        response = self.client.get(reverse("portfolio_history"), {"days": 30})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [row["date"] for row in response.data],
+            [today - timedelta(days=5), today - timedelta(days=1)],
+        )
+
+    def test_history_rejects_invalid_days(self):
+        response = self.client.get(reverse("portfolio_history"), {"days": "week"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
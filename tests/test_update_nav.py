@@ -0,0 +1,154 @@
+from io import StringIO
+from unittest.mock import patch
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from api.models import MutualFund
+from api.nav_refresh import RateLimiter, iter_funds, refresh_navs, sync_by_family
+from api.stub_upstream import run_stub_upstream
+from api.utils import get_single_fund_details
+
+
+class RefreshNavsTests(TestCase):
+
+    def setUp(self):
+        MutualFund.objects.create(name="Fund A", scheme_Code="100", nav=10)
+        MutualFund.objects.create(name="Fund B", scheme_Code="200", nav=20)
+        MutualFund.objects.create(name="Fund C", scheme_Code="300", nav=30)
+
+    def fake_fetch(self, scheme_code):
+        if scheme_code == "300":
+            return None
+        return {"Net_Asset_Value": int(scheme_code) / 2}
+
+    def test_updates_navs_and_counts_failures(self):
+        stats = refresh_navs(
+            MutualFund.objects.all(), workers=4, chunk_size=2, fetch=self.fake_fetch
+        )
+        self.assertEqual(stats.total, 3)
+        self.assertEqual(stats.updated, 2)
+        self.assertEqual(stats.failed, 1)
+        self.assertEqual(stats.failures, ["300"])
+        self.assertEqual(MutualFund.objects.get(scheme_Code="100").nav, 50)
+        self.assertEqual(MutualFund.objects.get(scheme_Code="200").nav, 100)
+        self.assertEqual(MutualFund.objects.get(scheme_Code="300").nav, 30)
+
+    def test_writes_one_bulk_update_per_chunk(self):
+        funds = list(MutualFund.objects.all())
+        # Per chunk: the locked read of the stored NAVs, the snapshot holder
+        # lookup and the bulk update inside a savepoint, and the check for
+        # stored fund statistics
+        with self.assertNumQueries(12):
+            refresh_navs(
+                funds,
+                workers=2,
+                chunk_size=2,
+                fetch=lambda code: {"Net_Asset_Value": 1},
+            )
+
+    def test_reads_each_chunk_before_it_is_written(self):
+        funds = iter_funds(MutualFund.objects.all(), 2)
+        with self.assertNumQueries(1):
+            chunk = [next(funds), next(funds)]
+        MutualFund.objects.filter(pk=chunk[0].pk).update(nav=1)
+        with self.assertNumQueries(1):
+            rest = list(funds)
+        self.assertEqual(
+            [fund.scheme_Code for fund in chunk + rest], ["100", "200", "300"]
+        )
+
+    def test_command_reports_summary(self):
+        out = StringIO()
+        with patch("api.nav_refresh.get_single_fund_details", self.fake_fetch):
+            call_command("update_nav", "--workers", "2", stdout=out)
+        self.assertIn("Failed to fetch fund details for 300", out.getvalue())
+        self.assertIn("2 updated, 1 failed", out.getvalue())
+
+    def test_rate_limiter_disabled_does_not_block(self):
+        limiter = RateLimiter(0)
+        for _ in range(1000):
+            limiter.acquire()
+
+    def test_against_stub_upstream(self):
+        with run_stub_upstream(schemes=5) as server:
+            with override_settings(RAPID_API_URL=server.url):
+                details = get_single_fund_details("100003")
+                missing = get_single_fund_details("999999")
+        self.assertEqual(details["Scheme_Code"], 100003)
+        self.assertIsNone(missing)
+
+
+class SyncByFamilyTests(TestCase):
+
+    def setUp(self):
+        MutualFund.objects.create(
+            name="Old A", scheme_Code="100", nav=10, family="Axis Mutual Fund"
+        )
+        MutualFund.objects.create(
+            name="Old B", scheme_Code="101", nav=10, family="Axis Mutual Fund"
+        )
+        MutualFund.objects.create(
+            name="Old C", scheme_Code="102", nav=10, family="Axis Mutual Fund"
+        )
+        MutualFund.objects.create(name="Unknown family", scheme_Code="200", nav=10)
+        self.family_calls = []
+        self.single_calls = []
+
+    def fake_fetch_family(self, family, scheme_type):
+        self.family_calls.append((family, scheme_type))
+        if scheme_type != "Open":
+            return [{"Scheme_Code": 103, "Scheme_Name": "New D", "Net_Asset_Value": 9}]
+        return [
+            {"Scheme_Code": 100, "Scheme_Name": "New A", "Net_Asset_Value": 11},
+            {"Scheme_Code": 101, "Scheme_Name": "New B", "Net_Asset_Value": 12},
+        ]
+
+    def fake_fetch(self, scheme_code):
+        self.single_calls.append(scheme_code)
+        return {"Net_Asset_Value": 13, "Mutual_Fund_Family": "HDFC Mutual Fund"}
+
+    def test_fetches_each_family_once_and_falls_back(self):
+        stats = sync_by_family(
+            MutualFund.objects.all(),
+            workers=2,
+            fetch_family=self.fake_fetch_family,
+            fetch=self.fake_fetch,
+        )
+        self.assertEqual(self.family_calls, [("Axis Mutual Fund", "Open")])
+        self.assertCountEqual(self.single_calls, ["102", "200"])
+        self.assertEqual(stats.updated, 4)
+        self.assertEqual(stats.upstream_calls, 3)
+        self.assertEqual(stats.calls_saved, 1)
+        fund = MutualFund.objects.get(scheme_Code="101")
+        self.assertEqual((fund.name, fund.nav), ("New B", 12))
+        self.assertEqual(
+            MutualFund.objects.get(scheme_Code="200").family, "HDFC Mutual Fund"
+        )
+
+    def test_fetches_each_scheme_type_of_a_family(self):
+        MutualFund.objects.create(
+            name="Old D",
+            scheme_Code="103",
+            nav=10,
+            family="Axis Mutual Fund",
+            scheme_type="Close Ended Schemes",
+        )
+        sync_by_family(
+            MutualFund.objects.filter(family="Axis Mutual Fund"),
+            workers=1,
+            fetch_family=self.fake_fetch_family,
+            fetch=self.fake_fetch,
+        )
+        self.assertEqual(
+            self.family_calls,
+            [("Axis Mutual Fund", "Close"), ("Axis Mutual Fund", "Open")],
+        )
+        self.assertEqual(self.single_calls, ["102"])
+        self.assertEqual(MutualFund.objects.get(scheme_Code="103").nav, 9)
+
+    def test_command_by_family(self):
+        out = StringIO()
+        with patch(
+            "api.nav_refresh.get_fund_family_data", self.fake_fetch_family
+        ), patch("api.nav_refresh.get_single_fund_details", self.fake_fetch):
+            call_command("update_nav", "--by-family", stdout=out)
+        self.assertIn("4 updated, 0 failed, 3 upstream calls (1 saved)", out.getvalue())
@@ -0,0 +1,274 @@
+import asyncio
+import threading
+from io import StringIO
+from unittest.mock import patch
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase, override_settings
+from api.models import MutualFund
+from api.stub_upstream import FAMILIES, FIRST_SCHEME_CODE, run_stub_upstream
+from api.upstream import (
+    AsyncUpstreamClient,
+    CircuitBreaker,
+    CircuitOpenError,
+    UpstreamClient,
+    UpstreamError,
+    reset_client,
+)
+from api.utils import (
+    aget_single_fund_details,
+    get_single_fund_details,
+    iter_catalogue,
+    iter_fund_family_data,
+)
+
+
+class CircuitBreakerTests(SimpleTestCase):
+
+    def setUp(self):
+        self.now = 0.0
+        self.breaker = CircuitBreaker(2, 10, clock=lambda: self.now)
+
+    def test_opens_after_threshold(self):
+        self.breaker.record_failure()
+        self.assertTrue(self.breaker.allow())
+        self.breaker.record_failure()
+        self.assertEqual(self.breaker.state, "open")
+        self.assertFalse(self.breaker.allow())
+
+    def test_single_trial_after_reset_timeout(self):
+        self.breaker.record_failure()
+        self.breaker.record_failure()
+        self.now = 10
+        self.assertTrue(self.breaker.allow())
+        self.assertFalse(self.breaker.allow())
+        self.breaker.record_failure()
+        self.assertEqual(self.breaker.state, "open")
+        self.now = 20
+        self.assertTrue(self.breaker.allow())
+        self.breaker.record_success()
+        self.assertEqual(self.breaker.state, "closed")
+
+    def test_release_frees_only_own_trial(self):
+        self.breaker.record_failure()
+        self.breaker.record_failure()
+        self.now = 10
+        self.assertTrue(self.breaker.allow())
+        other = threading.Thread(target=self.breaker.release)
+        other.start()
+        other.join()
+        self.assertFalse(self.breaker.allow())
+        self.breaker.release()
+        self.assertTrue(self.breaker.allow())
+
+
+class UpstreamClientTests(SimpleTestCase):
+
+    def setUp(self):
+        self.stub = run_stub_upstream(schemes=20)
+        self.server = self.stub.__enter__()
+        self.settings = override_settings(RAPID_API_URL=self.server.url)
+        self.settings.enable()
+        self.threads = self.client_threads()
+        self.delays = []
+        self.client = UpstreamClient(
+            retries=2, breaker_threshold=2, breaker_reset=60, sleep=self.delays.append
+        )
+
+    def tearDown(self):
+        self.settings.disable()
+        self.stub.__exit__(None, None, None)
+        cache.clear()
+        reset_client()
+
+    def client_threads(self):
+        # Handler threads of the stub may still be closing connections
+        return [
+            thread
+            for thread in threading.enumerate()
+            if "process_request_thread" not in thread.name
+        ]
+
+    def scheme(self, index=0):
+        return {"Scheme_Type": "Open", "Scheme_Code": FIRST_SCHEME_CODE + index}
+
+    def test_retries_with_backoff(self):
+        self.server.failures = 2
+        data = self.client.get_json(self.scheme())
+        self.assertEqual(data[0]["Scheme_Code"], FIRST_SCHEME_CODE)
+        self.assertEqual(self.server.request_count, 3)
+        self.assertEqual(len(self.delays), 2)
+        self.assertTrue(
+            all(0 <= delay <= self.client.backoff_max for delay in self.delays)
+        )
+
+    def test_breaker_fails_fast_once_open(self):
+        self.server.failures = 100
+        for _ in range(2):
+            with self.assertRaises(UpstreamError):
+                self.client.get_json(self.scheme())
+        requests_made = self.server.request_count
+        with self.assertRaises(CircuitOpenError):
+            self.client.get_json(self.scheme())
+        self.assertEqual(self.server.request_count, requests_made)
+
+    def test_limits_concurrency_per_host(self):
+        self.server.latency = 0.05
+        client = UpstreamClient(max_concurrency=2)
+        threads = [
+            threading.Thread(target=client.get_json, args=(self.scheme(i),))
+            for i in range(6)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(self.server.request_count, 6)
+        self.assertLessEqual(self.server.max_in_flight, 2)
+
+    def test_async_gather(self):
+        client = AsyncUpstreamClient(self.client, concurrency=4)
+        self.server.failures = 0
+        results = asyncio.run(
+            client.gather_json(
+                [self.scheme(i) for i in range(10)] + [{"Scheme_Code": 1}]
+            )
+        )
+        self.assertEqual(len(results), 11)
+        self.assertEqual(results[9][0]["Scheme_Code"], FIRST_SCHEME_CODE + 9)
+        self.assertEqual(results[10], [])
+
+    def test_async_concurrency_is_independent_of_sync_cap(self):
+        self.server.latency = 0.1
+
+        async def gather(concurrency):
+            client = AsyncUpstreamClient(
+                UpstreamClient(max_concurrency=2), concurrency=concurrency
+            )
+            try:
+                return await client.gather_json([self.scheme(i) for i in range(8)])
+            finally:
+                await client.aclose()
+
+        results = asyncio.run(gather(8))
+        self.assertTrue(all(results))
+        self.assertEqual(self.server.max_in_flight, 8)
+        self.server.max_in_flight = 0
+        asyncio.run(gather(3))
+        self.assertEqual(self.server.max_in_flight, 3)
+
+    def test_async_retries_with_backoff(self):
+        self.server.failures = 2
+
+        async def fetch():
+            delays = []
+
+            async def sleep(delay):
+                delays.append(delay)
+
+            client = AsyncUpstreamClient(self.client, sleep=sleep)
+            try:
+                return await client.get_json(self.scheme()), delays
+            finally:
+                await client.aclose()
+
+        data, delays = asyncio.run(fetch())
+        self.assertEqual(data[0]["Scheme_Code"], FIRST_SCHEME_CODE)
+        self.assertEqual(len(delays), 2)
+
+    def test_trial_call_raising_unexpected_error_is_released(self):
+        client = UpstreamClient(retries=0, breaker_threshold=1, breaker_reset=0)
+        self.server.failures = 1
+        with self.assertRaises(UpstreamError):
+            client.get_json(self.scheme())
+        self.assertEqual(client.breaker().state, "half-open")
+        with patch.object(client.session, "get", side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                client.get_json(self.scheme())
+        data = client.get_json(self.scheme())
+        self.assertEqual(data[0]["Scheme_Code"], FIRST_SCHEME_CODE)
+
+    def test_cancelled_async_trial_call_is_released(self):
+        breaker = self.client.breaker()
+        breaker.opened_at = breaker.clock() - self.client.breaker_reset
+        self.server.latency = 1
+
+        async def probe():
+            client = AsyncUpstreamClient(self.client)
+            try:
+                task = asyncio.ensure_future(client.get_json(self.scheme()))
+                await asyncio.sleep(0.1)
+                task.cancel()
+                with self.assertRaises(asyncio.CancelledError):
+                    await task
+            finally:
+                await client.aclose()
+
+        asyncio.run(probe())
+        self.assertTrue(breaker.allow())
+
+    @override_settings(UPSTREAM_RETRIES=0, UPSTREAM_BREAKER_THRESHOLD=1)
+    def test_serves_cached_scheme_while_upstream_fails(self):
+        code = str(FIRST_SCHEME_CODE)
+        self.assertEqual(get_single_fund_details(code)["Scheme_Code"], int(code))
+        self.server.failures = 100
+        self.assertEqual(get_single_fund_details(code)["Scheme_Code"], int(code))
+        requests_made = self.server.request_count
+        self.assertEqual(get_single_fund_details(code)["Scheme_Code"], int(code))
+        self.assertEqual(self.server.request_count, requests_made)
+        self.assertIsNone(get_single_fund_details(str(FIRST_SCHEME_CODE + 1)))
+
+    def test_async_scheme_lookup(self):
+        details = asyncio.run(aget_single_fund_details(str(FIRST_SCHEME_CODE + 3)))
+        self.assertEqual(details["Scheme_Code"], FIRST_SCHEME_CODE + 3)
+        self.assertIsNone(asyncio.run(aget_single_fund_details("1")))
+
+    def test_scheme_lookup_is_not_limited_to_open_schemes(self):
+        code = FIRST_SCHEME_CODE + 4
+        self.server.by_code[str(code)]["Scheme_Type"] = "Close Ended Schemes"
+        details = get_single_fund_details(str(code))
+        self.assertEqual(details["Scheme_Type"], "Close Ended Schemes")
+        details = asyncio.run(aget_single_fund_details(str(code)))
+        self.assertEqual(details["Scheme_Type"], "Close Ended Schemes")
+
+    def test_streams_family(self):
+        schemes = list(iter_fund_family_data("Axis Mutual Fund"))
+        self.assertEqual(len(schemes), 7)
+
+    def test_streams_several_families_concurrently(self):
+        sources = [(family, "Open") for family in FAMILIES]
+        schemes = list(iter_catalogue(sources, workers=2, buffer_size=2))
+        self.assertEqual(len(schemes), 20)
+        self.assertEqual({source for source, _ in schemes}, set(sources))
+
+    def test_stops_streaming_when_consumer_stops(self):
+        sources = [(family, "Open") for family in FAMILIES]
+        stream = iter_catalogue(sources, workers=3, buffer_size=1)
+        next(stream)
+        stream.close()
+        self.assertEqual(self.client_threads(), self.threads)
+
+
+class IngestCatalogueTests(TestCase):
+
+    def setUp(self):
+        self.stub = run_stub_upstream(schemes=20)
+        server = self.stub.__enter__()
+        self.settings = override_settings(
+            RAPID_API_URL=server.url,
+            MF_CATALOGUE_FAMILIES=FAMILIES + ["Unknown Mutual Fund"],
+        )
+        self.settings.enable()
+
+    def tearDown(self):
+        self.settings.disable()
+        self.stub.__exit__(None, None, None)
+
+    def test_ingests_every_family(self):
+        out = StringIO()
+        call_command("ingest_catalogue", "--workers", "2", stdout=out)
+        self.assertEqual(MutualFund.objects.count(), 20)
+        self.assertIn("Ingested 20 schemes from 3 sources", out.getvalue())
+        self.assertIn(
+            "No schemes received for Unknown Mutual Fund (Open)", out.getvalue()
+        )
@@ -1,11 +1,24 @@
+from decimal import Decimal
 from unittest.mock import patch
-from django.test import TestCase
+from django.db import connection
+from django.test import TestCase, override_settings
 from django.urls import reverse
 from rest_framework.test import APIClient
 from rest_framework import status
 from django.contrib.auth import get_user_model
 from rest_framework.authtoken.models import Token
+from api.catalogue import catalogue_queryset, ingest_schemes
+from api.ledger import record_buy
 from api.models import MutualFund, UserFunds
+from api.nav_refresh import refresh_navs
+
+# A separate cache, as seen by update_nav or a worker in another process
+OTHER_PROCESS_CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "other-process",
+    }
+}
 
 
 class SignupViewTests(TestCase):
@@ -157,21 +170,255 @@ class ListMutualFundsViewTests(TestCase):
         self.assertEqual(response.status_code, status.HTTP_405_METHOD_NOT_ALLOWED)
 
     def test_successful_mutual_funds_fetch(self):
-        with patch("api.views.get_mutual_funds_data") as mock_get_data:
-            mock_get_data.return_value = self.test_data
-            response = self.client.get(self.list_funds_url, headers=self.headers)
-            self.assertEqual(response.status_code, status.HTTP_200_OK)
-            self.assertEqual(len(response.data), 2)
-            self.assertEqual(response.data[0]["Scheme_Code"], 120437)
-
-    def test_failed_mutual_funds_fetch(self):
-        with patch("api.views.get_mutual_funds_data") as mock_get_data:
-            mock_get_data.return_value = None
-            response = self.client.get(self.list_funds_url, headers=self.headers)
-            self.assertEqual(
-                response.status_code, status.HTTP_500_INTERNAL_SERVER_ERROR
+        ingest_schemes(self.test_data)
+        response = self.client.get(self.list_funds_url, headers=self.headers)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["count"], 2)
+        schemes = response.data["results"]
+        self.assertEqual(len(schemes), 2)
+        self.assertEqual(schemes[0]["Scheme_Code"], 120437)
+        self.assertEqual(schemes[0]["Date"], "28-Feb-2025")
+        self.assertEqual(schemes[0]["ISIN_Div_Payout_ISIN_Growth"], "-")
+
+    @override_settings(CATALOGUE_PAGE_SIZE=1, CATALOGUE_MAX_PAGE_SIZE=1)
+    def test_pages_by_default_and_caps_limit(self):
+        ingest_schemes(self.test_data)
+        for params in ({}, {"limit": 50}):
+            response = self.client.get(
+                self.list_funds_url, params, headers=self.headers
             )
-            self.assertEqual(response.data["error"], "Failed to fetch mutual fund data")
+            self.assertEqual(response.data["count"], 2)
+            self.assertEqual(len(response.data["results"]), 1)
+            self.assertIn("offset=1", response.data["next"])
+
+    def test_filter_paginate_and_project(self):
+        ingest_schemes(self.test_data)
+        with self.assertNumQueries(3):
+            response = self.client.get(
+                self.list_funds_url,
+                {
+                    "category": "Debt Scheme - Banking and PSU Fund",
+                    "name": "axis banking & psu debt fund - direct plan - g",
+                    "fields": "Scheme_Code,Net_Asset_Value",
+                    "limit": 1,
+                },
+                headers=self.headers,
+            )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["count"], 1)
+        self.assertEqual(
+            response.data["results"],
+            [{"Scheme_Code": 120438, "Net_Asset_Value": Decimal("2624.3258")}],
+        )
+
+    def test_name_prefix_ignores_case_and_uses_the_index(self):
+        for name in ["Axis Bank", "AXZ Fund", "axz-fund", "Ax", "Bx"]:
+            MutualFund.objects.create(name=name, scheme_Code=name, nav=1)
+        for prefix, names in [
+            ("ax", ["Axis Bank", "AXZ Fund", "axz-fund", "Ax"]),
+            ("AXIS B", ["Axis Bank"]),
+            ("axz", ["AXZ Fund", "axz-fund"]),
+            ("axz-", ["axz-fund"]),
+            ("-", []),
+        ]:
+            rows = catalogue_queryset(["Scheme_Name"], name_prefix=prefix)
+            self.assertCountEqual([row["name"] for row in rows], names, prefix)
+        plan = catalogue_queryset(name_prefix="axis").explain()
+        if connection.vendor == "sqlite":
+            self.assertIn("mutualfund_upper_name_idx", plan)
+
+    def test_pagination_links(self):
+        ingest_schemes(self.test_data)
+        response = self.client.get(
+            self.list_funds_url, {"limit": 1}, headers=self.headers
+        )
+        self.assertEqual(response.data["count"], 2)
+        self.assertIn("offset=1", response.data["next"])
+        self.assertEqual(response.data["results"][0]["Scheme_Code"], 120437)
+
+    def test_empty_local_catalogue(self):
+        response = self.client.get(self.list_funds_url, headers=self.headers)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["count"], 0)
+        self.assertEqual(response.data["results"], [])
+
+    def test_ingest_is_an_upsert(self):
+        ingest_schemes(self.test_data, chunk_size=1)
+        updated = dict(self.test_data[0], Net_Asset_Value=1040)
+        stats = ingest_schemes([updated, {"Scheme_Code": 1}])
+        self.assertEqual((stats.upserted, stats.skipped), (1, 1))
+        self.assertEqual(MutualFund.objects.count(), 2)
+        fund = MutualFund.objects.get(scheme_Code="120437")
+        self.assertEqual(fund.nav, 1040)
+        self.assertEqual(fund.isin_reinvestment, "INF846K01CU0")
+        self.assertEqual(fund.nav_date.isoformat(), "2025-02-28")
+
+    def test_ingest_skips_non_numeric_nav(self):
+        ingest_schemes(self.test_data)
+        unquoted = dict(self.test_data[0], Net_Asset_Value="N.A.")
+        added = dict(self.test_data[1], Scheme_Code=999, Net_Asset_Value="NaN")
+        updated = dict(self.test_data[1], Net_Asset_Value="12.34567")
+        stats = ingest_schemes([unquoted, added, updated])
+        self.assertEqual((stats.upserted, stats.skipped), (1, 2))
+        self.assertEqual(MutualFund.objects.count(), 2)
+        fund = MutualFund.objects.get(scheme_Code=str(self.test_data[1]["Scheme_Code"]))
+        self.assertEqual(fund.nav, Decimal("12.3457"))
+
+
+class AddFundsViewTests(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+        self.add_fund_url = reverse("add_mf")
+        self.user = get_user_model().objects.create_user(
+            username="test@example.com",
+            email="test@example.com",
+            password="testpass123",
+        )
+        Token.objects.create(user=self.user)
+        self.headers = {"Authorization": f"Token {self.user.auth_token}"}
+        self.fund = MutualFund.objects.create(
+            name="Test Fund 1", scheme_Code="123456", nav=10
+        )
+
+    def test_add_known_fund(self):
+        for _ in range(2):
+            response = self.client.post(
+                self.add_fund_url,
+                {"scheme_Code": "123456", "quantity": 5},
+                headers=self.headers,
+                format="json",
+            )
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(UserFunds.objects.get(user=self.user).quantity, 10)
+
+    def test_unknown_fund_is_not_fetched_by_default(self):
+        with patch("api.views.get_single_fund_details") as mock_lookup:
+            response = self.client.post(
+                self.add_fund_url,
+                {"scheme_Code": "999", "quantity": 5},
+                headers=self.headers,
+                format="json",
+            )
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        mock_lookup.assert_not_called()
+
+    @override_settings(MF_CATALOGUE_UPSTREAM_FALLBACK=True)
+    def test_unknown_fund_fetched_with_fallback(self):
+        with patch("api.views.get_single_fund_details") as mock_lookup:
+            mock_lookup.return_value = {
+                "Scheme_Code": 999,
+                "Scheme_Name": "New Fund",
+                "Net_Asset_Value": 12.5,
+                "Mutual_Fund_Family": "Axis Mutual Fund",
+            }
+            response = self.client.post(
+                self.add_fund_url,
+                {"scheme_Code": "999", "quantity": 5},
+                headers=self.headers,
+                format="json",
+            )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(MutualFund.objects.get(scheme_Code="999").name, "New Fund")
+
+    @override_settings(MF_CATALOGUE_UPSTREAM_FALLBACK=True)
+    def test_fetched_fund_with_non_numeric_nav_is_rejected(self):
+        with patch("api.views.get_single_fund_details") as mock_lookup:
+            mock_lookup.return_value = {
+                "Scheme_Code": 999,
+                "Scheme_Name": "New Fund",
+                "Net_Asset_Value": "N.A.",
+            }
+            response = self.client.post(
+                self.add_fund_url,
+                {"scheme_Code": "999", "quantity": 5},
+                headers=self.headers,
+                format="json",
+            )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(MutualFund.objects.filter(scheme_Code="999").exists())
+
+
+class BulkAddFundsViewTests(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+        self.url = reverse("add_mfs")
+        self.user = get_user_model().objects.create_user(
+            username="test@example.com", password="testpass123"
+        )
+        self.client.force_authenticate(user=self.user)
+        MutualFund.objects.bulk_create(
+            [
+                MutualFund(name=f"Fund {i}", scheme_Code=str(i), nav=10)
+                for i in range(50)
+            ]
+        )
+
+    def post(self, holdings):
+        return self.client.post(self.url, {"holdings": holdings}, format="json")
+
+    def test_bulk_add_writes_in_constant_queries(self):
+        UserFunds.objects.create(
+            user=self.user, mutual_fund=MutualFund.objects.get(scheme_Code="0")
+        )
+        holdings = [{"scheme_Code": str(i), "quantity": 2} for i in range(50)]
+        # Four of them create and update the user's first portfolio snapshot
+        with self.assertNumQueries(11):
+            response = self.post(holdings + [{"scheme_Code": "0", "quantity": 3}])
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data["added"], 51)
+        self.assertEqual(UserFunds.objects.filter(user=self.user).count(), 50)
+        holding = UserFunds.objects.get(user=self.user, mutual_fund__scheme_Code="0")
+        self.assertEqual(holding.quantity, 5)
+        self.assertEqual(holding.invested, 50)
+
+    def test_per_item_results(self):
+        response = self.post(
+            [
+                {"scheme_Code": "1", "quantity": 5},
+                {"scheme_Code": "999", "quantity": 5},
+                {"scheme_Code": "2", "quantity": 0},
+            ]
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data["added"], 1)
+        results = response.data["results"]
+        self.assertEqual(results[0]["status"], "added")
+        self.assertIn("scheme_Code", results[1]["errors"])
+        self.assertIn("quantity", results[2]["errors"])
+
+    def test_nothing_added(self):
+        response = self.post([{"scheme_Code": "999", "quantity": 5}])
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data["failed"], 1)
+        self.assertEqual(self.post([]).status_code, status.HTTP_400_BAD_REQUEST)
+
+    @override_settings(MF_CATALOGUE_UPSTREAM_FALLBACK=True)
+    def test_unknown_funds_fetched_with_fallback(self):
+        def lookup(scheme_code):
+            if scheme_code == "404":
+                return None
+            return {
+                "Scheme_Code": int(scheme_code),
+                "Scheme_Name": f"New Fund {scheme_code}",
+                "Net_Asset_Value": 12.5,
+            }
+
+        with patch(
+            "api.views.get_single_fund_details", side_effect=lookup
+        ) as mock_lookup:
+            response = self.post(
+                [
+                    {"scheme_Code": "998", "quantity": 1},
+                    {"scheme_Code": "999", "quantity": 1},
+                    {"scheme_Code": "404", "quantity": 1},
+                ]
+            )
+        self.assertEqual(mock_lookup.call_count, 3)
+        self.assertEqual(response.data["added"], 2)
+        self.assertEqual(response.data["results"][2]["status"], "error")
+        self.assertTrue(MutualFund.objects.filter(scheme_Code="999").exists())
 
 
 class ListPortFolioViewTests(TestCase):
@@ -204,4 +451,84 @@ class ListPortFolioViewTests(TestCase):
         self.assertEqual(len(response.data), 1)
         self.assertEqual(response.data[0]["mf_name"], "Test Fund 1")
         self.assertEqual(response.data[0]["current_value"], 1000.0)
+
+    def test_portfolio_total_header(self):
+        mf = MutualFund.objects.create(name="Test Fund 2", scheme_Code=654321, nav=2.5)
+        UserFunds.objects.create(user=self.user, mutual_fund=mf, quantity=10)
+        response = self.client.get(self.list_portfolio_url, headers=self.headers)
+        self.assertEqual(Decimal(response["X-Portfolio-Total"]), Decimal("1025"))
+
+    def test_query_count_does_not_grow_with_holdings(self):
+        self.client.force_authenticate(user=self.user)
+        for i in range(20):
+            mf = MutualFund.objects.create(name=f"Fund {i}", scheme_Code=i, nav=i)
+            UserFunds.objects.create(user=self.user, mutual_fund=mf, quantity=1)
+        # The portfolio version and the holdings
+        with self.assertNumQueries(2):
+            response = self.client.get(self.list_portfolio_url)
+        self.assertEqual(len(response.data), 21)
+
+    def test_cached_until_holdings_change(self):
+        self.client.force_authenticate(user=self.user)
+        self.client.get(self.list_portfolio_url)
+        # Only the portfolio version is read
+        with self.assertNumQueries(1):
+            response = self.client.get(self.list_portfolio_url)
+        self.assertEqual(len(response.data), 1)
+
+        mf = MutualFund.objects.create(name="Test Fund 2", scheme_Code=654321, nav=2)
+        record_buy(self.user, mf, 5)
+        response = self.client.get(self.list_portfolio_url)
+        self.assertEqual(len(response.data), 2)
+
+    def test_not_modified_with_matching_etag(self):
+        response = self.client.get(self.list_portfolio_url, headers=self.headers)
+        etag = response["ETag"]
+        response = self.client.get(
+            self.list_portfolio_url, headers={**self.headers, "If-None-Match": etag}
+        )
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response["ETag"], etag)
+
+    def test_nav_refresh_of_held_fund_changes_etag(self):
+        etag = self.client.get(self.list_portfolio_url, headers=self.headers)["ETag"]
+        refresh_navs(
+            MutualFund.objects.filter(scheme_Code=123456),
+            workers=1,
+            fetch=lambda code: {"Net_Asset_Value": 20},
+        )
+        response = self.client.get(
+            self.list_portfolio_url, headers={**self.headers, "If-None-Match": etag}
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response["ETag"], etag)
+        self.assertEqual(response.data[0]["current_value"], 2000.0)
+
+    def test_nav_refresh_in_another_process_changes_etag(self):
+        etag = self.client.get(self.list_portfolio_url, headers=self.headers)["ETag"]
+        # update_nav running in another process does not share our cache
+        with override_settings(CACHES=OTHER_PROCESS_CACHES):
+            refresh_navs(
+                MutualFund.objects.filter(scheme_Code=123456),
+                workers=1,
+                fetch=lambda code: {"Net_Asset_Value": 20},
+            )
+        response = self.client.get(
+            self.list_portfolio_url, headers={**self.headers, "If-None-Match": etag}
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data[0]["current_value"], 2000.0)
+
+    def test_other_users_changes_keep_etag(self):
+        etag = self.client.get(self.list_portfolio_url, headers=self.headers)["ETag"]
+        other = get_user_model().objects.create_user(username="other", password="x")
+        mf = MutualFund.objects.create(name="Test Fund 2", scheme_Code=654321, nav=2)
+        record_buy(other, mf, 5)
+        refresh_navs([mf], workers=1, fetch=lambda code: {"Net_Asset_Value": 3})
+        response = self.client.get(
+            self.list_portfolio_url, headers={**self.headers, "If-None-Match": etag}
+        )
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+
 "Test Fund 1"